@@ -4,7 +4,7 @@ import { MainContent } from './components/Layout/MainContent';
 import { useWorkflow } from './hooks/useWorkflow';
 
 function App() {
-  const { steps, isRunning, startWorkflow, activeStepId } = useWorkflow();
+  const { steps, isRunning, startWorkflow, cancelWorkflow, activeStepId } = useWorkflow();
 
   const activeStep = steps.find(s => s.id === activeStepId) ||
     steps.find(s => s.status === 'running') ||
@@ -42,6 +42,7 @@ function App() {
             activeStepId={activeStepId}
             isRunning={isRunning}
             onStart={startWorkflow}
+            onCancel={cancelWorkflow}
           />
           <MainContent activeStep={activeStep} />
         </div>
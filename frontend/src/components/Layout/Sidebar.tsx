@@ -9,9 +9,10 @@ interface SidebarProps {
     activeStepId: string | null;
     isRunning: boolean;
     onStart: () => void;
+    onCancel: () => void;
 }
 
-export function Sidebar({ steps, activeStepId, isRunning, onStart }: SidebarProps) {
+export function Sidebar({ steps, activeStepId, isRunning, onStart, onCancel }: SidebarProps) {
     return (
         <div className="w-80 flex flex-col gap-6 shrink-0">
             {/* Control Console */}
@@ -35,6 +36,11 @@ export function Sidebar({ steps, activeStepId, isRunning, onStart }: SidebarProp
                         </span>
                     )}
                 </Button>
+                {isRunning && (
+                    <Button className="w-full" variant="outline" onClick={onCancel}>
+                        取消运行
+                    </Button>
+                )}
             </Card>
 
             {/* Workflow Status */}
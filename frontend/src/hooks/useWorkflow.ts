@@ -34,11 +34,37 @@ export const INITIAL_STEPS: WorkflowStep[] = [
     },
 ];
 
+// Server keeps a dropped session for WS_RESUME_GRACE seconds (30 by default)
+const MAX_RESUME_ATTEMPTS = 5;
+
+// One event of the /ws stream (arrives inside "batch" frames)
+interface StreamEvent {
+    type: string;
+    seq?: number;
+    stage?: string;
+    workflow_id?: string;
+    message?: string;
+    records?: { message: string; repeat?: number }[];
+    dropped?: number;
+    from_seq?: number;
+    to_seq?: number;
+}
+
+interface ResumeState {
+    id: string | null;
+    lastSeq: number;
+    started: boolean;
+    finished: boolean;
+    retries: number;
+}
+
 export function useWorkflow() {
     const [steps, setSteps] = useState<WorkflowStep[]>(INITIAL_STEPS);
     const [isRunning, setIsRunning] = useState(false);
     const [activeStepId, setActiveStepId] = useState<string | null>(null);
     const ws = useRef<WebSocket | null>(null);
+    const workflowId = useRef<string | null>(null);
+    const session = useRef<ResumeState>({ id: null, lastSeq: 0, started: false, finished: false, retries: 0 });
 
     const updateStepStatus = (id: string, status: StepStatus) => {
         setSteps(prev => prev.map(s => s.id === id ? { ...s, status } : s));
@@ -61,67 +87,128 @@ export function useWorkflow() {
         if (isRunning) return;
         setIsRunning(true);
         setSteps(INITIAL_STEPS.map(s => ({ ...s, status: 'pending', logs: [] })));
+        session.current = { id: null, lastSeq: 0, started: false, finished: false, retries: 0 };
 
-        // Initialize WebSocket
-        ws.current = new WebSocket('ws://localhost:8000/ws');
+        const handleLog = (msg: string) => {
+            const stepId = determineActiveStep(msg) || activeStepId || 'collect';
 
-        ws.current.onopen = () => {
-            console.log('Connected to backend');
-            ws.current?.send('start');
-            setActiveStepId('collect');
-            updateStepStatus('collect', 'running');
-        };
+            if (stepId !== activeStepId) {
+                // Complete previous step if moving forward
+                const currentIndex = INITIAL_STEPS.findIndex(s => s.id === activeStepId);
+                const nextIndex = INITIAL_STEPS.findIndex(s => s.id === stepId);
+                if (activeStepId && nextIndex > currentIndex) {
+                    updateStepStatus(activeStepId, 'completed');
+                }
 
-        ws.current.onmessage = (event) => {
-            try {
-                const data = JSON.parse(event.data);
+                setActiveStepId(stepId);
+                updateStepStatus(stepId, 'running');
+            }
 
-                if (data.type === 'log') {
-                    const msg = data.message;
-                    const stepId = determineActiveStep(msg) || activeStepId || 'collect';
+            addLog(stepId, msg);
+        };
 
-                    if (stepId !== activeStepId) {
-                        // Complete previous step if moving forward
-                        const currentIndex = INITIAL_STEPS.findIndex(s => s.id === activeStepId);
-                        const nextIndex = INITIAL_STEPS.findIndex(s => s.id === stepId);
-                        if (activeStepId && nextIndex > currentIndex) {
-                            updateStepStatus(activeStepId, 'completed');
-                        }
+        const fail = (message: string) => {
+            addLog(activeStepId || 'collect', message);
+            updateStepStatus(activeStepId || 'collect', 'failed');
+            session.current.finished = true;
+            setIsRunning(false);
+        };
 
-                        setActiveStepId(stepId);
-                        updateStepStatus(stepId, 'running');
-                    }
+        const handleEvent = (data: StreamEvent) => {
+            if (typeof data.seq === 'number') session.current.lastSeq = data.seq;
 
-                    addLog(stepId, msg);
-                } else if (data.type === 'result') {
-                    updateStepStatus(activeStepId || 'distribute', 'completed');
-                    setIsRunning(false);
-                } else if (data.type === 'error') {
-                    addLog(activeStepId || 'collect', `ERROR: ${data.message}`);
-                    updateStepStatus(activeStepId || 'collect', 'failed');
-                    setIsRunning(false);
+            if (data.type === 'status' && data.stage === 'start') {
+                workflowId.current = data.workflow_id ?? null;
+            } else if (data.type === 'logs') {
+                // Batched records of this workflow; repeats arrive coalesced
+                if (data.dropped) {
+                    handleLog(`… ${data.dropped} 条日志因积压被丢弃`);
+                }
+                for (const record of data.records ?? []) {
+                    handleLog(record.repeat ? `${record.message} (x${record.repeat})` : record.message);
                 }
-            } catch (e) {
-                console.error('Failed to parse WebSocket message', e);
+            } else if (data.type === 'gap') {
+                handleLog(`… 重连期间错过 ${(data.to_seq ?? 0) - (data.from_seq ?? 0) + 1} 条事件`);
+            } else if (data.type === 'result') {
+                updateStepStatus(activeStepId || 'distribute', 'completed');
+                session.current.finished = true;
+                setIsRunning(false);
+            } else if (data.type === 'error') {
+                fail(`ERROR: ${data.message}`);
+            } else if (data.type === 'cancelled') {
+                workflowId.current = null;
+                fail('已取消');
             }
         };
 
-        ws.current.onerror = (e) => {
-            console.error('WebSocket error', e);
-            updateStepStatus(activeStepId || 'collect', 'failed');
-            setIsRunning(false);
+        // Reconnects resume the session from the last sequence number seen,
+        // so nothing (in particular the final result) is lost to a dropped socket
+        const connect = () => {
+            const { id, lastSeq } = session.current;
+            const query = id ? `?session=${id}&last_seq=${lastSeq}` : '';
+            const socket = new WebSocket(`ws://localhost:8000/ws${query}`);
+            ws.current = socket;
+
+            socket.onopen = () => {
+                console.log('Connected to backend');
+                session.current.retries = 0;
+            };
+
+            socket.onmessage = (event) => {
+                try {
+                    const data = JSON.parse(event.data);
+
+                    if (data.type === 'hello') {
+                        if (session.current.started && !data.resumed) {
+                            socket.close();
+                            fail('ERROR: 会话已过期，无法恢复');
+                            return;
+                        }
+                        session.current.id = data.session_id;
+                        if (!session.current.started) {
+                            session.current.started = true;
+                            socket.send('start');
+                            setActiveStepId('collect');
+                            updateStepStatus('collect', 'running');
+                        }
+                    } else if (data.type === 'batch') {
+                        for (const item of data.events as StreamEvent[]) handleEvent(item);
+                    }
+                } catch (e) {
+                    console.error('Failed to parse WebSocket message', e);
+                }
+            };
+
+            socket.onerror = (e) => {
+                console.error('WebSocket error', e);
+            };
+
+            socket.onclose = () => {
+                console.log('Disconnected');
+                if (session.current.finished) return;
+                if (session.current.retries < MAX_RESUME_ATTEMPTS) {
+                    session.current.retries += 1;
+                    setTimeout(connect, 1000 * session.current.retries);
+                    return;
+                }
+                fail('ERROR: 与后端的连接已断开');
+            };
         };
 
-        ws.current.onclose = () => {
-            console.log('Disconnected');
-            if (isRunning) setIsRunning(false);
-        };
+        connect();
 
     }, [isRunning, activeStepId]);
 
+    const cancelWorkflow = useCallback(() => {
+        if (ws.current?.readyState === WebSocket.OPEN && workflowId.current) {
+            ws.current.send(`cancel ${workflowId.current}`);
+        }
+    }, []);
+
     // Cleanup
     useEffect(() => {
         return () => {
+            session.current.finished = true;
             ws.current?.close();
         };
     }, []);
@@ -130,6 +217,7 @@ export function useWorkflow() {
         steps,
         isRunning,
         startWorkflow,
+        cancelWorkflow,
         activeStepId
     };
 }
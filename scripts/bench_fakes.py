@@ -0,0 +1,372 @@
+"""Local stand-ins for Gamma, an OpenAI-compatible LLM, HeyGen, YouTube and X.
+
+Every service lives under its own path prefix on one FastAPI app
+(/gamma, /llm, /heygen, /youtube, /x) and can be given latency, jitter,
+5xx errors and 429 throttling independently. Used by bench_workflows.py,
+or run on its own to point a dev server at:
+
+    python scripts/bench_fakes.py --port 9100 --latency llm=0.8 --throttle llm=0.1
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SERVICES = ("gamma", "llm", "heygen", "youtube", "x")
+
+
+@dataclass
+class Fault:
+    """Per-service behaviour: latency/jitter in seconds, error and 429 rates in [0, 1]."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+
+
+@dataclass
+class _Upload:
+    size: int
+    received: bytearray = field(default_factory=bytearray)
+
+
+def parse_fault_args(latency: List[str], jitter: List[str], errors: List[str], throttle: List[str]) -> Dict[str, Fault]:
+    """Turn repeated ``service=value`` CLI options into Fault objects ("all" applies to every service)."""
+    faults = {service: Fault() for service in SERVICES}
+    for attribute, values in (("latency", latency), ("jitter", jitter), ("error_rate", errors), ("throttle_rate", throttle)):
+        for item in values or []:
+            for pair in item.split(","):
+                name, _, value = pair.partition("=")
+                targets = SERVICES if name.strip() == "all" else (name.strip(),)
+                for target in targets:
+                    if target not in faults:
+                        raise ValueError(f"Unknown service {target!r}; expected one of {', '.join(SERVICES)}")
+                    setattr(faults[target], attribute, float(value))
+    return faults
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", action="append", help="service=seconds (repeatable, 'all' allowed)")
+    parser.add_argument("--jitter", action="append", help="service=seconds of uniform extra latency")
+    parser.add_argument("--errors", action="append", help="service=fraction of requests answered 500")
+    parser.add_argument("--throttle", action="append", help="service=fraction of requests answered 429")
+
+
+class FakeServices:
+    def __init__(
+        self,
+        base_url: str,
+        faults: Optional[Dict[str, Fault]] = None,
+        *,
+        markets: int = 500,
+        render_seconds: float = 2.0,
+        video_bytes: int = 1 << 20,
+        callback_url: Optional[str] = None,
+        seed: int = 7,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.faults = faults or {service: Fault() for service in SERVICES}
+        self.render_seconds = render_seconds
+        self.video_bytes = video_bytes
+        self.callback_url = callback_url
+        self.random = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.injected: Counter = Counter()
+        self._markets = [self._make_market(index) for index in range(markets)]
+        self._renders: Dict[str, float] = {}
+        self._uploads: Dict[str, _Upload] = {}
+        self._background: set = set()
+        self.app = FastAPI()
+        self.app.middleware("http")(self._inject_faults)
+        self._routes()
+
+    # -- fault injection --
+
+    async def _inject_faults(self, request: Request, call_next: Any) -> Response:
+        service = request.url.path.strip("/").split("/", 1)[0]
+        fault = self.faults.get(service)
+        if fault is None:
+            return await call_next(request)
+        self.requests[service] += 1
+        delay = fault.latency + (self.random.uniform(0, fault.jitter) if fault.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < fault.throttle_rate:
+            self.injected[f"{service}_429"] += 1
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": str(fault.retry_after)})
+        if roll < fault.throttle_rate + fault.error_rate:
+            self.injected[f"{service}_500"] += 1
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+        return await call_next(request)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": dict(self.requests), "injected": dict(self.injected)}
+
+    # -- synthetic data --
+
+    def _make_market(self, index: int) -> Dict[str, Any]:
+        price = round(self.random.uniform(0.02, 0.98), 3)
+        return {
+            "id": str(100000 + index),
+            "question": f"Will benchmark market {index} resolve YES?",
+            "slug": f"bench-market-{index}",
+            "event_id": str(5000 + index // 5),
+            "active": True,
+            "closed": False,
+            "volume": round(self.random.uniform(1e3, 5e6), 2),
+            "volume24hr": round(self.random.uniform(0, 2e5), 2),
+            "liquidity": round(self.random.uniform(1e2, 5e5), 2),
+            "outcomes": json.dumps(["Yes", "No"]),
+            "outcomePrices": json.dumps([str(price), str(round(1 - price, 3))]),
+        }
+
+    def _drift(self) -> None:
+        # Move a few prices per request so snapshot diffs have something to find
+        for market in self.random.sample(self._markets, k=min(10, len(self._markets))):
+            yes = float(json.loads(market["outcomePrices"])[0])
+            yes = min(0.99, max(0.01, yes + self.random.uniform(-0.08, 0.08)))
+            market["outcomePrices"] = json.dumps([f"{yes:.3f}", f"{1 - yes:.3f}"])
+            market["volume24hr"] = round(market["volume24hr"] * self.random.uniform(0.8, 1.6), 2)
+
+    # -- routes --
+
+    def _routes(self) -> None:
+        app = self.app
+
+        @app.get("/gamma/markets")
+        async def gamma_markets(limit: int = 50, offset: int = 0, order: str = "volume", ascending: bool = False):
+            self._drift()
+            ordered = sorted(self._markets, key=lambda m: float(m.get(order) or 0), reverse=not ascending)
+            return ordered[offset:offset + limit]
+
+        @app.get("/gamma/events")
+        async def gamma_events(limit: int = 25, offset: int = 0):
+            events = [
+                {
+                    "id": str(5000 + index),
+                    "title": f"Benchmark event {index}",
+                    "slug": f"bench-event-{index}",
+                    "volume": sum(m["volume"] for m in self._markets[index * 5:index * 5 + 5]),
+                    "liquidity": sum(m["liquidity"] for m in self._markets[index * 5:index * 5 + 5]),
+                    "closed": False,
+                }
+                for index in range(len(self._markets) // 5)
+            ]
+            return events[offset:offset + limit]
+
+        @app.post("/llm/v1/chat/completions")
+        async def llm_chat(request: Request):
+            return self._chat_completion(await request.json())
+
+        @app.post("/heygen/v2/video/generate")
+        async def heygen_generate():
+            video_id = uuid.uuid4().hex
+            self._renders[video_id] = time.monotonic() + self.render_seconds
+            if self.callback_url:
+                task = asyncio.ensure_future(self._post_render_callback(video_id))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return {"error": None, "data": {"video_id": video_id}}
+
+        @app.get("/heygen/v1/video_status.get")
+        async def heygen_status(video_id: str):
+            return {"code": 100, "data": self._render_status(video_id)}
+
+        @app.get("/heygen/files/{video_id}.mp4")
+        async def heygen_file(video_id: str, request: Request):
+            body = bytes(self.video_bytes)
+            match = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+            if not match:
+                return Response(body, media_type="video/mp4", headers={"Accept-Ranges": "bytes"})
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(body) - 1
+            if start >= len(body):
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{len(body)}"})
+            return Response(
+                body[start:end + 1],
+                status_code=206,
+                media_type="video/mp4",
+                headers={"Content-Range": f"bytes {start}-{end}/{len(body)}", "Accept-Ranges": "bytes"},
+            )
+
+        @app.post("/youtube/token")
+        async def youtube_token():
+            return {"access_token": f"ya29.{uuid.uuid4().hex}", "expires_in": 3599, "token_type": "Bearer"}
+
+        @app.post("/youtube/upload/youtube/v3/videos")
+        async def youtube_init(request: Request):
+            session_id = uuid.uuid4().hex
+            self._uploads[session_id] = _Upload(size=0)
+            return Response(headers={"Location": f"{self.base_url}/youtube/upload/session/{session_id}"})
+
+        @app.put("/youtube/upload/session/{session_id}")
+        async def youtube_chunk(session_id: str, request: Request):
+            upload = self._uploads.get(session_id)
+            if upload is None:
+                return Response(status_code=404)
+            content_range = request.headers.get("Content-Range", "")
+            body = await request.body()
+            match = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range)
+            if match:
+                start, _, total = map(int, match.groups())
+                upload.size = total
+                if start == len(upload.received):
+                    upload.received.extend(body)
+            elif content_range.startswith("bytes */"):
+                upload.size = int(content_range.rpartition("/")[2])
+            if upload.size and len(upload.received) >= upload.size:
+                return {"id": session_id[:11], "status": {"uploadStatus": "uploaded"}}
+            headers = {"Range": f"bytes=0-{len(upload.received) - 1}"} if upload.received else {}
+            return Response(status_code=308, headers=headers)
+
+        @app.get("/youtube/youtube/v3/videos")
+        async def youtube_videos(id: str, part: str = "status"):
+            return {
+                "items": [
+                    {"id": video_id, "status": {"uploadStatus": "processed"}, "processingDetails": {"processingStatus": "succeeded"}}
+                    for video_id in id.split(",")
+                ]
+            }
+
+        @app.api_route("/x/1.1/media/upload.json", methods=["GET", "POST"])
+        async def x_media(request: Request):
+            fields = await self._form_fields(request)
+            command = fields.get("command", "")
+            if command == "INIT":
+                return {"media_id_string": uuid.uuid4().hex[:19], "expires_after_secs": 86400}
+            if command == "APPEND":
+                return Response(status_code=204)
+            if command == "FINALIZE":
+                return {"media_id_string": fields.get("media_id"), "processing_info": {"state": "pending", "check_after_secs": 0}}
+            return {"media_id_string": fields.get("media_id"), "processing_info": {"state": "succeeded"}}
+
+        @app.post("/x/2/tweets")
+        async def x_tweet():
+            return {"data": {"id": uuid.uuid4().hex[:19], "text": "ok"}}
+
+    async def _form_fields(self, request: Request) -> Dict[str, str]:
+        if request.method == "GET":
+            return dict(request.query_params)
+        body = await request.body()
+        content_type = request.headers.get("content-type", "")
+        if "multipart/form-data" in content_type:
+            # Only the small text fields matter here; skip the media payload
+            fields = {}
+            for name, value in re.findall(rb'name="([^"]+)"\r\n\r\n([^\r]{0,64})\r\n', body):
+                if name != b"media":
+                    fields[name.decode()] = value.decode()
+            return fields
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def _render_status(self, video_id: str) -> Dict[str, Any]:
+        ready_at = self._renders.get(video_id)
+        if ready_at is None:
+            return {"video_id": video_id, "status": "failed", "error": "unknown video"}
+        if time.monotonic() < ready_at:
+            return {"video_id": video_id, "status": "processing"}
+        return {"video_id": video_id, "status": "completed", "video_url": f"{self.base_url}/heygen/files/{video_id}.mp4"}
+
+    async def _post_render_callback(self, video_id: str) -> None:
+        await asyncio.sleep(self.render_seconds)
+        event = {
+            "event_type": "avatar_video.success",
+            "event_data": {"video_id": video_id, "url": f"{self.base_url}/heygen/files/{video_id}.mp4"},
+        }
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                await client.post(self.callback_url, json=event)
+        except httpx.HTTPError:
+            pass
+
+    def _chat_completion(self, body: Dict[str, Any]) -> Any:
+        messages = body.get("messages") or []
+        tools = [tool.get("function", {}).get("name") for tool in body.get("tools") or []]
+        already_called = any(message.get("role") == "tool" for message in messages)
+        tool_calls = None
+        content = (
+            "Benchmark summary: liquidity concentrated in the top markets, prices drifted modestly. "
+            "This is not financial advice."
+        )
+        # First agent turn: call one data tool so the react loop does real work
+        if tools and not already_called:
+            name = "polymarket_compact" if "polymarket_compact" in tools else tools[0]
+            tool_calls = [
+                {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": name, "arguments": "{}"}}
+            ]
+            content = ""
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        usage = {"prompt_tokens": sum(len(str(m.get("content") or "")) for m in messages) // 4, "completion_tokens": 40}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "bench-model")
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        def _chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def _stream():
+            yield _chunk({"role": "assistant", "content": content})
+            if tool_calls:
+                yield _chunk({"tool_calls": [dict(call, index=index) for index, call in enumerate(tool_calls)]})
+            yield _chunk({}, finish_reason)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(_stream(), media_type="text/event-stream")
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the fake external services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--markets", type=int, default=500)
+    parser.add_argument("--render-seconds", type=float, default=2.0)
+    parser.add_argument("--callback-url", help="POST HeyGen-style webhooks here when renders finish")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    fakes = FakeServices(
+        f"http://{args.host}:{args.port}",
+        parse_fault_args(args.latency, args.jitter, args.errors, args.throttle),
+        markets=args.markets,
+        render_seconds=args.render_seconds,
+        callback_url=args.callback_url,
+    )
+    uvicorn.run(fakes.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Micro-benchmark: per-request OAuth 1.0a signing cost for the X MCP server.
+
+Compares the old per-call path (read env vars, rebuild the signing key,
+encode and sort everything) with the reusable OAuth1Signer.
+
+    python scripts/bench_oauth_signing.py [iterations]
+"""
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+import timeit
+import uuid
+from typing import Dict, List, Tuple
+from urllib.parse import quote, urlsplit, urlunsplit
+
+# Add project root to path to allow imports from src
+sys.path.append(os.getcwd())
+
+for _name, _value in {
+    "X_API_KEY": "xvz1evFS4wEEPTGEFPHBog",
+    "X_API_SECRET": "kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw",
+    "X_API_ACCESS_TOKEN": "370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb",
+    "X_API_ACCESS_SECRET": "LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from src.mcp.x_twitter_server import OAuth1Signer  # noqa: E402
+
+URL = "https://upload.twitter.com/1.1/media/upload.json"
+PARAMS = {"command": "APPEND", "media_id": "1880028106020515840", "segment_index": "17"}
+
+
+def _legacy_oauth1_header(method: str, url: str, params: Dict[str, str], nonce: str, timestamp: str) -> str:
+    """The signing path as it was before OAuth1Signer, env reads included."""
+    consumer_key = os.getenv("X_API_KEY", "").strip()
+    consumer_secret = os.getenv("X_API_SECRET", "").strip()
+    token = os.getenv("X_API_ACCESS_TOKEN", "").strip()
+    token_secret = os.getenv("X_API_ACCESS_SECRET", "").strip()
+    oauth_params = {
+        "oauth_consumer_key": consumer_key,
+        "oauth_nonce": nonce,
+        "oauth_signature_method": "HMAC-SHA1",
+        "oauth_timestamp": timestamp,
+        "oauth_token": token,
+        "oauth_version": "1.0",
+    }
+    signature_params = dict(params)
+    signature_params.update(oauth_params)
+    items: List[Tuple[str, str]] = sorted((str(k), str(v)) for k, v in signature_params.items())
+    normalized = "&".join(f"{quote(k, safe='~')}={quote(v, safe='~')}" for k, v in items)
+    parts = urlsplit(url)
+    base_url = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    base_string = "&".join([method.upper(), quote(base_url, safe="~"), quote(normalized, safe="~")])
+    signing_key = f"{quote(consumer_secret, safe='~')}&{quote(token_secret, safe='~')}"
+    digest = hmac.new(signing_key.encode(), base_string.encode(), hashlib.sha1).digest()
+    oauth_params["oauth_signature"] = base64.b64encode(digest).decode()
+    header = ", ".join(f'{quote(k, safe="~")}="{quote(v, safe="~")}"' for k, v in sorted(oauth_params.items()))
+    return f"OAuth {header}"
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    signer = OAuth1Signer.from_env()
+
+    nonce, timestamp = uuid.uuid4().hex, str(int(time.time()))
+    legacy = _legacy_oauth1_header("POST", URL, PARAMS, nonce, timestamp)
+    current = signer.sign("POST", URL, PARAMS, nonce=nonce, timestamp=timestamp)
+    if legacy != current:
+        raise SystemExit(f"Signatures differ:\n  legacy:  {legacy}\n  signer:  {current}")
+
+    def run_legacy() -> None:
+        _legacy_oauth1_header("POST", URL, PARAMS, uuid.uuid4().hex, str(int(time.time())))
+
+    def run_signer() -> None:
+        signer.sign("POST", URL, PARAMS)
+
+    results = {}
+    for name, func in (("legacy", run_legacy), ("signer", run_signer)):
+        best = min(timeit.repeat(func, number=iterations, repeat=5))
+        results[name] = best / iterations * 1e6
+        print(f"{name:>7}: {results[name]:.2f} us/request ({iterations} requests, best of 5)")
+    print(f"speedup: {results['legacy'] / results['signer']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
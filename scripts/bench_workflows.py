@@ -0,0 +1,425 @@
+"""End-to-end workflow benchmark against local stand-in services.
+
+Starts the fakes from bench_fakes.py (and, for the ``ws`` and ``render``
+targets, the FastAPI server that receives HeyGen webhooks) on free local ports, points every client at them through
+env vars, then runs N workflows per target with bounded concurrency and
+prints p50/p95/p99 latency per stage plus throughput.
+
+    python scripts/bench_workflows.py --targets graph,react --workflows 40 --concurrency 8
+    python scripts/bench_workflows.py --targets ws,publish --latency llm=0.5 --throttle llm=0.05 --json bench.json
+
+Targets:
+    graph    build_daily_graph().run(), timed per node (graph.*) and LLM call (llm.ask)
+    react    create_react_agent().run(), timed per think (agent.think) and tool call (tool.*)
+    ws       the /ws endpoint of src/server.py, start -> result
+    render   HeyGen status polling (woken by webhook) and video download
+    publish  YouTube resumable upload and X chunked upload of a test file
+
+Limits and retries only apply to hosts listed in RATE_LIMIT_RULES; set it
+(for 127.0.0.1) to exercise the limiter against injected 429s.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Add project root to path to allow imports from src
+sys.path.append(os.getcwd())
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from bench_fakes import FakeServices, add_fault_arguments, parse_fault_args  # noqa: E402
+
+TARGETS = ("graph", "react", "ws", "render", "publish")
+REACT_PROMPT = "Use polymarket_compact to find top markets, then write a short report."
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread(threading.Thread):
+    """Runs an ASGI app under uvicorn on its own thread and event loop.
+
+    Used for the fakes, so their work does not show up in the measured loop.
+    """
+
+    def __init__(self, app: Any, port: int):
+        import uvicorn
+
+        super().__init__(daemon=True)
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+
+    def run(self) -> None:
+        self.server.run()
+
+    def start_and_wait(self, timeout: float = 15.0) -> "ServerThread":
+        self.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.is_alive():
+                raise RuntimeError(f"Server on port {self.port} did not start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.join(timeout=10)
+
+
+class LoopServer:
+    """Runs an ASGI app under uvicorn on the current event loop.
+
+    The app server shares the benchmark's loop so HeyGen webhooks wake the
+    render waiters on the loop they are waiting in.
+    """
+
+    def __init__(self, app: Any, port: int):
+        import uvicorn
+
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._task: Optional[asyncio.Future] = None
+
+    async def start(self, timeout: float = 15.0) -> "LoopServer":
+        self._task = asyncio.ensure_future(self.server.serve())
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or self._task.done():
+                raise RuntimeError(f"Server on port {self.port} did not start")
+            await asyncio.sleep(0.05)
+        return self
+
+    async def stop(self) -> None:
+        self.server.should_exit = True
+        if self._task is not None:
+            await self._task
+
+
+class StageRecorder:
+    """Collects wall-clock durations and failures per stage name."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.errors[stage] += 1
+            raise
+        finally:
+            self.samples[stage].append(time.perf_counter() - started)
+
+    def record(self, span: Any) -> None:
+        """Span exporter: files every finished tracing span under its name."""
+        self.samples[span.name].append(span.duration)
+        if span.status == "error":
+            self.errors[span.name] += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # Nearest-rank percentile
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def configure_env(fakes_url: str, workdir: Path, app_url: str, warm_caches: bool) -> None:
+    """Point every client at the fakes. Must run before src modules are imported."""
+    secrets = {
+        "OPENAI_API_KEY": "bench-key",
+        "DEEPSEEK_API_KEY": "bench-key",
+        "HEYGEN_API_KEY": "bench-key",
+        "HEYGEN_VOICE_ID": "bench-voice",
+        "HEYGEN_AVATAR_ID": "bench-avatar",
+        "YOUTUBE_CLIENT_ID": "bench-client",
+        "YOUTUBE_CLIENT_SECRET": "bench-secret",
+        "YOUTUBE_REFRESH_TOKEN": "bench-refresh",
+        "X_API_KEY": "bench-key",
+        "X_API_SECRET": "bench-secret",
+        "X_API_ACCESS_TOKEN": "bench-token",
+        "X_API_ACCESS_SECRET": "bench-token-secret",
+    }
+    os.environ.update(secrets)
+    os.environ.update(
+        {
+            "POLYMARKET_GAMMA_BASE_URL": f"{fakes_url}/gamma",
+            "LLM_PROVIDER": "openai",
+            "DEFAULT_LLM_PROVIDER": "openai",
+            "OPENAI_MODEL": "bench-model",
+            "DEFAULT_MODEL": "bench-model",
+            "OPENAI_BASE_URL": f"{fakes_url}/llm/v1",
+            "DEEPSEEK_BASE_URL": f"{fakes_url}/llm/v1",
+            "LLM_CACHE_ENABLED": str(warm_caches).lower(),
+            "LLM_CACHE_PATH": str(workdir / "llm_cache.sqlite3"),
+            "POLYMARKET_CACHE_ENABLED": str(warm_caches).lower(),
+            "POLYMARKET_SNAPSHOT_PATH": str(workdir / "market_snapshot.json"),
+            "VIDEO_OUTPUT_DIR": str(workdir / "outputs"),
+            "VIDEO_PROVIDER": "mock",
+            "ENABLE_VIDEO_GENERATION": "false",
+            "ENABLE_TWITTER_POST": "false",
+            "RENDER_QUEUE_ENABLED": "false",
+            "RENDER_CACHE_ENABLED": "false",
+            "HEYGEN_BASE_URL": f"{fakes_url}/heygen",
+            "HEYGEN_CALLBACK_ENABLED": "true" if app_url else "false",
+            "HEYGEN_STATUS_POLL_INTERVAL": "0.5",
+            "YOUTUBE_TOKEN_URL": f"{fakes_url}/youtube/token",
+            "YOUTUBE_API_BASE_URL": f"{fakes_url}/youtube",
+            "YOUTUBE_UPLOAD_BASE_URL": f"{fakes_url}/youtube/upload",
+            "YOUTUBE_UPLOAD_SESSIONS_PATH": str(workdir / "youtube_upload_sessions.json"),
+            "X_API_BASE_URL": f"{fakes_url}/x",
+            "X_UPLOAD_BASE_URL": f"{fakes_url}/x",
+            "X_MEDIA_STATUS_INTERVAL": "0",
+            "TRACING_ENABLED": "true",
+            "TRACING_JSONL_PATH": str(workdir / "traces.jsonl"),
+        }
+    )
+    # No MCP subprocesses: the react agent uses only its built-in tools
+    for name in ("MCP_HEYGEN_URL", "MCP_YOUTUBE_URL", "MCP_INVIDEO_URL"):
+        os.environ.pop(name, None)
+
+
+def instrument(recorder: StageRecorder) -> None:
+    """Feed the app's own tracing spans (graph nodes, LLM calls, tools) into the recorder."""
+    from src.tracing import add_exporter
+
+    add_exporter(recorder.record)
+
+
+async def run_graph(recorder: StageRecorder, index: int, ctx: Dict[str, Any]) -> None:
+    from src.agents.polymarket_graph import build_daily_graph
+
+    agent = build_daily_graph()
+    await agent.run("polymarket daily brief")
+
+
+async def run_react(recorder: StageRecorder, index: int, ctx: Dict[str, Any]) -> None:
+    from src.agents.react_agent import create_react_agent
+
+    agent = create_react_agent()
+    await agent.run(REACT_PROMPT)
+
+
+async def run_ws(recorder: StageRecorder, index: int, ctx: Dict[str, Any]) -> None:
+    import websockets
+
+    started = time.perf_counter()
+    async with websockets.connect(ctx["ws_url"], max_size=None) as socket_:
+        json.loads(await socket_.recv())  # hello
+        await socket_.send("start")
+        first = True
+        while True:
+            frame = json.loads(await socket_.recv())
+            if first:
+                recorder.samples["ws.first_message"].append(time.perf_counter() - started)
+                first = False
+            for event in frame.get("events", ()):
+                if event.get("type") == "result":
+                    return
+                if event.get("type") == "error":
+                    raise RuntimeError(event.get("message"))
+
+
+async def run_render(recorder: StageRecorder, index: int, ctx: Dict[str, Any]) -> None:
+    from src.tools import video
+
+    with recorder.time("render.generate"):
+        response = await video._heygen_client().post(f"{ctx['fakes_url']}/heygen/v2/video/generate", json={})
+        response.raise_for_status()
+        video_id = response.json()["data"]["video_id"]
+    with recorder.time("render.poll"):
+        status = await video._heygen_poll(video_id)
+    video_url = video._extract_video_url(status)
+    if not video_url:
+        raise RuntimeError(f"Render {video_id} finished without a URL: {status}")
+    with recorder.time("render.download"):
+        await video._heygen_download(video_url, f"bench-{index}")
+
+
+async def run_publish(recorder: StageRecorder, index: int, ctx: Dict[str, Any]) -> None:
+    from src.mcp import x_twitter_server, youtube_server
+
+    with recorder.time("publish.youtube"):
+        await asyncio.to_thread(youtube_server.youtube_upload_video, ctx["upload_file"], f"bench-{index}")
+    with recorder.time("publish.x"):
+        await asyncio.to_thread(x_twitter_server.x_upload_video, ctx["upload_file"])
+
+
+RUNNERS = {
+    "graph": run_graph,
+    "react": run_react,
+    "ws": run_ws,
+    "render": run_render,
+    "publish": run_publish,
+}
+
+
+async def run_target(
+    target: str,
+    recorder: StageRecorder,
+    workflows: int,
+    concurrency: int,
+    ctx: Dict[str, Any],
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    runner = RUNNERS[target]
+
+    async def _one(index: int) -> bool:
+        async with semaphore:
+            try:
+                with recorder.time(f"{target}.total"):
+                    await runner(recorder, index, ctx)
+                return True
+            except Exception as exc:
+                logging.getLogger(__name__).warning(f"{target} workflow {index} failed: {exc}")
+                return False
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_one(index) for index in range(workflows)))
+    wall = time.perf_counter() - started
+    completed = sum(results)
+    return {
+        "workflows": workflows,
+        "completed": completed,
+        "failed": workflows - completed,
+        "wall_seconds": wall,
+        "throughput_per_min": completed / wall * 60 if wall else 0.0,
+    }
+
+
+def summarize(recorder: StageRecorder) -> Dict[str, Dict[str, float]]:
+    return {
+        stage: {
+            "count": len(values),
+            "errors": recorder.errors.get(stage, 0),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": max(values) * 1000,
+        }
+        for stage, values in sorted(recorder.samples.items())
+        if values
+    }
+
+
+def print_report(stages: Dict[str, Dict[str, float]], targets: Dict[str, Dict[str, Any]], fakes: Dict[str, Any]) -> None:
+    print(f"\n{'stage':<22}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, row in stages.items():
+        print(
+            f"{stage:<22}{row['count']:>6}{row['errors']:>5}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+        )
+    print(f"\n{'target':<10}{'ok':>6}{'failed':>8}{'wall s':>10}{'per min':>10}")
+    for target, row in targets.items():
+        print(
+            f"{target:<10}{row['completed']:>6}{row['failed']:>8}"
+            f"{row['wall_seconds']:>10.2f}{row['throughput_per_min']:>10.1f}"
+        )
+    print(f"\nfake service requests: {fakes['requests']}")
+    if fakes["injected"]:
+        print(f"injected faults: {fakes['injected']}")
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        raise SystemExit(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="fastkol-bench-"))
+    fakes_port = _free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    app_port = _free_port() if {"ws", "render"} & set(targets) else None
+    app_url = f"http://127.0.0.1:{app_port}" if app_port else ""
+
+    fakes = FakeServices(
+        fakes_url,
+        parse_fault_args(args.latency, args.jitter, args.errors, args.throttle),
+        markets=args.markets,
+        render_seconds=args.render_seconds,
+        video_bytes=args.video_bytes,
+        callback_url=f"{app_url}/callbacks/heygen" if app_url else None,
+    )
+    configure_env(fakes_url, workdir, app_url, args.warm_caches)
+    fakes_thread = ServerThread(fakes.app, fakes_port).start_and_wait()
+
+    recorder = StageRecorder()
+    instrument(recorder)
+    ctx: Dict[str, Any] = {"fakes_url": fakes_url}
+    app_server = None
+    if app_port:
+        from src.server import app
+
+        app_server = await LoopServer(app, app_port).start()
+        ctx["ws_url"] = f"ws://127.0.0.1:{app_port}/ws"
+    if "publish" in targets:
+        upload_file = workdir / "upload.mp4"
+        upload_file.write_bytes(os.urandom(args.upload_bytes))
+        ctx["upload_file"] = str(upload_file)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for target in targets:
+            print(f"Running {args.workflows} {target} workflows (concurrency {args.concurrency})...")
+            results[target] = await run_target(target, recorder, args.workflows, args.concurrency, ctx)
+    finally:
+        if app_server is not None:
+            await app_server.stop()
+        fakes_thread.stop()
+        from src.tools.http_pool import aclose_async_clients
+
+        await aclose_async_clients()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "json"},
+        "stages": summarize(recorder),
+        "targets": results,
+        "fakes": fakes.stats(),
+    }
+    print_report(report["stages"], report["targets"], report["fakes"])
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark fastKOL workflows against local fakes")
+    parser.add_argument("--targets", default="graph,react", help=f"comma-separated: {','.join(TARGETS)}")
+    parser.add_argument("--workflows", type=int, default=20, help="workflows per target")
+    parser.add_argument("--concurrency", type=int, default=5, help="workflows in flight at once")
+    parser.add_argument("--markets", type=int, default=500, help="markets served by the fake Gamma API")
+    parser.add_argument("--render-seconds", type=float, default=2.0, help="fake HeyGen render time")
+    parser.add_argument("--video-bytes", type=int, default=4 << 20, help="size of the fake rendered video")
+    parser.add_argument("--upload-bytes", type=int, default=8 << 20, help="size of the file for publish runs")
+    parser.add_argument("--warm-caches", action="store_true", help="leave the Gamma and LLM caches on")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    report = asyncio.run(main_async(args))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,14 @@ from typing import Any, Dict, Optional, Tuple
 
 from mcp.client.session_group import ClientSessionGroup, StreamableHttpParameters, StdioServerParameters
 
+# Add project root to path to allow imports from src
+sys.path.append(os.getcwd())
+
+from src.tools.render_cache import RenderCache, render_key
+
+# The MCP generate_avatar_video tool renders at its default 1280x720
+MCP_DIMENSION = (1280, 720)
+
 
 def build_30s_script(text: str) -> str:
     return (
@@ -216,6 +224,21 @@ async def main() -> None:
             }, ensure_ascii=False, indent=2))
             return
 
+        cache = RenderCache.from_env()
+        cache_key = render_key(narration, avatar_id, voice_id, *MCP_DIMENSION, via="mcp")
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached:
+            # Same narration, avatar and voice: reuse the finished render
+            print(json.dumps({
+                "voice_id": voice_id,
+                "avatar_id": avatar_id,
+                "video_id": cached["video_id"],
+                "video_url": cached["video_url"],
+                "local_path": cached["local_path"],
+                "cached": True,
+            }, ensure_ascii=False, indent=2))
+            return
+
         schema = _tool_schema(tools["generate_avatar_video"])
         args: Dict[str, Any] = {}
         for key in ("input_text", "text", "script"):
@@ -239,6 +262,9 @@ async def main() -> None:
             status_payload = _parse_content(status.model_dump())
             video_url = _extract_video_url(status_payload)
 
+        if video_url and cache is not None:
+            cache.put(cache_key, video_id, video_url)
+
         print(json.dumps({
             "voice_id": voice_id,
             "avatar_id": avatar_id,
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..tools.context_packer import estimate_tokens
+from ..tracing import Span, payload_size, span
+
+
+class LLMResponseCache:
+    """Content-addressed, SQLite-backed cache of LLM responses.
+
+    Keys hash the provider, model, messages and call parameters, so any change
+    to the prompt is a miss. Entries expire after ``ttl`` seconds and the
+    least recently used rows are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600.0, max_entries: int = 500):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMResponseCache"]:
+        if os.getenv("LLM_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            os.getenv("LLM_CACHE_PATH", "outputs/llm_cache.sqlite3"),
+            ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500")),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: List[Dict[str, Any]], params: Optional[Dict[str, Any]] = None) -> str:
+        canonical = json.dumps(
+            {"provider": provider, "model": model, "messages": messages, "params": params or {}},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0}
+
+
+async def cached_ask(
+    llm: Any,
+    messages: List[Dict[str, Any]],
+    cache: Optional[LLMResponseCache],
+    **params: Any,
+) -> str:
+    """``llm.ask`` with a lookup in ``cache`` first (``None`` disables caching)."""
+    provider = str(getattr(llm, "llm_provider", "") or "")
+    model = str(getattr(llm, "model_name", "") or "")
+    prompt_text = "".join(str(message.get("content") or "") for message in messages)
+    with span("llm.ask", provider=provider, model=model) as current:
+        # ChatBot.ask returns plain text, so token counts are estimates
+        current.set("request_bytes", payload_size(messages))
+        current.set("prompt_tokens", estimate_tokens(prompt_text))
+        current.set("tokens_estimated", True)
+        response = await _ask(llm, messages, cache, provider, model, params, current)
+        current.set("response_bytes", payload_size(response))
+        current.set("completion_tokens", estimate_tokens(str(response or "")))
+        return response
+
+
+async def _ask(
+    llm: Any,
+    messages: List[Dict[str, Any]],
+    cache: Optional[LLMResponseCache],
+    provider: str,
+    model: str,
+    params: Dict[str, Any],
+    current: Span,
+) -> str:
+    if cache is None:
+        return await llm.ask(messages, **params)
+    key = cache.make_key(provider, model, messages, params)
+    cached = await asyncio.to_thread(cache.get, key)
+    current.set("cache_hit", cached is not None)
+    if cached is not None:
+        return cached
+    response = await llm.ask(messages, **params)
+    if response:
+        await asyncio.to_thread(cache.put, key, str(response))
+    return response
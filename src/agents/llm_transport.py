@@ -0,0 +1,47 @@
+"""Send LLM provider traffic through the rate-limited transport.
+
+spoon_ai providers build their SDK clients in ``initialize()``. The
+OpenAI-compatible providers are registered again with subclasses that hand
+the SDK client the pooled ``llm.<provider>`` client from ``http_pool``, so it
+is rate limited and closed by ``aclose_async_clients()`` with the others.
+"""
+from typing import Any, Dict, Type
+
+from spoon_ai.llm.providers import DeepSeekProvider, OpenAIProvider, OpenRouterProvider
+from spoon_ai.llm.registry import get_global_registry
+
+from ..tools.http_pool import get_async_client
+
+
+_PROVIDERS: Dict[str, Type[Any]] = {
+    "openai": OpenAIProvider,
+    "deepseek": DeepSeekProvider,
+    "openrouter": OpenRouterProvider,
+}
+
+
+def rate_limited(provider_class: Type[Any]) -> Type[Any]:
+    """Subclass of an OpenAI-compatible provider whose client uses the rate-limited transport."""
+
+    class RateLimitedProvider(provider_class):
+        async def initialize(self, config: Dict[str, Any]) -> None:
+            await super().initialize(config)
+            http_client = get_async_client(
+                f"llm.{self.get_provider_name()}",
+                timeout=config.get("timeout", 30),
+                follow_redirects=True,
+            )
+            sdk_client = self.client
+            self.client = sdk_client.with_options(http_client=http_client)
+            # The SDK's own httpx client is replaced before it sent anything
+            await sdk_client.close()
+
+    RateLimitedProvider.__name__ = RateLimitedProvider.__qualname__ = f"RateLimited{provider_class.__name__}"
+    return RateLimitedProvider
+
+
+def install_llm_transports() -> None:
+    """Register the rate-limited providers; call before the first LLM request."""
+    registry = get_global_registry()
+    for name, provider_class in _PROVIDERS.items():
+        registry.register(name, rate_limited(provider_class))
@@ -5,15 +5,34 @@ from typing import Any, Dict, List, Optional, TypedDict
 from spoon_ai.chat import ChatBot
 from spoon_ai.graph import StateGraph, START, END, GraphAgent
 
-from ..tools.polymarket import fetch_events, fetch_markets
-from ..tools.video import generate_avatar_video
+from .llm_cache import LLMResponseCache, cached_ask
+from ..tools.context_packer import (
+    CHANGE_COLUMNS,
+    EVENT_COLUMNS,
+    MARKET_COLUMNS,
+    context_budget,
+    pack_sections,
+)
+from ..tools.market_diff import changed_ids, default_store, diff_snapshots, window_label
+from ..tools.market_snapshot import MarketSnapshot
+from ..tools.polymarket import fetch_events_and_markets
+from ..tools.video import (
+    RENDER_JOB_PREFIX,
+    agenerate_avatar_video,
+    render_queue,
+    render_queue_serving,
+    resolve_render_job,
+)
 from ..tools.twitter import post_to_x
+from ..tracing import traced
 
 
 class DailyState(TypedDict, total=False):
     input: str
     events: List[Dict[str, Any]]
     markets: List[Dict[str, Any]]
+    fetch_errors: Dict[str, str]
+    market_changes: Dict[str, Any]
     analysis: str
     script: str
     video_path: str
@@ -122,28 +141,66 @@ def build_daily_graph() -> GraphAgent:
     model_name = _first_env(model_env_key, "DEFAULT_MODEL") or "gpt-5.1-chat-latest"
 
     api_key = _first_env(f"{provider.upper()}_API_KEY")
+    llm_kwargs: Dict[str, Any] = {}
+    base_url = _first_env(f"{provider.upper()}_BASE_URL")
+    if base_url:
+        # Lets the provider be pointed at a proxy or a local stand-in
+        llm_kwargs["base_url"] = base_url
     llm = ChatBot(
         llm_provider=provider,
         model_name=model_name,
         api_key=api_key,
+        **llm_kwargs,
     )
+    response_cache = LLMResponseCache.from_env()
 
     async def fetch_node(state: DailyState) -> Dict[str, Any]:
-        events = await fetch_events(
-            limit=int(os.getenv("POLYMARKET_EVENTS_LIMIT", "25")),
-            order=os.getenv("POLYMARKET_EVENTS_ORDER", "id"),
-            ascending=os.getenv("POLYMARKET_EVENTS_ASC", "false").lower() == "true",
-            closed=os.getenv("POLYMARKET_EVENTS_CLOSED", "false").lower() == "true",
+        fetched = await fetch_events_and_markets(
+            events_params={
+                "limit": int(os.getenv("POLYMARKET_EVENTS_LIMIT", "25")),
+                "order": os.getenv("POLYMARKET_EVENTS_ORDER", "id"),
+                "ascending": os.getenv("POLYMARKET_EVENTS_ASC", "false").lower() == "true",
+                "closed": os.getenv("POLYMARKET_EVENTS_CLOSED", "false").lower() == "true",
+            },
+            markets_params={
+                "limit": int(os.getenv("POLYMARKET_MARKETS_LIMIT", "50")),
+                "order": os.getenv("POLYMARKET_MARKETS_ORDER", "volume"),
+                "ascending": os.getenv("POLYMARKET_MARKETS_ASC", "false").lower() == "true",
+                "active": os.getenv("POLYMARKET_MARKETS_ACTIVE", "true").lower() == "true",
+            },
         )
-        markets = await fetch_markets(
-            limit=int(os.getenv("POLYMARKET_MARKETS_LIMIT", "50")),
-            order=os.getenv("POLYMARKET_MARKETS_ORDER", "volume"),
-            ascending=os.getenv("POLYMARKET_MARKETS_ASC", "false").lower() == "true",
-            active=os.getenv("POLYMARKET_MARKETS_ACTIVE", "true").lower() == "true",
-        )
-        slim_events = [_slim_event(event) for event in events]
-        slim_markets = [_slim_market(market) for market in markets]
-        return {"events": slim_events, "markets": slim_markets}
+        slim_events = [_slim_event(event) for event in fetched["events"]]
+        snapshot = MarketSnapshot.from_markets(fetched["markets"])
+        top_k = int(os.getenv("POLYMARKET_MARKETS_TOP_K", "20"))
+
+        market_changes: Dict[str, Any] = {}
+        if len(snapshot):
+            store = default_store()
+            baseline = store.load()
+            if baseline is not None:
+                market_changes = diff_snapshots(
+                    baseline,
+                    snapshot,
+                    price_threshold=float(os.getenv("POLYMARKET_DIFF_PRICE_THRESHOLD", "0.02")),
+                    volume_threshold=float(os.getenv("POLYMARKET_DIFF_VOLUME_THRESHOLD", "0.25")),
+                )
+            store.rotate(snapshot, baseline)
+
+        moved = changed_ids(market_changes) if market_changes else []
+        if moved:
+            # Only markets that actually moved go to the LLM
+            selected = snapshot.select_ids(moved[:top_k] if top_k > 0 else moved)
+        elif top_k > 0:
+            selected = snapshot.top_k(os.getenv("POLYMARKET_MARKETS_RANK_BY", "volume24hr"), top_k)
+        else:
+            selected = snapshot
+        slim_markets = [_slim_market(market) for market in selected.records]
+        return {
+            "events": slim_events,
+            "markets": slim_markets,
+            "fetch_errors": fetched["errors"],
+            "market_changes": market_changes,
+        }
 
     async def analyze_node(state: DailyState) -> Dict[str, Any]:
         today = _utc_today()
@@ -153,12 +210,37 @@ def build_daily_graph() -> GraphAgent:
             "newly active markets, and unresolved risks. Keep it factual and avoid giving "
             "investment advice. End with a clear disclaimer that this is not financial advice."
         )
-        content = f"Events: {state.get('events', [])}\nMarkets: {state.get('markets', [])}"
-        analysis = await llm.ask(
+        market_changes = state.get("market_changes") or {}
+        moved = changed_ids(market_changes) if market_changes else []
+        sections = []
+        if moved:
+            window = window_label(market_changes)
+            sections += [
+                (f"Markets that moved {window}", market_changes["changed"], CHANGE_COLUMNS),
+                (f"Markets newly active {window}", market_changes["new"], CHANGE_COLUMNS),
+                (f"Markets closed {window}", market_changes["closed"], CHANGE_COLUMNS),
+            ]
+        sections.append(("Events", state.get("events", []), EVENT_COLUMNS))
+        if not moved:
+            # Otherwise the change tables already cover the selected markets
+            sections.append(("Markets", state.get("markets", []), MARKET_COLUMNS))
+        content = pack_sections(sections, context_budget())
+        if market_changes:
+            content += (
+                f"\n\n{market_changes['unchanged_count']} tracked markets were unchanged and "
+                f"{len(market_changes['removed'])} left the tracked set."
+            )
+        fetch_errors = state.get("fetch_errors") or {}
+        if fetch_errors:
+            missing = ", ".join(f"{key} ({error})" for key, error in fetch_errors.items())
+            content += f"\nUnavailable data (do not speculate about it): {missing}"
+        analysis = await cached_ask(
+            llm,
             [
                 {"role": "system", "content": "You summarize prediction market data responsibly."},
                 {"role": "user", "content": f"{prompt}\n\n{content}"},
-            ]
+            ],
+            response_cache,
         )
         return {"analysis": analysis}
 
@@ -171,11 +253,13 @@ def build_daily_graph() -> GraphAgent:
             "Include a one-line disclaimer that this is not financial advice."
         )
         analysis = state.get("analysis", "")
-        script = await llm.ask(
+        script = await cached_ask(
+            llm,
             [
                 {"role": "system", "content": "You write concise scripts for short videos."},
                 {"role": "user", "content": f"{prompt}\n\nReference summary:\n{analysis}"},
-            ]
+            ],
+            response_cache,
         )
         return {"script": script}
 
@@ -183,7 +267,11 @@ def build_daily_graph() -> GraphAgent:
         if not _bool_env("ENABLE_VIDEO_GENERATION", False):
             return {"video_path": "video_skipped"}
         script = state.get("script", "")
-        video_path = generate_avatar_video(script=script, title="polymarket-daily")
+        if render_queue_serving():
+            # Hand the render to the server's queue and keep the graph moving
+            job = await render_queue().enqueue(script, "polymarket-daily")
+            return {"video_path": f"{RENDER_JOB_PREFIX}{job['id']}"}
+        video_path = await agenerate_avatar_video(script=script, title="polymarket-daily")
         return {"video_path": video_path}
 
     async def tweet_node(state: DailyState) -> Dict[str, Any]:
@@ -191,7 +279,11 @@ def build_daily_graph() -> GraphAgent:
             return {"tweet_status": "tweet_skipped"}
         analysis = state.get("analysis", "")
         short_post = analysis[:260] + ("..." if len(analysis) > 260 else "")
-        tweet_status = post_to_x(short_post, media_path=state.get("video_path"))
+        # A queued render has to finish before it can be attached
+        media_path = await resolve_render_job(
+            state.get("video_path"), timeout=float(os.getenv("RENDER_QUEUE_WAIT_TIMEOUT", "900"))
+        )
+        tweet_status = post_to_x(short_post, media_path=media_path)
         return {"tweet_status": tweet_status}
 
     async def finalize_node(state: DailyState) -> Dict[str, Any]:
@@ -199,11 +291,11 @@ def build_daily_graph() -> GraphAgent:
         return {"output": output}
 
     graph = StateGraph(DailyState)
-    graph.add_node("fetch", fetch_node)
-    graph.add_node("analyze", analyze_node)
-    graph.add_node("script", script_node)
-    graph.add_node("video", video_node)
-    graph.add_node("tweet", tweet_node)
+    graph.add_node("fetch", traced("graph.fetch")(fetch_node))
+    graph.add_node("analyze", traced("graph.analyze")(analyze_node))
+    graph.add_node("script", traced("graph.script")(script_node))
+    graph.add_node("video", traced("graph.video")(video_node))
+    graph.add_node("tweet", traced("graph.tweet")(tweet_node))
     graph.add_node("finalize", finalize_node)
     graph.set_entry_point("fetch")
     graph.add_edge("fetch", "analyze")
@@ -7,11 +7,17 @@ from spoon_ai.agents.spoon_react import SpoonReactAI
 from spoon_ai.tools.mcp_tool import MCPTool
 from spoon_ai.tools.tool_manager import ToolManager
 
-from ..tools.polymarket import PolymarketEventsTool, PolymarketMarketsTool, PolymarketCompactTool
-from ..tools.video import VideoGenerateTool
+from ..tools.polymarket import (
+    PolymarketEventsTool,
+    PolymarketMarketsTool,
+    PolymarketCompactTool,
+    PolymarketScanTool,
+)
+from ..tools.video import VideoGenerateTool, VideoJobStatusTool
 from ..tools.twitter import TwitterPostTool
+from ..tracing import payload_size, record_usage, span
 
-from spoon_ai.schema import ToolChoice, AgentState
+from spoon_ai.schema import ToolCall, ToolChoice, AgentState
 import asyncio
 import logging
 from termcolor import colored
@@ -61,16 +67,27 @@ class CustomSpoonReactAI(SpoonReactAI):
         llm_timeout = getattr(self, '_default_timeout', 120.0)
         
         try:
-            response = await asyncio.wait_for(
-                self.llm.ask_tool(
-                    messages=self.memory.messages,
-                    system_msg=self.system_prompt,
-                    tools=unique_tools_list,
-                    tool_choice=self.tool_choices,
-                    output_queue=self.output_queue,
-                ),
-                timeout=llm_timeout,
-            )
+            with span(
+                "agent.think",
+                agent=self.name,
+                provider=getattr(self.llm, "llm_provider", None),
+                messages=len(self.memory.messages),
+                tools=len(unique_tools_list),
+            ) as current:
+                current.set("request_bytes", payload_size([getattr(m, "content", None) for m in self.memory.messages]))
+                response = await asyncio.wait_for(
+                    self.llm.ask_tool(
+                        messages=self.memory.messages,
+                        system_msg=self.system_prompt,
+                        tools=unique_tools_list,
+                        tool_choice=self.tool_choices,
+                        output_queue=self.output_queue,
+                    ),
+                    timeout=llm_timeout,
+                )
+                record_usage(current, response)
+                current.set("response_bytes", payload_size(response.content))
+                current.set("tool_calls", len(response.tool_calls or []))
         except asyncio.TimeoutError:
             logger.error(f"{self.name} LLM tool selection timed out after {llm_timeout}s")
             # Gracefully continue without tools
@@ -122,12 +139,27 @@ class CustomSpoonReactAI(SpoonReactAI):
             await self.add_message("assistant", f"Error encountered while thinking: {e}")
             return False
 
+    async def execute_tool(self, tool_call: ToolCall) -> str:
+        name = tool_call.function.name if tool_call and tool_call.function else "unknown"
+        arguments = tool_call.function.arguments if tool_call and tool_call.function else None
+        with span(
+            f"tool.{name}",
+            tool=name,
+            mcp=name not in self.available_tools.tool_map,
+            request_bytes=payload_size(arguments),
+        ) as current:
+            result = await super().execute_tool(tool_call)
+            current.set("response_bytes", payload_size(result))
+            return result
+
 def create_react_agent() -> SpoonReactAI:
     tools: List[object] = [
         PolymarketEventsTool(),
         PolymarketMarketsTool(),
         PolymarketCompactTool(),
+        PolymarketScanTool(),
         VideoGenerateTool(),
+        VideoJobStatusTool(),
         TwitterPostTool(),
     ]
     invideo_url = os.getenv("MCP_INVIDEO_URL")
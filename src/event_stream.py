@@ -0,0 +1,166 @@
+"""Sequenced, batched event stream behind /ws.
+
+Every event a session publishes gets a sequence number and is kept in a
+ring buffer. Events go out coalesced into ``batch`` frames of at most
+``WS_STREAM_BATCH_SIZE`` events or whatever arrived within
+``WS_STREAM_FLUSH_INTERVAL``; command replies and final results are sent
+right away. A client that reconnects with the last sequence number it saw
+gets everything after it replayed. Final results are retained even after
+they fall out of the ring buffer, so a reconnect never misses them.
+
+Frames are JSON text by default, or msgpack binary frames when the client
+asks for ``format=msgpack`` and the package is installed.
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Sent as soon as they are published instead of waiting for the batch window
+URGENT_TYPES = frozenset({"result", "error", "cancelled", "workflows"})
+# Kept outside the ring buffer so a resuming client always gets them
+RETAINED_TYPES = frozenset({"result", "error", "cancelled", "trace"})
+MAX_RETAINED = 100
+
+
+def negotiate_format(requested: Optional[str]) -> str:
+    """``msgpack`` if asked for and available, otherwise ``json``."""
+    if (requested or "").lower() == "msgpack" and msgpack is not None:
+        return "msgpack"
+    return "json"
+
+
+def encode_frame(frame: Dict[str, Any], fmt: str) -> Union[str, bytes]:
+    if fmt == "msgpack":
+        return msgpack.packb(frame, default=str)
+    return json.dumps(frame, default=str)
+
+
+class EventStream:
+    """Events of one /ws session, deliverable to whichever socket is attached."""
+
+    def __init__(
+        self,
+        buffer_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.batch_size = batch_size or int(os.getenv("WS_STREAM_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("WS_STREAM_FLUSH_INTERVAL", "0.05"))
+        self.seq = 0
+        self.frames_sent = 0
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=buffer_size or int(os.getenv("WS_STREAM_BUFFER", "1000")))
+        self._retained: Dict[int, Dict[str, Any]] = {}
+        self._websocket: Any = None
+        self._format = "json"
+        self._sent = 0
+        self._send_lock = asyncio.Lock()
+        self._ready = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def attached(self) -> bool:
+        return self._websocket is not None
+
+    async def attach(
+        self,
+        websocket: Any,
+        fmt: str = "json",
+        last_seq: Optional[int] = None,
+        hello: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Deliver to ``websocket`` from now on, replaying everything after ``last_seq``.
+
+        Without ``last_seq`` only new events are delivered.
+        """
+        async with self._send_lock:
+            self._websocket = websocket
+            self._format = fmt
+            self._sent = self.seq if last_seq is None else max(0, min(last_seq, self.seq))
+            await self._send_frame({"type": "hello", "format": fmt, "seq": self.seq, **(hello or {})})
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        await self.flush()
+
+    def detach(self, websocket: Any = None) -> None:
+        """Stop delivering (to ``websocket`` only, if given); events keep buffering."""
+        if websocket is None or websocket is self._websocket:
+            self._websocket = None
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        self.seq += 1
+        event = {"seq": self.seq, **event}
+        self._events.append(event)
+        if event.get("type") in RETAINED_TYPES:
+            self._retained[self.seq] = event
+            if len(self._retained) > MAX_RETAINED:
+                del self._retained[min(self._retained)]
+        if self._websocket is None:
+            return
+        if event.get("type") in URGENT_TYPES or self.seq - self._sent >= self.batch_size:
+            # Also where a slow client pushes back on the publisher
+            await self.flush()
+        else:
+            self._ready.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._ready.wait()
+            # Let a burst of events accumulate into one frame
+            await asyncio.sleep(self.flush_interval)
+            self._ready.clear()
+            await self.flush()
+
+    def _pending(self) -> Tuple[List[Dict[str, Any]], int]:
+        """The next batch to send and the sequence number it ends at."""
+        first = self._events[0]["seq"] if self._events else self.seq + 1
+        if self._sent + 1 < first:
+            # The client is further behind than the ring buffer reaches
+            missed = [event for seq, event in sorted(self._retained.items()) if self._sent < seq < first]
+            gap = {"type": "gap", "from_seq": self._sent + 1, "to_seq": first - 1}
+            return [gap] + missed, first - 1
+        start = self._sent + 1 - first
+        events = list(islice(self._events, start, start + self.batch_size))
+        return events, events[-1]["seq"]
+
+    async def flush(self) -> None:
+        async with self._send_lock:
+            while self._websocket is not None and self._sent < self.seq:
+                events, last = self._pending()
+                if not await self._send_frame({"type": "batch", "events": events}):
+                    break
+                self._sent = last
+
+    async def _send_frame(self, frame: Dict[str, Any]) -> bool:
+        websocket = self._websocket
+        if websocket is None:
+            return False
+        data = encode_frame(frame, self._format)
+        try:
+            if isinstance(data, bytes):
+                await websocket.send_bytes(data)
+            else:
+                await websocket.send_text(data)
+        except Exception:
+            # Socket is gone; keep buffering until a client resumes
+            self.detach(websocket)
+            return False
+        self.frames_sent += 1
+        return True
+
+    async def aclose(self) -> None:
+        self._websocket = None
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,158 @@
+"""Route log records to the /ws connection of the workflow that emitted them.
+
+A single root handler looks up the current workflow's sink in a contextvar,
+so a record is formatted once and touches one buffer no matter how many
+sockets are connected. Each sink is bounded: repeats of the previous line
+are coalesced, and when a slow client falls behind the oldest records are
+dropped (and counted) instead of growing memory.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_current_sink: contextvars.ContextVar[Optional["LogSink"]] = contextvars.ContextVar("log_sink", default=None)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class LogSink:
+    """Bounded buffer of one workflow's log records, sent to its socket in batches."""
+
+    def __init__(
+        self,
+        send: Send,
+        workflow_id: str,
+        max_records: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.workflow_id = workflow_id
+        self.max_records = max_records or int(os.getenv("WS_LOG_BUFFER", "500"))
+        self.batch_size = batch_size or int(os.getenv("WS_LOG_BATCH_SIZE", "50"))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv("WS_LOG_FLUSH_INTERVAL", "0.1"))
+        self.dropped = 0
+        self.closed = False
+        self._send = send
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._last_key: Any = None
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._ready = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def put(self, message: str, level: str, key: Any = None) -> None:
+        """Queue a formatted record; safe to call from any thread.
+
+        ``key`` identifies the unformatted record, so a repeat of the line
+        before it is coalesced even though its timestamp differs.
+        """
+        if self.closed:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._append(message, level, key)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._append, message, level, key)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+    def _append(self, message: str, level: str, key: Any) -> None:
+        if self.closed:
+            return
+        if self._buffer and key is not None and key == self._last_key:
+            last = self._buffer[-1]
+            last["repeat"] = last.get("repeat", 1) + 1
+            return
+        self._last_key = key
+        if len(self._buffer) >= self.max_records:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append({"message": message, "level": level})
+        self._ready.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._ready.wait()
+            # Let a burst of records accumulate into one frame
+            await asyncio.sleep(self.flush_interval)
+            self._ready.clear()
+            await self.flush()
+
+    async def _drain(self) -> None:
+        while self._buffer or self.dropped:
+            count = min(self.batch_size, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(count)]
+            payload: Dict[str, Any] = {"type": "logs", "workflow_id": self.workflow_id, "records": batch}
+            if self.dropped:
+                payload["dropped"] = self.dropped
+                self.dropped = 0
+            await self._send(payload)
+
+    async def flush(self) -> None:
+        async with self._send_lock:
+            await self._drain()
+
+    async def send(self, payload: Dict[str, Any]) -> None:
+        """Send a workflow message after the log records that precede it."""
+        async with self._send_lock:
+            await self._drain()
+            await self._send(payload)
+
+    async def aclose(self) -> None:
+        self.closed = True
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        await self.flush()
+
+
+def bind_log_sink(sink: Optional[LogSink]) -> contextvars.Token:
+    """Route records logged in the current context (and tasks/threads it spawns) to ``sink``."""
+    return _current_sink.set(sink)
+
+
+class WorkflowLogRouter(logging.Handler):
+    """Root handler: hands each record to the current workflow's sink, if any."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        sink = _current_sink.get()
+        if sink is None or sink.closed:
+            return
+        try:
+            formatted = self.format(record)
+            # format() leaves the interpolated message on record.message
+            sink.put(formatted, record.levelname, (record.name, record.levelno, record.message))
+        except Exception:
+            self.handleError(record)
+
+
+_ROUTER: Optional[WorkflowLogRouter] = None
+
+
+def install_log_router() -> WorkflowLogRouter:
+    """Attach the router to the root logger once (plus a console handler if none exists)."""
+    global _ROUTER
+    root_logger = logging.getLogger()
+    formatter = logging.Formatter(LOG_FORMAT)
+    if _ROUTER is None:
+        _ROUTER = WorkflowLogRouter(level=os.getenv("WS_LOG_LEVEL", "INFO").upper())
+        _ROUTER.setFormatter(formatter)
+        root_logger.addHandler(_ROUTER)
+    # Ensure logs also go to console (stdout)
+    if not any(isinstance(h, logging.StreamHandler) for h in root_logger.handlers):
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        root_logger.addHandler(console_handler)
+    root_logger.setLevel(logging.INFO)
+    return _ROUTER
@@ -3,19 +3,30 @@ import asyncio
 
 from dotenv import load_dotenv
 
+from src.agents.llm_transport import install_llm_transports
 from src.agents.react_agent import create_react_agent
 from src.agents.polymarket_graph import build_daily_graph
+from src.tools.http_pool import aclose_async_clients
+from src.tracing import start_trace
 
 
 async def run_react(prompt: str) -> None:
     agent = create_react_agent()
-    result = await agent.run(prompt)
+    try:
+        with start_trace("react.workflow"):
+            result = await agent.run(prompt)
+    finally:
+        await aclose_async_clients()
     print(result)
 
 
 async def run_graph() -> None:
     agent = build_daily_graph()
-    result = await agent.run("polymarket daily brief")
+    try:
+        with start_trace("graph.workflow"):
+            result = await agent.run("polymarket daily brief")
+    finally:
+        await aclose_async_clients()
     print(result)
 
 
@@ -32,6 +43,7 @@ def _default_react_prompt() -> str:
 
 def main() -> None:
     load_dotenv()
+    install_llm_transports()
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", choices=["react", "graph"], default="react")
     parser.add_argument("--prompt", default=_default_react_prompt())
@@ -0,0 +1,40 @@
+"""Upload totals the API server reads for /metrics.
+
+The MCP servers run in their own processes, so they cannot feed the API
+server's registry. Each process keeps its own totals in
+``METRICS_DIR/upload_<path>.<pid>.json`` and the API server sums the files;
+no file has more than one writer, so concurrent processes cannot lose updates.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+
+
+def record_upload_throughput(upload_path: str, num_bytes: int, seconds: float) -> None:
+    """Add one completed upload to this process's totals for ``upload_path`` (``youtube``, ``x``)."""
+    path = Path(os.getenv("METRICS_DIR", "outputs/metrics")) / f"upload_{upload_path}.{os.getpid()}.json"
+    try:
+        with _LOCK:
+            try:
+                stats = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                stats = {}
+            stats["uploads"] = stats.get("uploads", 0) + 1
+            stats["bytes"] = stats.get("bytes", 0) + num_bytes
+            stats["seconds"] = stats.get("seconds", 0.0) + seconds
+            stats["last_bytes_per_second"] = num_bytes / seconds if seconds > 0 else 0.0
+            stats["updated_at"] = time.time()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(stats), encoding="utf-8")
+            os.replace(tmp_path, path)
+    except OSError as exc:
+        logger.warning(f"Could not record upload stats in {path}: {exc}")
@@ -1,34 +1,95 @@
 import base64
 import hashlib
 import hmac
+import mmap
 import os
+import threading
 import time
 import uuid
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
-from urllib.parse import quote, urlencode, urlsplit, urlunsplit
+from typing import Dict, Optional
+from urllib.parse import quote, urlsplit, urlunsplit
 
 import httpx
 from mcp.server.fastmcp import FastMCP
 
+try:
+    from src.mcp.upload_stats import record_upload_throughput
+except ImportError:
+    # Launched as a script: src/mcp itself is on sys.path
+    from upload_stats import record_upload_throughput
 
+
+@lru_cache(maxsize=1024)
 def _percent_encode(value: str) -> str:
     return quote(value, safe="~")
 
 
+@lru_cache(maxsize=64)
 def _normalized_url(url: str) -> str:
     parts = urlsplit(url)
     return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
 
 
-def _collect_params(params: Dict[str, str]) -> List[Tuple[str, str]]:
-    items: List[Tuple[str, str]] = []
-    for key, value in params.items():
-        if value is None:
-            continue
-        items.append((str(key), str(value)))
-    items.sort(key=lambda kv: (kv[0], kv[1]))
-    return items
+class OAuth1Signer:
+    """OAuth 1.0a HMAC-SHA1 signer bound to one set of credentials.
+
+    The signing key, the HMAC state and the constant oauth_* parameters are
+    prepared once; ``sign`` only encodes the per-request values. Parameters
+    are sorted by encoded name and value, as RFC 5849 specifies.
+    """
+
+    def __init__(self, consumer_key: str, consumer_secret: str, token: str, token_secret: str):
+        signing_key = f"{_percent_encode(consumer_secret)}&{_percent_encode(token_secret)}"
+        self._hmac = hmac.new(signing_key.encode(), digestmod=hashlib.sha1)
+        constant = {
+            "oauth_consumer_key": consumer_key,
+            "oauth_signature_method": "HMAC-SHA1",
+            "oauth_token": token,
+            "oauth_version": "1.0",
+        }
+        self._constant_pairs = [(_percent_encode(k), _percent_encode(v)) for k, v in constant.items()]
+
+    @classmethod
+    def from_env(cls) -> "OAuth1Signer":
+        return cls(
+            consumer_key=_env_required("X_API_KEY"),
+            consumer_secret=_env_required("X_API_SECRET"),
+            token=_env_required("X_API_ACCESS_TOKEN"),
+            token_secret=_env_required("X_API_ACCESS_SECRET"),
+        )
+
+    def sign(
+        self,
+        method: str,
+        url: str,
+        params: Dict[str, str],
+        nonce: Optional[str] = None,
+        timestamp: Optional[str] = None,
+    ) -> str:
+        """Authorization header value for one request."""
+        # Nonce (hex) and timestamp (digits) never need percent-encoding
+        per_request = [
+            ("oauth_nonce", nonce or uuid.uuid4().hex),
+            ("oauth_timestamp", timestamp or str(int(time.time()))),
+        ]
+        oauth_pairs = self._constant_pairs + per_request
+        pairs = oauth_pairs + [
+            (_percent_encode(str(key)), _percent_encode(str(value)))
+            for key, value in params.items()
+            if value is not None
+        ]
+        pairs.sort()
+        normalized = "&".join(f"{k}={v}" for k, v in pairs)
+        base_string = f"{method.upper()}&{_percent_encode(_normalized_url(url))}&{quote(normalized, safe='~')}"
+        digest = self._hmac.copy()
+        digest.update(base_string.encode())
+        signature = base64.b64encode(digest.digest()).decode()
+        oauth_pairs.append(("oauth_signature", quote(signature, safe="~")))
+        header = ", ".join(f'{k}="{v}"' for k, v in sorted(oauth_pairs))
+        return f"OAuth {header}"
 
 
 def _oauth1_header(
@@ -40,36 +101,7 @@ def _oauth1_header(
     token: str,
     token_secret: str,
 ) -> str:
-    oauth_params = {
-        "oauth_consumer_key": consumer_key,
-        "oauth_nonce": uuid.uuid4().hex,
-        "oauth_signature_method": "HMAC-SHA1",
-        "oauth_timestamp": str(int(time.time())),
-        "oauth_token": token,
-        "oauth_version": "1.0",
-    }
-
-    signature_params = dict(params)
-    signature_params.update(oauth_params)
-    normalized = "&".join(
-        f"{_percent_encode(k)}={_percent_encode(v)}"
-        for k, v in _collect_params(signature_params)
-    )
-    base_elems = [
-        method.upper(),
-        _percent_encode(_normalized_url(url)),
-        _percent_encode(normalized),
-    ]
-    base_string = "&".join(base_elems)
-    signing_key = f"{_percent_encode(consumer_secret)}&{_percent_encode(token_secret)}"
-    digest = hmac.new(signing_key.encode(), base_string.encode(), hashlib.sha1).digest()
-    oauth_params["oauth_signature"] = base64.b64encode(digest).decode()
-
-    header = ", ".join(
-        f'{_percent_encode(k)}="{_percent_encode(v)}"'
-        for k, v in sorted(oauth_params.items())
-    )
-    return f"OAuth {header}"
+    return OAuth1Signer(consumer_key, consumer_secret, token, token_secret).sign(method, url, params)
 
 
 def _env_required(name: str) -> str:
@@ -91,6 +123,14 @@ def _chunk_size() -> int:
     return int(os.getenv("X_MEDIA_CHUNK_SIZE", "1048576"))
 
 
+def _upload_concurrency() -> int:
+    return max(1, int(os.getenv("X_MEDIA_UPLOAD_CONCURRENCY", "4")))
+
+
+def _append_max_retries() -> int:
+    return int(os.getenv("X_MEDIA_APPEND_MAX_RETRIES", "3"))
+
+
 def _processing_poll_interval() -> float:
     return float(os.getenv("X_MEDIA_STATUS_INTERVAL", "5"))
 
@@ -99,20 +139,71 @@ def _processing_max_attempts() -> int:
     return int(os.getenv("X_MEDIA_STATUS_MAX_ATTEMPTS", "30"))
 
 
+_SIGNER: Optional[OAuth1Signer] = None
+_SIGNER_LOCK = threading.Lock()
+
+
+def _signer() -> OAuth1Signer:
+    global _SIGNER
+    with _SIGNER_LOCK:
+        if _SIGNER is None:
+            _SIGNER = OAuth1Signer.from_env()
+        return _SIGNER
+
+
 def _auth_header(method: str, url: str, params: Dict[str, str]) -> str:
-    consumer_key = _env_required("X_API_KEY")
-    consumer_secret = _env_required("X_API_SECRET")
-    token = _env_required("X_API_ACCESS_TOKEN")
-    token_secret = _env_required("X_API_ACCESS_SECRET")
-    return _oauth1_header(
-        method=method,
-        url=url,
-        params=params,
-        consumer_key=consumer_key,
-        consumer_secret=consumer_secret,
-        token=token,
-        token_secret=token_secret,
-    )
+    return _signer().sign(method, url, params)
+
+
+_CLIENT: Optional[httpx.Client] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _x_client() -> httpx.Client:
+    """Shared keep-alive client, sized for the parallel APPEND workers."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.is_closed:
+            connections = _upload_concurrency() + 2
+            _CLIENT = httpx.Client(
+                timeout=60,
+                limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            )
+        return _CLIENT
+
+
+class _SegmentReader:
+    """Seekable read-only file object over a memoryview slice.
+
+    httpx streams multipart file fields with ``read``, so only the chunk being
+    sent is copied out of the mmap (``tobytes``), never the whole segment.
+    Returning bytes rather than sub-views keeps no exports of the mapping
+    alive once a request ends, so the mmap can always be closed.
+    """
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = self._view[self._position:end].tobytes()
+        self._position = end
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, min(len(self._view), offset))
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        self._view.release()
 
 
 def _upload_init(file_path: str, media_type: str, media_category: str) -> str:
@@ -125,53 +216,94 @@ def _upload_init(file_path: str, media_type: str, media_category: str) -> str:
         "media_category": media_category,
     }
     headers = {"Authorization": _auth_header("POST", url, params)}
-    with httpx.Client(timeout=60) as client:
-        response = client.post(url, data=params, headers=headers)
-        response.raise_for_status()
-        payload = response.json()
-        return str(payload.get("media_id_string") or payload.get("media_id"))
+    response = _x_client().post(url, data=params, headers=headers)
+    response.raise_for_status()
+    payload = response.json()
+    return str(payload.get("media_id_string") or payload.get("media_id"))
+
+
+def _append_segment(url: str, media_id: str, segment_index: int, view: memoryview) -> None:
+    params = {
+        "command": "APPEND",
+        "media_id": media_id,
+        "segment_index": str(segment_index),
+    }
+    max_retries = _append_max_retries()
+    attempt = 0
+    while True:
+        reader = _SegmentReader(view[:])
+        try:
+            # Sign per attempt so every retry carries a fresh nonce and timestamp
+            headers = {"Authorization": _auth_header("POST", url, params)}
+            response = _x_client().post(url, data=params, files={"media": reader}, headers=headers)
+            if response.status_code != 429 and response.status_code < 500:
+                response.raise_for_status()
+                return
+            error: Exception = httpx.HTTPStatusError(
+                f"APPEND segment {segment_index} returned {response.status_code}",
+                request=response.request,
+                response=response,
+            )
+        except httpx.TransportError as exc:
+            error = exc
+        finally:
+            reader.close()
+        attempt += 1
+        if attempt > max_retries:
+            raise error
+        time.sleep(min(30.0, 2 ** attempt))
 
 
 def _upload_append(file_path: str, media_id: str) -> None:
+    """Upload the file as APPEND segments, several at a time over one pooled client.
+
+    The file is memory-mapped and each segment is a view into the mapping, so
+    segments are not read into memory up front; each request copies out one
+    multipart chunk at a time. A failed segment is retried on its own.
+    """
     url = f"{_x_upload_base()}/1.1/media/upload.json"
     size = _chunk_size()
-    segment_index = 0
-    with open(file_path, "rb") as handle:
-        while True:
-            chunk = handle.read(size)
-            if not chunk:
-                break
-            params = {
-                "command": "APPEND",
-                "media_id": media_id,
-                "segment_index": str(segment_index),
-            }
-            headers = {"Authorization": _auth_header("POST", url, params)}
-            files = {"media": chunk}
-            with httpx.Client(timeout=60) as client:
-                response = client.post(url, data=params, files=files, headers=headers)
-                response.raise_for_status()
-            segment_index += 1
+    total = Path(file_path).stat().st_size
+    if total == 0:
+        return
+    started = time.monotonic()
+    with open(file_path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        segments = [view[offset:offset + size] for offset in range(0, total, size)]
+        try:
+            with ThreadPoolExecutor(max_workers=_upload_concurrency(), thread_name_prefix="x-append") as pool:
+                futures = [
+                    pool.submit(_append_segment, url, media_id, index, segment)
+                    for index, segment in enumerate(segments)
+                ]
+                done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in pending:
+                    future.cancel()
+                for future in done:
+                    future.result()
+        finally:
+            for segment in segments:
+                segment.release()
+            view.release()
+    record_upload_throughput("x", total, time.monotonic() - started)
 
 
 def _upload_finalize(media_id: str) -> Dict[str, object]:
     url = f"{_x_upload_base()}/1.1/media/upload.json"
     params = {"command": "FINALIZE", "media_id": media_id}
     headers = {"Authorization": _auth_header("POST", url, params)}
-    with httpx.Client(timeout=60) as client:
-        response = client.post(url, data=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = _x_client().post(url, data=params, headers=headers)
+    response.raise_for_status()
+    return response.json()
 
 
 def _upload_status(media_id: str) -> Dict[str, object]:
     url = f"{_x_upload_base()}/1.1/media/upload.json"
     params = {"command": "STATUS", "media_id": media_id}
     headers = {"Authorization": _auth_header("GET", url, params)}
-    with httpx.Client(timeout=60) as client:
-        response = client.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = _x_client().get(url, params=params, headers=headers)
+    response.raise_for_status()
+    return response.json()
 
 
 def _wait_for_processing(media_id: str) -> Dict[str, object]:
@@ -192,10 +324,9 @@ def _post_tweet(text: str, media_id: str | None = None) -> Dict[str, object]:
     body: Dict[str, object] = {"text": text}
     if media_id:
         body["media"] = {"media_ids": [media_id]}
-    with httpx.Client(timeout=60) as client:
-        response = client.post(url, json=body, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = _x_client().post(url, json=body, headers=headers)
+    response.raise_for_status()
+    return response.json()
 
 
 server = FastMCP("fastkol-x-mcp")
@@ -1,13 +1,41 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 
 import httpx
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 
+try:
+    from src.mcp.upload_stats import record_upload_throughput
+except ImportError:
+    # Launched as a script: src/mcp itself is on sys.path
+    from upload_stats import record_upload_throughput
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# videos.list accepts at most this many ids per call
+VIDEOS_LIST_MAX_IDS = 50
+
+# Resumable upload chunks must be a multiple of 256 KiB (except the last one)
+UPLOAD_CHUNK_ALIGNMENT = 256 * 1024
+
+ProgressCallback = Callable[[int, int], None]
+
+T = TypeVar("T")
+
+
+class UploadSessionExpired(RuntimeError):
+    pass
+
 
 def _env_required(name: str) -> str:
     value = os.getenv(name, "").strip()
@@ -28,7 +56,29 @@ def _upload_base() -> str:
     return os.getenv("YOUTUBE_UPLOAD_BASE_URL", "https://www.googleapis.com/upload").rstrip("/")
 
 
-def _get_access_token() -> str:
+def _upload_chunk_size() -> int:
+    requested = int(os.getenv("YOUTUBE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    return max(1, requested // UPLOAD_CHUNK_ALIGNMENT) * UPLOAD_CHUNK_ALIGNMENT
+
+
+def _upload_max_retries() -> int:
+    return int(os.getenv("YOUTUBE_UPLOAD_MAX_RETRIES", "5"))
+
+
+_CLIENT: Optional[httpx.Client] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def _client() -> httpx.Client:
+    """Shared keep-alive client for the Google APIs."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT.is_closed:
+            _CLIENT = httpx.Client(timeout=60)
+        return _CLIENT
+
+
+def _refresh_access_token() -> Dict[str, object]:
     client_id = _env_required("YOUTUBE_CLIENT_ID")
     client_secret = _env_required("YOUTUBE_CLIENT_SECRET")
     refresh_token = _env_required("YOUTUBE_REFRESH_TOKEN")
@@ -38,62 +88,361 @@ def _get_access_token() -> str:
         "refresh_token": refresh_token,
         "grant_type": "refresh_token",
     }
-    with httpx.Client(timeout=30) as client:
-        response = client.post(_token_endpoint(), data=data)
-        response.raise_for_status()
-        payload = response.json()
-    access_token = payload.get("access_token")
-    if not access_token:
+    response = _client().post(_token_endpoint(), data=data, timeout=30)
+    response.raise_for_status()
+    payload = response.json()
+    if not payload.get("access_token"):
         raise ValueError(f"Missing access_token in response: {payload}")
-    return str(access_token)
-
-
-def _initiate_resumable_upload(
-    access_token: str,
+    return payload
+
+
+class AccessTokenCache:
+    """Caches the OAuth access token until shortly before it expires.
+
+    The token is refreshed ``refresh_skew`` seconds ahead of ``expires_in`` so
+    a request never goes out with a token about to lapse. Concurrent callers
+    that find the token stale wait on one refresh instead of each hitting
+    Google. With ``path`` set the token is also kept on disk (mode 0600) for
+    the next process; it is tied to a hash of the client id and refresh token.
+    A token the API rejects (revoked early) is dropped with ``invalidate``.
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Dict[str, object]],
+        refresh_skew: float = 300.0,
+        path: Optional[str] = None,
+    ):
+        self._refresh = refresh
+        self.refresh_skew = refresh_skew
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._owner = ""
+
+    @staticmethod
+    def _credentials_id() -> str:
+        material = f"{os.getenv('YOUTUBE_CLIENT_ID', '')}|{os.getenv('YOUTUBE_REFRESH_TOKEN', '')}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _fresh(self, owner: str) -> bool:
+        return bool(self._token) and self._owner == owner and time.time() < self._expires_at - self.refresh_skew
+
+    def _load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            saved = json.loads(self.path.read_text(encoding="utf-8"))
+            self._token = str(saved["access_token"])
+            self._expires_at = float(saved["expires_at"])
+            self._owner = str(saved["owner"])
+        except (OSError, ValueError, KeyError):
+            return
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump({"access_token": self._token, "expires_at": self._expires_at, "owner": self._owner}, handle)
+        os.replace(tmp_path, self.path)
+
+    def get(self) -> str:
+        owner = self._credentials_id()
+        if self._fresh(owner):
+            return str(self._token)
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._fresh(owner):
+                return str(self._token)
+            if self._token is None:
+                self._load()
+                if self._fresh(owner):
+                    return str(self._token)
+            requested_at = time.time()
+            payload = self._refresh()
+            self._token = str(payload["access_token"])
+            self._expires_at = requested_at + float(payload.get("expires_in") or 3600)
+            self._owner = owner
+            self._save()
+            return self._token
+
+    def invalidate(self, token: str) -> None:
+        """Force a refresh on the next ``get`` if ``token`` is still the cached one."""
+        with self._lock:
+            if self._token is None:
+                self._load()
+            if self._token != token:
+                # Already replaced by another thread
+                return
+            self._expires_at = 0.0
+            self._save()
+
+
+_TOKENS: Optional[AccessTokenCache] = None
+
+
+def _token_cache() -> AccessTokenCache:
+    global _TOKENS
+    if _TOKENS is None:
+        _TOKENS = AccessTokenCache(
+            _refresh_access_token,
+            refresh_skew=float(os.getenv("YOUTUBE_TOKEN_REFRESH_SKEW", "300")),
+            path=os.getenv("YOUTUBE_TOKEN_CACHE_PATH", "").strip() or None,
+        )
+    return _TOKENS
+
+
+def _authorized(call: Callable[[str], T]) -> T:
+    """Run ``call(access_token)``; on a 401 drop the cached token and retry once with a new one."""
+    tokens = _token_cache()
+    access_token = tokens.get()
+    try:
+        return call(access_token)
+    except httpx.HTTPStatusError as exc:
+        if exc.response.status_code != 401:
+            raise
+        logger.warning("YouTube rejected the cached access token; refreshing it")
+        tokens.invalidate(access_token)
+        return call(tokens.get())
+
+
+def _video_metadata(
     title: str,
     description: str,
     tags: Optional[List[str]],
     category_id: Optional[str],
     privacy_status: str,
     made_for_kids: bool,
-) -> str:
-    url = f"{_upload_base()}/youtube/v3/videos"
-    params = {"uploadType": "resumable", "part": "snippet,status"}
+) -> Dict[str, object]:
+    """The ``videos.insert`` resource body (snippet and status)."""
     snippet: Dict[str, object] = {"title": title, "description": description}
     if tags:
         snippet["tags"] = tags
     if category_id:
         snippet["categoryId"] = category_id
     status = {"privacyStatus": privacy_status, "selfDeclaredMadeForKids": made_for_kids}
+    return {"snippet": snippet, "status": status}
+
+
+def _initiate_resumable_upload(access_token: str, body: Dict[str, object]) -> str:
+    url = f"{_upload_base()}/youtube/v3/videos"
+    params = {"uploadType": "resumable", "part": "snippet,status"}
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json; charset=UTF-8",
         "Accept": "application/json",
     }
-    body = {"snippet": snippet, "status": status}
-    with httpx.Client(timeout=60) as client:
-        response = client.post(url, params=params, json=body, headers=headers)
-        response.raise_for_status()
-        upload_url = response.headers.get("Location")
+    response = _client().post(url, params=params, json=body, headers=headers)
+    response.raise_for_status()
+    upload_url = response.headers.get("Location")
     if not upload_url:
         raise ValueError("Missing resumable upload URL (Location header).")
     return upload_url
 
 
-def _upload_video_file(upload_url: str, file_path: str, content_type: str) -> Dict[str, object]:
+class UploadSessionStore:
+    """JSON file of in-flight resumable upload URLs.
+
+    Keyed by the file's path, size and mtime plus a hash of the video
+    metadata, so a restarted server continues the same upload, while an edited
+    file or changed title, description, tags or privacy starts a fresh session. Google keeps sessions for about a
+    week; older entries are dropped.
+    """
+
+    def __init__(self, path: str, max_age: float = 6 * 24 * 3600):
+        self.path = Path(path)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(file_path: str, metadata: Dict[str, object]) -> str:
+        stat = Path(file_path).stat()
+        digest = hashlib.sha256(json.dumps(metadata, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        identity = f"{Path(file_path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{digest}"
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, object]]:
+        try:
+            sessions = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+        cutoff = time.time() - self.max_age
+        return {key: value for key, value in sessions.items() if float(value.get("created_at", 0)) >= cutoff}
+
+    def _save(self, sessions: Dict[str, Dict[str, object]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(sessions, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            session = self._load().get(key)
+        return str(session["upload_url"]) if session else None
+
+    def put(self, key: str, upload_url: str, file_path: str) -> None:
+        with self._lock:
+            sessions = self._load()
+            sessions[key] = {"upload_url": upload_url, "file_path": file_path, "created_at": time.time()}
+            self._save(sessions)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            sessions = self._load()
+            if sessions.pop(key, None) is not None:
+                self._save(sessions)
+
+
+_SESSIONS: Optional[UploadSessionStore] = None
+
+
+def _upload_sessions() -> UploadSessionStore:
+    global _SESSIONS
+    if _SESSIONS is None:
+        _SESSIONS = UploadSessionStore(
+            os.getenv("YOUTUBE_UPLOAD_SESSIONS_PATH", "outputs/youtube_upload_sessions.json")
+        )
+    return _SESSIONS
+
+
+def _next_offset(response: httpx.Response) -> int:
+    # 308 Resume Incomplete: "Range: bytes=0-N" lists what the server has
+    received = response.headers.get("Range", "")
+    if not received.startswith("bytes="):
+        return 0
+    return int(received.rpartition("-")[2]) + 1
+
+
+def _check_session(response: httpx.Response) -> None:
+    if response.status_code in (404, 410):
+        raise UploadSessionExpired(f"Resumable upload session is gone ({response.status_code})")
+
+
+def _query_upload_offset(upload_url: str, size: int) -> Tuple[int, Optional[Dict[str, object]]]:
+    """Ask the session how many bytes it holds; returns (offset, final payload if already done)."""
+    headers = {"Content-Range": f"bytes */{size}", "Content-Length": "0"}
+    response = _client().put(upload_url, headers=headers)
+    _check_session(response)
+    if response.status_code in (200, 201):
+        return size, response.json()
+    if response.status_code != 308:
+        response.raise_for_status()
+    return _next_offset(response), None
+
+
+def _upload_size(file_path: str) -> int:
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
     size = path.stat().st_size
-    headers = {
-        "Content-Type": content_type,
-        "Content-Length": str(size),
-    }
+    if size == 0:
+        # Content-Range cannot describe an empty upload
+        raise ValueError(f"File is empty: {file_path}")
+    return size
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+def _upload_video_file(
+    upload_url: str,
+    file_path: str,
+    content_type: str,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, object]:
+    """Send the file in aligned chunks, resuming from whatever the session already has.
+
+    Transient failures (network errors, 5xx, 429), including ones while
+    asking the session for its offset, re-query the session and continue from
+    there instead of restarting the upload.
+    """
+    path = Path(file_path)
+    size = _upload_size(file_path)
+    chunk_size = _upload_chunk_size()
+    max_retries = _upload_max_retries()
+
+    started = time.monotonic()
+    offset = 0
+    sent = 0
+    failures = 0
+    # Ask the session where to continue: before the first chunk and after every failure
+    resync = True
     with path.open("rb") as handle:
-        with httpx.Client(timeout=300) as client:
-            response = client.put(upload_url, content=handle, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        while True:
+            try:
+                if resync:
+                    offset, payload = _query_upload_offset(upload_url, size)
+                    if payload is not None:
+                        return payload
+                    resync = False
+                    if progress and offset:
+                        progress(offset, size)
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                if not _retryable(exc):
+                    raise
+                failures += 1
+                if failures > max_retries:
+                    raise
+                delay = min(60.0, 2 ** failures)
+                logger.warning(f"YouTube upload offset query failed ({exc}); retrying in {delay:.0f}s")
+                time.sleep(delay)
+                continue
+
+            handle.seek(offset)
+            chunk = handle.read(chunk_size)
+            end = offset + len(chunk) - 1
+            headers = {
+                "Content-Type": content_type,
+                "Content-Length": str(len(chunk)),
+                "Content-Range": f"bytes {offset}-{end}/{size}",
+            }
+            try:
+                response = _client().put(upload_url, content=chunk, headers=headers, timeout=300)
+                _check_session(response)
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise httpx.HTTPStatusError(
+                        f"Upload chunk returned {response.status_code}",
+                        request=response.request,
+                        response=response,
+                    )
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                failures += 1
+                if failures > max_retries:
+                    raise
+                delay = min(60.0, 2 ** failures)
+                logger.warning(f"YouTube upload chunk at {offset} failed ({exc}); resuming in {delay:.0f}s")
+                time.sleep(delay)
+                resync = True
+                continue
+
+            if response.status_code in (200, 201):
+                if progress:
+                    progress(size, size)
+                record_upload_throughput("youtube", sent + len(chunk), time.monotonic() - started)
+                return response.json()
+            if response.status_code != 308:
+                response.raise_for_status()
+            sent += len(chunk)
+            failures = 0
+            offset = _next_offset(response)
+            if progress:
+                progress(offset, size)
+
+
+def _log_upload_progress(file_path: str) -> ProgressCallback:
+    def _report(sent: int, total: int) -> None:
+        percent = sent * 100 / total if total else 100.0
+        logger.info(f"YouTube upload {Path(file_path).name}: {sent}/{total} bytes ({percent:.0f}%)")
+
+    return _report
 
 
 def _videos_update(
@@ -142,20 +491,43 @@ def _videos_update(
         "Content-Type": "application/json; charset=UTF-8",
         "Accept": "application/json",
     }
-    with httpx.Client(timeout=60) as client:
-        response = client.put(url, params=params, json=body, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = _client().put(url, params=params, json=body, headers=headers)
+    response.raise_for_status()
+    return response.json()
 
 
 def _videos_list(access_token: str, video_id: str, parts: str) -> Dict[str, object]:
     url = f"{_api_base()}/youtube/v3/videos"
     params = {"part": parts, "id": video_id}
     headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-    with httpx.Client(timeout=30) as client:
-        response = client.get(url, params=params, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    response = _client().get(url, params=params, headers=headers, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def _videos_list_batched(
+    access_token: str,
+    video_ids: List[str],
+    parts: str,
+) -> Dict[str, Optional[Dict[str, object]]]:
+    """videos.list for any number of ids: groups of 50 fetched concurrently.
+
+    Returns ``{video_id: item}`` in input order; ids YouTube does not return
+    (deleted, private to another channel, typos) map to ``None``.
+    """
+    unique_ids = list(dict.fromkeys(video_id.strip() for video_id in video_ids if video_id and video_id.strip()))
+    groups = [unique_ids[i:i + VIDEOS_LIST_MAX_IDS] for i in range(0, len(unique_ids), VIDEOS_LIST_MAX_IDS)]
+    results: Dict[str, Optional[Dict[str, object]]] = {video_id: None for video_id in unique_ids}
+    if not groups:
+        return results
+    workers = min(len(groups), max(1, int(os.getenv("YOUTUBE_STATUS_CONCURRENCY", "4"))))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="yt-status") as pool:
+        payloads = pool.map(lambda group: _videos_list(access_token, ",".join(group), parts), groups)
+        for payload in payloads:
+            for item in payload.get("items") or []:
+                if isinstance(item, dict) and item.get("id") in results:
+                    results[str(item["id"])] = item
+    return results
 
 
 def _thumbnails_set(access_token: str, video_id: str, image_path: str, content_type: str) -> Dict[str, object]:
@@ -166,10 +538,9 @@ def _thumbnails_set(access_token: str, video_id: str, image_path: str, content_t
     if not path.exists():
         raise FileNotFoundError(f"Thumbnail not found: {image_path}")
     with path.open("rb") as handle:
-        with httpx.Client(timeout=60) as client:
-            response = client.post(url, params=params, content=handle, headers=headers)
-            response.raise_for_status()
-            return response.json()
+        response = _client().post(url, params=params, content=handle, headers=headers)
+        response.raise_for_status()
+        return response.json()
 
 
 server = FastMCP("fastkol-youtube-mcp")
@@ -186,18 +557,38 @@ def youtube_upload_video(
     made_for_kids: bool = False,
     content_type: str = "video/mp4",
 ) -> Dict[str, object]:
-    """Upload a video to YouTube using a resumable upload session."""
-    access_token = _get_access_token()
-    upload_url = _initiate_resumable_upload(
-        access_token=access_token,
-        title=title,
-        description=description,
-        tags=tags,
-        category_id=category_id,
-        privacy_status=privacy_status,
-        made_for_kids=made_for_kids,
-    )
-    payload = _upload_video_file(upload_url, file_path, content_type)
+    """Upload a video to YouTube using a resumable upload session.
+
+    An interrupted upload of the same file is resumed where it stopped, even
+    across server restarts.
+    """
+    _upload_size(file_path)
+    sessions = _upload_sessions()
+    metadata = _video_metadata(title, description, tags, category_id, privacy_status, made_for_kids)
+    session_key = sessions.key(file_path, metadata)
+    progress = _log_upload_progress(file_path)
+    payload = None
+    upload_url = sessions.get(session_key)
+    if upload_url:
+        logger.info(f"Resuming YouTube upload session for {file_path}")
+        try:
+            payload = _upload_video_file(upload_url, file_path, content_type, progress)
+        except UploadSessionExpired:
+            sessions.discard(session_key)
+    # A brand-new session can still vanish; start one more before giving up
+    for attempt in range(2):
+        if payload is not None:
+            break
+        upload_url = _authorized(lambda access_token: _initiate_resumable_upload(access_token, metadata))
+        sessions.put(session_key, upload_url, file_path)
+        try:
+            payload = _upload_video_file(upload_url, file_path, content_type, progress)
+        except UploadSessionExpired:
+            sessions.discard(session_key)
+            if attempt:
+                raise
+            logger.warning(f"New YouTube upload session for {file_path} expired; starting another")
+    sessions.discard(session_key)
     video_id = payload.get("id")
     return {
         "video_id": video_id,
@@ -218,17 +609,18 @@ def youtube_update_video_metadata(
     contains_synthetic_media: Optional[bool] = None,
 ) -> Dict[str, object]:
     """Update YouTube video metadata (snippet/status)."""
-    access_token = _get_access_token()
-    payload = _videos_update(
-        access_token=access_token,
-        video_id=video_id,
-        title=title,
-        description=description,
-        tags=tags,
-        category_id=category_id,
-        privacy_status=privacy_status,
-        made_for_kids=made_for_kids,
-        contains_synthetic_media=contains_synthetic_media,
+    payload = _authorized(
+        lambda access_token: _videos_update(
+            access_token=access_token,
+            video_id=video_id,
+            title=title,
+            description=description,
+            tags=tags,
+            category_id=category_id,
+            privacy_status=privacy_status,
+            made_for_kids=made_for_kids,
+            contains_synthetic_media=contains_synthetic_media,
+        )
     )
     return {"video_id": video_id, "raw": payload}
 
@@ -236,11 +628,25 @@ def youtube_update_video_metadata(
 @server.tool()
 def youtube_get_video_status(video_id: str, parts: str = "status,processingDetails") -> Dict[str, object]:
     """Fetch video status/processing details."""
-    access_token = _get_access_token()
-    payload = _videos_list(access_token=access_token, video_id=video_id, parts=parts)
+    payload = _authorized(lambda access_token: _videos_list(access_token=access_token, video_id=video_id, parts=parts))
     return {"video_id": video_id, "raw": payload}
 
 
+@server.tool()
+def youtube_get_videos_status(
+    video_ids: List[str],
+    parts: str = "status,processingDetails",
+) -> Dict[str, object]:
+    """Fetch status/processing details for many videos in as few API calls as possible."""
+    videos = _authorized(
+        lambda access_token: _videos_list_batched(access_token=access_token, video_ids=video_ids, parts=parts)
+    )
+    return {
+        "videos": videos,
+        "missing": [video_id for video_id, item in videos.items() if item is None],
+    }
+
+
 @server.tool()
 def youtube_set_thumbnail(
     video_id: str,
@@ -248,12 +654,13 @@ def youtube_set_thumbnail(
     content_type: str = "image/jpeg",
 ) -> Dict[str, object]:
     """Upload and set a custom thumbnail for a video."""
-    access_token = _get_access_token()
-    payload = _thumbnails_set(
-        access_token=access_token,
-        video_id=video_id,
-        image_path=image_path,
-        content_type=content_type,
+    payload = _authorized(
+        lambda access_token: _thumbnails_set(
+            access_token=access_token,
+            video_id=video_id,
+            image_path=image_path,
+            content_type=content_type,
+        )
     )
     return {"video_id": video_id, "raw": payload}
 
@@ -0,0 +1,316 @@
+"""Prometheus text-format metrics for the API server.
+
+Live series (active workflows, stage latency, LLM calls and tokens) are fed
+by the tracing spans; everything else is read from the existing stats
+helpers when ``/metrics`` is scraped. The MCP servers run in their own
+processes, so they leave upload totals as per-process JSON files in
+``METRICS_DIR`` that are summed here.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached Gamma read up to a full avatar render
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Metric:
+    """One metric family: a counter or gauge keyed by label values."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def total(self, **labels: Any) -> float:
+        """Sum over every series whose labels include ``labels``."""
+        wanted = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(value for key, value in self._values.items() if all(key[i] == v for i, v in wanted))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+        return lines
+
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+
+class HistogramMetric(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label key -> (bucket counts, sum, count)
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * len(self.buckets), [0.0, 0.0]))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(counts), list(totals))) for key, (counts, totals) in self._series.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, (total, count)) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(names, key + (_format_value(bound),))} {bucket_count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_format_value(count)}")
+        return lines
+
+
+ACTIVE_WORKFLOWS = Metric("fastkol_active_workflows", "Workflows currently running.", ("kind",))
+WORKFLOWS = CounterMetric("fastkol_workflows_total", "Finished workflows by outcome.", ("kind", "status"))
+STAGE_SECONDS = HistogramMetric(
+    "fastkol_stage_duration_seconds", "Latency of traced stages (graph nodes, LLM calls, tools).", ("stage",)
+)
+STAGE_ERRORS = CounterMetric("fastkol_stage_errors_total", "Traced stages that raised.", ("stage",))
+LLM_CALLS = CounterMetric("fastkol_llm_calls_total", "LLM requests per provider.", ("provider", "cache"))
+LLM_TOKENS = CounterMetric(
+    "fastkol_llm_tokens_total", "LLM tokens per provider (estimated where the SDK gives no usage).", ("provider", "kind")
+)
+
+_LIVE: Tuple[Metric, ...] = (ACTIVE_WORKFLOWS, WORKFLOWS, STAGE_SECONDS, STAGE_ERRORS, LLM_CALLS, LLM_TOKENS)
+_INSTALLED = False
+
+
+@contextmanager
+def track_workflow(kind: str) -> Iterator[None]:
+    """Count the enclosed block as one running workflow of ``kind``."""
+    ACTIVE_WORKFLOWS.inc(kind=kind)
+    status = "ok"
+    try:
+        yield
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        ACTIVE_WORKFLOWS.dec(kind=kind)
+        WORKFLOWS.inc(kind=kind, status=status)
+
+
+def observe_span(span: Any) -> None:
+    """Tracing exporter: stage latency for every span, LLM counters for LLM spans."""
+    STAGE_SECONDS.observe(span.duration, stage=span.name)
+    if span.status == "error":
+        STAGE_ERRORS.inc(stage=span.name)
+    if span.name not in ("llm.ask", "agent.think"):
+        return
+    attributes = span.attributes
+    provider = attributes.get("provider") or "unknown"
+    cache_hit = attributes.get("cache_hit")
+    LLM_CALLS.inc(provider=provider, cache="hit" if cache_hit else "miss" if cache_hit is False else "none")
+    if cache_hit:
+        # Served from the response cache; no tokens were spent
+        return
+    for kind in ("prompt", "completion"):
+        tokens = attributes.get(f"{kind}_tokens")
+        if isinstance(tokens, (int, float)):
+            LLM_TOKENS.inc(tokens, provider=provider, kind=kind)
+
+
+def install_metrics() -> None:
+    """Start feeding finished spans into the live series, even with tracing disabled (idempotent)."""
+    global _INSTALLED
+    if _INSTALLED:
+        return
+    from .tracing import add_exporter
+
+    add_exporter(observe_span, always=True)
+    _INSTALLED = True
+
+
+def _rate_limit_metrics() -> List[Metric]:
+    from .tools.rate_limit import rate_limit_metrics, throttled_responses
+
+    requests = CounterMetric("fastkol_rate_limit_requests_total", "Requests admitted by the limiter.", ("host",))
+    wait_total = CounterMetric(
+        "fastkol_rate_limit_wait_seconds_total", "Time requests spent queued in the limiter.", ("host",)
+    )
+    wait_max = Metric("fastkol_rate_limit_wait_seconds_max", "Longest limiter wait so far.", ("host",))
+    queue_depth = Metric("fastkol_rate_limit_queue_depth", "Requests waiting in the limiter.", ("host",))
+    retries = CounterMetric("fastkol_rate_limit_retries_total", "429/503 retries made by the limiter.", ("host",))
+    throttled = CounterMetric("fastkol_http_throttled_total", "HTTP 429 responses received.", ("host",))
+    for host, snapshot in rate_limit_metrics().items():
+        requests.set(snapshot["requests"], host=host)
+        wait_total.set(snapshot["wait_seconds_total"], host=host)
+        wait_max.set(snapshot["wait_seconds_max"], host=host)
+        queue_depth.set(snapshot["queue_depth"], host=host)
+        retries.set(snapshot["retries"], host=host)
+    for host, count in throttled_responses().items():
+        throttled.set(count, host=host)
+    return [requests, wait_total, wait_max, queue_depth, retries, throttled]
+
+
+def _cache_metrics() -> List[Metric]:
+    from .tools.polymarket import gamma_cache_stats
+    from .tools.video import render_cache_stats
+
+    hits = CounterMetric("fastkol_cache_hits_total", "Cache lookups served from the cache.", ("cache",))
+    misses = CounterMetric("fastkol_cache_misses_total", "Cache lookups that went to the backend.", ("cache",))
+    ratio = Metric("fastkol_cache_hit_ratio", "Share of lookups served from the cache.", ("cache",))
+    caches: Dict[str, Tuple[float, float]] = {
+        "llm": (LLM_CALLS.total(cache="hit"), LLM_CALLS.total(cache="miss")),
+    }
+    gamma = gamma_cache_stats()
+    if gamma is not None:
+        caches["gamma"] = (gamma["hits"] + gamma["stale_hits"] + gamma["coalesced"], gamma["misses"])
+    render = render_cache_stats()
+    if render is not None:
+        caches["render"] = (render["hits"], render["misses"])
+    for name, (hit_count, miss_count) in caches.items():
+        hits.set(hit_count, cache=name)
+        misses.set(miss_count, cache=name)
+        lookups = hit_count + miss_count
+        ratio.set(hit_count / lookups if lookups else 0.0, cache=name)
+    return [hits, misses, ratio]
+
+
+def _pool_metrics() -> List[Metric]:
+    from .tools.http_pool import pool_usage
+
+    in_flight = Metric("fastkol_http_pool_in_flight_requests", "Requests sent and not yet finished.", ("client",))
+    limit = Metric("fastkol_http_pool_max_connections", "Connection limit of the pool.", ("client",))
+    for client, usage in pool_usage().items():
+        in_flight.set(usage["in_flight"], client=client)
+        limit.set(usage["max"], client=client)
+    return [in_flight, limit]
+
+
+def _render_queue_metrics() -> List[Metric]:
+    from .tools.video import render_queue_counts
+
+    jobs = Metric("fastkol_render_jobs", "Background render jobs by status.", ("status",))
+    for status, count in (render_queue_counts() or {}).items():
+        jobs.set(count, status=status)
+    return [jobs]
+
+
+def metrics_dir() -> Path:
+    return Path(os.getenv("METRICS_DIR", "outputs/metrics"))
+
+
+def _upload_metrics() -> List[Metric]:
+    uploads = CounterMetric("fastkol_uploads_total", "Completed uploads.", ("path",))
+    sent = CounterMetric("fastkol_upload_bytes_total", "Bytes uploaded.", ("path",))
+    seconds = CounterMetric("fastkol_upload_seconds_total", "Time spent uploading.", ("path",))
+    last = Metric("fastkol_upload_last_bytes_per_second", "Throughput of the most recent upload.", ("path",))
+    latest: Dict[str, float] = {}
+    # upload_<path>.<pid>.json, one file per MCP server process (see mcp/upload_stats.py)
+    for stats_file in sorted(metrics_dir().glob("upload_*.json")):
+        try:
+            stats = json.loads(stats_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Skipping unreadable upload stats {stats_file}: {exc}")
+            continue
+        path = stats_file.stem[len("upload_"):].split(".")[0]
+        uploads.inc(stats.get("uploads", 0), path=path)
+        sent.inc(stats.get("bytes", 0), path=path)
+        seconds.inc(stats.get("seconds", 0.0), path=path)
+        updated_at = float(stats.get("updated_at", 0.0))
+        if path not in latest or updated_at >= latest[path]:
+            latest[path] = updated_at
+            last.set(stats.get("last_bytes_per_second", 0.0), path=path)
+    return [uploads, sent, seconds, last]
+
+
+# In-memory state owned by the event loop: read on the loop
+_COLLECTORS = (_rate_limit_metrics, _cache_metrics, _pool_metrics)
+# SQLite and file reads: run in a worker thread by arender_metrics
+_BLOCKING_COLLECTORS = (_render_queue_metrics, _upload_metrics)
+
+
+def _collect(collectors: Sequence[Any]) -> List[Metric]:
+    families: List[Metric] = []
+    for collect in collectors:
+        try:
+            families += collect()
+        except Exception as exc:
+            # One broken source must not take the whole scrape down
+            logger.warning(f"Metrics collector {collect.__name__} failed: {exc}")
+    return families
+
+
+def _render(families: Sequence[Metric]) -> str:
+    lines: List[str] = []
+    for family in families:
+        lines += family.render()
+    return "\n".join(lines) + "\n"
+
+
+def render_metrics(collectors: Optional[Sequence[Any]] = None) -> str:
+    """The full exposition, text format 0.0.4, collected on the calling thread."""
+    if collectors is None:
+        collectors = _COLLECTORS + _BLOCKING_COLLECTORS
+    return _render(list(_LIVE) + _collect(collectors))
+
+
+async def arender_metrics() -> str:
+    """The exposition for ``/metrics``: loop-owned state is read on the loop, SQLite and files in a thread."""
+    families: List[Metric] = list(_LIVE) + _collect(_COLLECTORS)
+    families += await asyncio.to_thread(_collect, _BLOCKING_COLLECTORS)
+    return _render(families)
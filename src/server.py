@@ -1,66 +1,51 @@
 import json
 import os
-import time
 import logging
 import asyncio
-import httpx
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
 from dotenv import load_dotenv
 
-# --- Monkeypatch httpx for Gemini Rate Limiting ---
-# Gemini Free Tier is limited to 15 RPM (1 req / 4s) or 2 RPM (1 req / 30s) depending on model.
-# We enforce a global 4s delay between calls to 'generativelanguage' to be safe.
-
-original_post = httpx.AsyncClient.post
-GEMINI_LOCK = asyncio.Lock()
-NEXT_ALLOWED_TIME = 0
-GEMINI_DELAY = 4.0
-
-async def rate_limited_post(self, url, *args, **kwargs):
-    global NEXT_ALLOWED_TIME
-    url_str = str(url)
-    if not "generativelanguage.googleapis.com" in url_str:
-        return await original_post(self, url, *args, **kwargs)
-
-    retries = 5
-    for attempt in range(retries):
-        # 1. Wait for our local rate limiter slot
-        async with GEMINI_LOCK:
-            now = time.time()
-            wait_start = max(now, NEXT_ALLOWED_TIME)
-            NEXT_ALLOWED_TIME = wait_start + GEMINI_DELAY
-            sleep_duration = wait_start - now
-        
-        if sleep_duration > 0:
-            print(f"[{attempt+1}/{retries}] Rate limiting {url_str} | Queueing for: {sleep_duration:.2f}s")
-            await asyncio.sleep(sleep_duration)
-
-        # 2. Make the actual request
-        response = await original_post(self, url, *args, **kwargs)
-
-        # 3. Handle 429 Response from Google
-        if response.status_code == 429:
-            print(f"[{attempt+1}/{retries}] Hit 429 from Gemini! Backing off...")
-            # If we hit a real 429, our local timer was too aggressive or state was stale.
-            # Force a longer delay for the next attempt.
-            async with GEMINI_LOCK:
-                NEXT_ALLOWED_TIME = time.time() + (10.0 * (attempt + 1))
-            continue
-            
-        return response
-    
-    # If all retries failed, return the last response (likely 429)
-    return response
-
-httpx.AsyncClient.post = rate_limited_post
-# --------------------------------------------------
-
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from src.agents.llm_transport import install_llm_transports
 from src.agents.react_agent import create_react_agent
+from src.tools.heygen_callbacks import normalize_event, render_callbacks, verify_signature
+from src.tools.http_pool import aclose_async_clients
+from src.tools.rate_limit import rate_limit_flow
+from src.tools.render_queue import render_queue_enabled
+from src.tools.video import render_queue
+from src.event_stream import EventStream, negotiate_format
+from src.log_routing import LogSink, bind_log_sink, install_log_router
+from src.metrics import arender_metrics, install_metrics, track_workflow
+from src.tracing import start_trace
 
 load_dotenv()
+# Per-host token buckets (see RATE_LIMIT_RULES) with Retry-After aware
+# backoff. Must run before any LLM client is constructed.
+install_llm_transports()
+install_metrics()
+# One root handler routes each record to its own workflow's socket
+install_log_router()
+
+logger = logging.getLogger(__name__)
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if render_queue_enabled():
+        await render_queue().start()
+    yield
+    if render_queue_enabled():
+        await render_queue().stop()
+    # Drop the pooled keep-alive connections on shutdown
+    await aclose_async_clients()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -70,86 +55,249 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-class WebSocketHandler(logging.Handler):
-    def __init__(self, websocket: WebSocket):
-        super().__init__()
-        self.websocket = websocket
+@app.post("/callbacks/heygen")
+async def heygen_callback(request: Request):
+    """HeyGen webhook receiver: wakes workflows waiting on a finished render."""
+    body = await request.body()
+    secret = os.getenv("HEYGEN_WEBHOOK_SECRET", "").strip()
+    if not secret:
+        # Unsigned callbacks are never trusted
+        raise HTTPException(status_code=401, detail="Webhook secret not configured")
+    if not verify_signature(body, request.headers.get("signature"), secret):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        event = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    normalized = normalize_event(event)
+    if normalized is None:
+        return {"ok": True, "handled": False}
+    video_id, payload = normalized
+    render_callbacks().notify(video_id, payload)
+    logger.info(f"HeyGen callback received for {video_id}: {payload['status']}")
+    return {"ok": True, "handled": True}
+
+
+@app.post("/renders")
+async def submit_render(payload: dict):
+    """Queue a video render; resubmitting the same script returns the same job."""
+    script = str(payload.get("script") or "").strip()
+    if not script:
+        raise HTTPException(status_code=400, detail="script is required")
+    return await render_queue().enqueue(
+        script,
+        str(payload.get("title") or "daily-brief"),
+        int(payload.get("priority") or 0),
+    )
+
+
+@app.get("/renders/{job_id}")
+async def render_status(job_id: str):
+    job = await render_queue().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown render job")
+    return job
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    body = await arender_metrics()
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Prompt for workflows started over /ws
+WS_WORKFLOW_PROMPT = (
+    "fastKOL backend mode.\n"
+    "1) Use polymarket_compact to find top crypto markets. "
+    "2) Write a concise Polymarket report (markdown). "
+    "3) Generate a 15s narration script (female host, facing camera, approx 30 words). "
+    "4) THEN, use the 'heygen' MCP tool (generate_avatar_video) to create a video from the script. "
+    "   (Do NOT use the legacy VideoGenerateTool/video_generate). "
+    "5) Finally, use YouTube MCP tool to upload the video (set privacy=unlisted). "
+    "Return the report + video URL."
+)
+
+# Workflows started over /ws on this server, across all connections
+_WS_WORKFLOWS: Dict[str, asyncio.Task] = {}
+# Sessions by id, kept for WS_RESUME_GRACE seconds after their socket drops
+_WS_SESSIONS: Dict[str, "WorkflowSession"] = {}
+
+
+def _ws_max_workflows() -> int:
+    return int(os.getenv("WS_MAX_WORKFLOWS", "8"))
 
-    def emit(self, record):
+
+def _ws_max_workflows_per_connection() -> int:
+    return int(os.getenv("WS_MAX_WORKFLOWS_PER_CONNECTION", "2"))
+
+
+def _ws_resume_grace() -> float:
+    return float(os.getenv("WS_RESUME_GRACE", "30"))
+
+
+class WorkflowSession:
+    """Workflows started from one /ws client, each running as its own task.
+
+    Everything the workflows emit goes through the session's event stream,
+    so a client that drops and resumes within the grace period picks up
+    where it left off; after that the workflows are cancelled.
+    """
+
+    def __init__(self):
+        self.session_id = uuid.uuid4().hex
+        self.stream = EventStream()
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.started_at: Dict[str, float] = {}
+        self._expiry: Optional[asyncio.TimerHandle] = None
+        self._closing: Optional[asyncio.Task] = None
+
+    async def send(self, payload: Dict[str, Any]) -> None:
+        await self.stream.publish(payload)
+
+    def keep(self) -> None:
+        """A client (re)attached: call off any pending expiry."""
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+    def expire_later(self, grace: float) -> None:
+        self.keep()
+        self._expiry = asyncio.get_running_loop().call_later(grace, self._expire)
+
+    def _expire(self) -> None:
+        self._expiry = None
+        if not self.stream.attached:
+            self._closing = asyncio.create_task(self.close())
+
+    async def start(self) -> None:
+        if len(self.tasks) >= _ws_max_workflows_per_connection():
+            await self.send({"type": "error", "message": f"This connection already runs {len(self.tasks)} workflows"})
+            return
+        if len(_WS_WORKFLOWS) >= _ws_max_workflows():
+            await self.send({"type": "error", "message": "Server is at its workflow limit, try again later"})
+            return
+        workflow_id = uuid.uuid4().hex[:12]
+        task = asyncio.create_task(self._run(workflow_id), name=f"ws-workflow-{workflow_id}")
+        self.tasks[workflow_id] = task
+        self.started_at[workflow_id] = time.monotonic()
+        _WS_WORKFLOWS[workflow_id] = task
+        task.add_done_callback(lambda _task: self._forget(workflow_id))
+
+    def _forget(self, workflow_id: str) -> None:
+        self.tasks.pop(workflow_id, None)
+        self.started_at.pop(workflow_id, None)
+        _WS_WORKFLOWS.pop(workflow_id, None)
+
+    async def _run(self, workflow_id: str) -> None:
+        # Requests of this workflow queue fairly against other workflows in the limiter
+        rate_limit_flow.set(workflow_id)
+        # Records logged by this task (and the tasks/threads it starts) go to this socket only
+        sink = LogSink(self.send, workflow_id)
+        bind_log_sink(sink)
+        await sink.send({"type": "status", "stage": "start", "workflow_id": workflow_id, "message": "Workflow started"})
+        trace = None
         try:
-            msg = self.format(record)
-            # Create a simple JSON structure for the frontend to parse
-            data = {
-                "type": "log",
-                "message": msg,
-                "level": record.levelname
-            }
-            # We need to schedule the send_text coroutine
-            asyncio.create_task(self.websocket.send_text(json.dumps(data)))
-        except Exception:
-            self.handleError(record)
+            agent = create_react_agent()
+            with track_workflow("ws"), start_trace("ws.workflow", workflow_id=workflow_id) as trace:
+                result = await agent.run(WS_WORKFLOW_PROMPT)
+            await sink.send({
+                "type": "result",
+                "workflow_id": workflow_id,
+                "data": str(result),
+                "message": "Workflow completed",
+            })
+        except asyncio.CancelledError:
+            logger.info(f"Workflow {workflow_id} cancelled")
+            await sink.send({"type": "cancelled", "workflow_id": workflow_id, "message": "Workflow cancelled"})
+            raise
+        except Exception as e:
+            logger.error(f"Agent execution failed: {e}")
+            await sink.send({"type": "error", "workflow_id": workflow_id, "message": str(e)})
+        finally:
+            if trace is not None:
+                # Per-stage timings, payload sizes and token counts for the run
+                await sink.send({"type": "trace", "workflow_id": workflow_id, "summary": trace.summary()})
+            await sink.aclose()
+
+    async def cancel(self, workflow_id: str) -> None:
+        task = self.tasks.get(workflow_id)
+        if task is None:
+            await self.send({"type": "error", "workflow_id": workflow_id, "message": "Unknown workflow"})
+            return
+        task.cancel()
+
+    async def status(self) -> None:
+        now = time.monotonic()
+        await self.send({
+            "type": "workflows",
+            "workflows": [
+                {"workflow_id": workflow_id, "running_seconds": round(now - started, 1)}
+                for workflow_id, started in self.started_at.items()
+            ],
+            "limit": _ws_max_workflows_per_connection(),
+            "server_active": len(_WS_WORKFLOWS),
+            "server_limit": _ws_max_workflows(),
+        })
+
+    async def close(self) -> None:
+        """Cancel everything still running (LLM, HTTP and MCP calls unwind with the task)."""
+        _WS_SESSIONS.pop(self.session_id, None)
+        self.keep()
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            _done, pending = await asyncio.wait(tasks, timeout=float(os.getenv("WS_CANCEL_TIMEOUT", "10")))
+            if pending:
+                logger.warning(f"{len(pending)} workflows did not stop within the cancel timeout")
+        await self.stream.aclose()
+
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """Commands: ``start``, ``cancel <workflow_id>``, ``status``.
+
+    Query parameters: ``session`` and ``last_seq`` resume an earlier session
+    from the hello frame; ``format=msgpack`` asks for binary frames.
+    """
     await websocket.accept()
-    
-    # Setup custom logger handler for this connection
-    handler = WebSocketHandler(websocket)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    
-    # Attach to root logger
-    root_logger = logging.getLogger()
-    
-    # Ensure logs also go to console (stdout)
-    if not any(isinstance(h, logging.StreamHandler) for h in root_logger.handlers):
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
-        root_logger.addHandler(console_handler)
-        
-    root_logger.addHandler(handler)
-    root_logger.setLevel(logging.INFO)
+    params = websocket.query_params
+    session = _WS_SESSIONS.get(params.get("session", ""))
+    resumed = session is not None
+    if session is None:
+        session = WorkflowSession()
+        _WS_SESSIONS[session.session_id] = session
+    session.keep()
+    last_seq = params.get("last_seq", "")
+    await session.stream.attach(
+        websocket,
+        negotiate_format(params.get("format")),
+        int(last_seq) if resumed and last_seq.isdigit() else None,
+        hello={"session_id": session.session_id, "resumed": resumed},
+    )
 
     try:
         while True:
-            data = await websocket.receive_text()
-            if data == "start":
-                await websocket.send_text(json.dumps({"type": "status", "stage": "start", "message": "Workflow started"}))
-                
-                try:
-                    # Run the agent
-                    # We define the specific prompt for the workflow
-                    prompt = (
-                        "fastKOL backend mode.\n"
-                        "1) Use polymarket_compact to find top crypto markets. "
-                        "2) Write a concise Polymarket report (markdown). "
-                        "3) Generate a 15s narration script (female host, facing camera, approx 30 words). "
-                        "4) THEN, use the 'heygen' MCP tool (generate_avatar_video) to create a video from the script. "
-                        "   (Do NOT use the legacy VideoGenerateTool/video_generate). "
-                        "5) Finally, use YouTube MCP tool to upload the video (set privacy=unlisted). "
-                        "Return the report + video URL."
-                    )
-                    
-                    agent = create_react_agent()
-                    # Run agent in executor to avoid blocking the event loop if it's synchronous
-                    # If agent.run is async, await it directly. src/main.py suggests it IS async.
-                    result = await agent.run(prompt)
-                    
-                    await websocket.send_text(json.dumps({
-                        "type": "result", 
-                        "data": str(result),
-                        "message": "Workflow completed"
-                    }))
-                    
-                except Exception as e:
-                    await websocket.send_text(json.dumps({
-                        "type": "error", 
-                        "message": str(e)
-                    }))
-                    root_logger.error(f"Agent execution failed: {e}")
+            command, _, argument = (await websocket.receive_text()).strip().partition(" ")
+            if command == "start":
+                await session.start()
+            elif command == "cancel":
+                await session.cancel(argument.strip())
+            elif command == "status":
+                await session.status()
+            else:
+                await session.send({"type": "error", "message": f"Unknown command: {command}"})
 
     except WebSocketDisconnect:
         print("Client disconnected")
     finally:
-        root_logger.removeHandler(handler)
+        session.stream.detach(websocket)
+        if not session.stream.attached:
+            grace = _ws_resume_grace()
+            if grace > 0:
+                # Give the client a chance to reconnect before the runs are cancelled
+                session.expire_later(grace)
+            else:
+                # Abandoned runs must not keep spending LLM and render credits
+                await session.close()
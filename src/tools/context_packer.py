@@ -0,0 +1,150 @@
+import csv
+import io
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# Columns that carry signal for market analysis, in output order
+EVENT_COLUMNS = ["id", "title", "category", "volume", "volume24hr", "liquidity", "closed", "end_time"]
+MARKET_COLUMNS = ["id", "question", "outcomes", "outcomePrices", "volume", "volume24hr", "liquidity", "active"]
+CHANGE_COLUMNS = ["id", "question", "yes_price", "price_change", "volume24hr", "volume24hr_change"]
+
+Section = Tuple[str, Sequence[Dict[str, Any]], Optional[List[str]]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English/JSON-ish text)."""
+    return math.ceil(len(text) / 4)
+
+
+def _format_number(value: float) -> str:
+    if value != value:  # NaN
+        return ""
+    if abs(value) >= 1000:
+        return str(int(round(value)))
+    if abs(value) >= 1:
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return f"{value:.4g}"
+
+
+def _format_cell(value: Any, max_chars: int) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "Y" if value else "N"
+    if isinstance(value, (int, float)):
+        return _format_number(float(value))
+    if isinstance(value, (list, tuple)):
+        return "/".join(_format_cell(item, max_chars) for item in value)
+    text = str(value).strip()
+    if text.startswith("["):
+        # Gamma ships outcomes/outcomePrices as JSON-encoded lists
+        try:
+            decoded = json.loads(text)
+        except json.JSONDecodeError:
+            decoded = None
+        if isinstance(decoded, list):
+            return _format_cell(decoded, max_chars)
+    try:
+        return _format_number(float(text))
+    except ValueError:
+        pass
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip() + "..."
+    return text
+
+
+def _csv_line(cells: Sequence[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(cells)
+    return buffer.getvalue()
+
+
+def pack_table(
+    rows: Sequence[Dict[str, Any]],
+    columns: Optional[List[str]] = None,
+    *,
+    budget_tokens: int,
+    title: Optional[str] = None,
+    key: str = "id",
+    max_cell_chars: int = 120,
+) -> str:
+    """Serialize ``rows`` as a dense CSV table that fits ``budget_tokens``.
+
+    Rows are assumed to be in rank order. Duplicate ``key`` values are
+    dropped, columns that are empty for every row are omitted, columns with a
+    single shared value are hoisted into the title line, and trailing rows are
+    cut (with an ``omitted`` note) until the table fits the budget.
+    """
+    seen = set()
+    unique_rows = []
+    for row in rows:
+        row_key = row.get(key)
+        if row_key is not None:
+            if row_key in seen:
+                continue
+            seen.add(row_key)
+        unique_rows.append(row)
+
+    columns = columns or sorted({name for row in unique_rows for name in row})
+    cells = [
+        [
+            str(row.get(name, "")) if name == key else _format_cell(row.get(name), max_cell_chars)
+            for name in columns
+        ]
+        for row in unique_rows
+    ]
+
+    kept_columns: List[int] = []
+    constants: List[str] = []
+    for index, name in enumerate(columns):
+        values = {line[index] for line in cells}
+        if values == {""}:
+            continue
+        if len(cells) > 1 and len(values) == 1 and name != key:
+            constants.append(f"{name}={values.pop()}")
+            continue
+        kept_columns.append(index)
+
+    heading = title or ""
+    if constants:
+        heading = f"{heading} (all rows: {', '.join(constants)})".strip()
+    header = _csv_line([columns[i] for i in kept_columns])
+    lines = [heading] if heading else []
+    lines.append(header)
+
+    used = estimate_tokens("\n".join(lines))
+    emitted = 0
+    for line in cells:
+        text = _csv_line([line[i] for i in kept_columns])
+        cost = estimate_tokens(text) + 1
+        # Leave room for the omitted-rows note
+        if used + cost > budget_tokens - 8:
+            break
+        lines.append(text)
+        used += cost
+        emitted += 1
+
+    omitted = len(cells) - emitted
+    if omitted:
+        lines.append(f"... {omitted} more rows omitted")
+    return "\n".join(lines)
+
+
+def pack_sections(sections: Sequence[Section], budget_tokens: int) -> str:
+    """Pack several tables into one budget; unused share rolls to later sections."""
+    parts: List[str] = []
+    remaining = budget_tokens
+    pending = [section for section in sections if section[1]]
+    for index, (title, rows, columns) in enumerate(pending):
+        share = remaining // (len(pending) - index)
+        text = pack_table(rows, columns, budget_tokens=share, title=title)
+        parts.append(text)
+        remaining -= estimate_tokens(text)
+    return "\n\n".join(parts)
+
+
+def context_budget(default: int = 3000) -> int:
+    return int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", str(default)))
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+
+CHUNK_SIZE = 1 << 20
+# Seconds between sidecar checkpoints of segmented downloads
+CHECKPOINT_INTERVAL = 2.0
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+def _hash_file(path: Path, limit: Optional[int] = None) -> Any:
+    digest = hashlib.sha256()
+    remaining = limit
+    with path.open("rb") as handle:
+        while remaining is None or remaining > 0:
+            size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+            block = handle.read(size)
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest
+
+
+def _pwrite(path: Path, offset: int, data: bytes) -> None:
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+
+
+async def _probe(client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+    """Size and range support, from a one-byte ranged GET (HEAD is not always signed)."""
+    async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+        response.raise_for_status()
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            return {"ranges": True, "size": int(total) if total.isdigit() else None}
+        length = response.headers.get("Content-Length")
+        return {"ranges": False, "size": int(length) if length and length.isdigit() else None}
+
+
+async def _stream_sequential(
+    client: httpx.AsyncClient,
+    url: str,
+    part_path: Path,
+    chunk_size: int,
+    max_retries: int,
+) -> str:
+    """Append to ``part_path`` from its current size, resuming with Range after errors."""
+    attempt = 0
+    while True:
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        # Re-hash whatever an earlier attempt (or process) already wrote
+        digest = await asyncio.to_thread(_hash_file, part_path) if offset else hashlib.sha256()
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 416 and offset:
+                    # Nothing left past our offset: the part file is complete
+                    return digest.hexdigest()
+                response.raise_for_status()
+                mode = "ab"
+                if offset and response.status_code != 206:
+                    # Server ignored the Range header; start over
+                    mode = "wb"
+                    digest = hashlib.sha256()
+                handle = await asyncio.to_thread(part_path.open, mode)
+                try:
+                    async for block in response.aiter_bytes(chunk_size):
+                        digest.update(block)
+                        await asyncio.to_thread(handle.write, block)
+                finally:
+                    await asyncio.to_thread(handle.close)
+                expected = response.headers.get("Content-Length")
+                if expected and expected.isdigit() and response.num_bytes_downloaded != int(expected):
+                    # Body ended early without a transport error; retry from what is on disk
+                    raise httpx.RemoteProtocolError(
+                        f"Received {response.num_bytes_downloaded} of {expected} bytes", request=response.request
+                    )
+            return digest.hexdigest()
+        except httpx.TransportError as exc:
+            attempt += 1
+            if attempt > max_retries:
+                raise DownloadError(f"Download failed after {max_retries} retries: {exc}") from exc
+            await asyncio.sleep(min(30.0, 2 ** attempt))
+
+
+async def _fetch_segment(
+    client: httpx.AsyncClient,
+    url: str,
+    part_path: Path,
+    segment: List[int],
+    chunk_size: int,
+    max_retries: int,
+    on_progress: Optional[Callable[[], Awaitable[None]]] = None,
+) -> None:
+    # segment = [start, end_inclusive, bytes_done]; mutated in place as progress
+    attempt = 0
+    while segment[0] + segment[2] <= segment[1]:
+        position = segment[0] + segment[2]
+        try:
+            async with client.stream("GET", url, headers={"Range": f"bytes={position}-{segment[1]}"}) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise DownloadError("Server stopped honouring Range requests")
+                async for block in response.aiter_bytes(chunk_size):
+                    await asyncio.to_thread(_pwrite, part_path, segment[0] + segment[2], block)
+                    segment[2] += len(block)
+                    if on_progress is not None:
+                        await on_progress()
+        except httpx.TransportError as exc:
+            attempt += 1
+            if attempt > max_retries:
+                raise DownloadError(f"Segment {segment[0]}-{segment[1]} failed: {exc}") from exc
+            await asyncio.sleep(min(30.0, 2 ** attempt))
+
+
+async def _stream_segments(
+    client: httpx.AsyncClient,
+    url: str,
+    part_path: Path,
+    size: int,
+    segments: int,
+    chunk_size: int,
+    max_retries: int,
+) -> str:
+    """Download ``segments`` byte ranges concurrently into a preallocated part file.
+
+    Per-segment progress is checkpointed to a ``.json`` sidecar every
+    ``CHECKPOINT_INTERVAL`` seconds, so an interrupted download (even a hard
+    crash) resumes each range close to where it stopped. The SHA-256 is
+    computed in one sequential pass once all ranges are on disk.
+    """
+    state_path = part_path.with_name(part_path.name + ".json")
+    plan: Optional[List[List[int]]] = None
+    if part_path.exists() and state_path.exists():
+        try:
+            saved = json.loads(state_path.read_text(encoding="utf-8"))
+            if saved.get("size") == size:
+                plan = saved["segments"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            plan = None
+    fresh = plan is None
+    if plan is None:
+        step = -(-size // segments)
+        plan = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        with part_path.open("wb") as handle:
+            handle.truncate(size)
+
+    def _save_state(payload: str) -> None:
+        tmp_path = state_path.with_name(state_path.name + ".tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, state_path)
+
+    save_lock = asyncio.Lock()
+    last_saved = time.monotonic()
+
+    async def _checkpoint(force: bool = False) -> None:
+        nonlocal last_saved
+        if not force and (save_lock.locked() or time.monotonic() - last_saved < CHECKPOINT_INTERVAL):
+            return
+        async with save_lock:
+            last_saved = time.monotonic()
+            # Snapshot on the loop: only bytes already written are counted in plan
+            await asyncio.to_thread(_save_state, json.dumps({"size": size, "segments": plan}))
+
+    if fresh:
+        await _checkpoint(force=True)
+    tasks = [
+        asyncio.create_task(_fetch_segment(client, url, part_path, segment, chunk_size, max_retries, _checkpoint))
+        for segment in plan
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Stop the other segments before recording where they got to
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        await asyncio.shield(_checkpoint(force=True))
+    digest = await asyncio.to_thread(_hash_file, part_path, size)
+    state_path.unlink(missing_ok=True)
+    return digest.hexdigest()
+
+
+async def download_file(
+    client: httpx.AsyncClient,
+    url: str,
+    dest: Path,
+    *,
+    part_path: Optional[Path] = None,
+    segments: int = 1,
+    min_segment_size: int = 8 << 20,
+    chunk_size: int = CHUNK_SIZE,
+    max_retries: int = 3,
+) -> Dict[str, Any]:
+    """Stream ``url`` to ``dest`` with constant memory, resume and a SHA-256.
+
+    Data goes to ``part_path`` (default ``dest`` + ``.part``) and is renamed
+    into place only when complete. Reuse the same ``part_path`` for the same
+    resource to resume an interrupted download with HTTP Range requests. With
+    ``segments > 1`` large files are fetched as parallel ranged segments when
+    the server supports ranges.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part_path = part_path or dest.with_name(dest.name + ".part")
+
+    info: Dict[str, Any] = {"ranges": False, "size": None}
+    if segments > 1:
+        info = await _probe(client, url)
+    size = info["size"]
+    if segments > 1 and info["ranges"] and size and size >= segments * min_segment_size:
+        sha256 = await _stream_segments(client, url, part_path, size, segments, chunk_size, max_retries)
+    else:
+        state_path = part_path.with_name(part_path.name + ".json")
+        if state_path.exists():
+            # A preallocated segmented part file cannot be resumed by appending
+            part_path.unlink(missing_ok=True)
+            state_path.unlink()
+        sha256 = await _stream_sequential(client, url, part_path, chunk_size, max_retries)
+
+    written = part_path.stat().st_size
+    if size is not None and written != size:
+        raise DownloadError(f"Incomplete download: {written} of {size} bytes")
+    os.replace(part_path, dest)
+    return {"path": str(dest), "sha256": sha256, "bytes": written}
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+SUCCESS_EVENTS = {"avatar_video.success", "video.success"}
+FAILURE_EVENTS = {"avatar_video.fail", "video.fail"}
+
+
+def verify_signature(body: bytes, signature: Optional[str], secret: str) -> bool:
+    """Check HeyGen's ``signature`` header (hex HMAC-SHA256 of the raw body)."""
+    if not signature:
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip())
+
+
+def normalize_event(event: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Map a webhook body onto the shape of a ``video_status.get`` response.
+
+    Returns ``(video_id, status_payload)`` or ``None`` for unrelated events.
+    """
+    data = event.get("event_data") or {}
+    video_id = data.get("video_id")
+    if not video_id:
+        return None
+    event_type = str(event.get("event_type") or "")
+    if event_type in SUCCESS_EVENTS:
+        return str(video_id), {
+            "status": "completed",
+            "video_id": video_id,
+            "video_url": data.get("url"),
+            "callback_id": data.get("callback_id"),
+        }
+    if event_type in FAILURE_EVENTS:
+        return str(video_id), {
+            "status": "failed",
+            "video_id": video_id,
+            "error": data.get("msg"),
+            "callback_id": data.get("callback_id"),
+        }
+    return None
+
+
+class RenderCallbackRegistry:
+    """Hands completion callbacks to the workflows waiting on a video_id.
+
+    Callbacks that arrive before anyone waits are kept for ``retention``
+    seconds, so the race between generate() returning and the webhook firing
+    is harmless.
+    """
+
+    def __init__(self, retention: float = 900.0):
+        self.retention = retention
+        self._events: Dict[str, asyncio.Event] = {}
+        self._results: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def _purge(self) -> None:
+        cutoff = time.monotonic() - self.retention
+        for video_id, (received, _) in list(self._results.items()):
+            if received < cutoff:
+                del self._results[video_id]
+                self._events.pop(video_id, None)
+
+    def notify(self, video_id: str, payload: Dict[str, Any]) -> None:
+        self._purge()
+        self._results[video_id] = (time.monotonic(), payload)
+        self._events.setdefault(video_id, asyncio.Event()).set()
+
+    async def wait(self, video_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The callback payload for ``video_id``, or ``None`` after ``timeout`` seconds."""
+        result = self._results.get(video_id)
+        if result is not None:
+            return result[1]
+        event = self._events.setdefault(video_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        result = self._results.get(video_id)
+        return result[1] if result else None
+
+    def discard(self, video_id: str) -> None:
+        self._events.pop(video_id, None)
+        self._results.pop(video_id, None)
+
+
+_REGISTRY: Optional[RenderCallbackRegistry] = None
+
+
+def render_callbacks() -> RenderCallbackRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = RenderCallbackRegistry(retention=float(os.getenv("HEYGEN_CALLBACK_RETENTION", "900")))
+    return _REGISTRY
@@ -0,0 +1,242 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import urllib.request
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from .rate_limit import RateLimitedTransport
+
+
+logger = logging.getLogger(__name__)
+
+# name -> (client, loop the client was created on)
+_ASYNC_CLIENTS: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+# name -> in-flight counter of the current client
+_USAGE: Dict[str, "_Usage"] = {}
+# loop -> replaced clients waiting for aclose_async_clients() on that loop
+_RETIRED: Dict[asyncio.AbstractEventLoop, List[httpx.AsyncClient]] = {}
+
+
+class _Usage:
+    """Requests a pooled client has in flight (sent, response not yet closed)."""
+
+    def __init__(self, max_connections: Optional[int]):
+        self.in_flight = 0
+        self.max_connections = max_connections or 0
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close: Optional[Callable[[], None]] = on_close
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+        await self._stream.aclose()
+
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """Counts in-flight requests for ``pool_usage`` without reaching into httpcore."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, usage: _Usage):
+        self.inner = inner
+        self.usage = usage
+
+    def _done(self) -> None:
+        self.usage.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.usage.in_flight += 1
+        try:
+            response = await self.inner.handle_async_request(request)
+        except BaseException:
+            self._done()
+            raise
+        response.stream = _TrackedStream(response.stream, self._done)
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def pool_limits(prefix: str = "HTTP_POOL") -> httpx.Limits:
+    """Connection limits read from ``<prefix>_MAX_CONNECTIONS`` and friends.
+
+    Prefixed values fall back to the global ``HTTP_POOL_*`` settings.
+    """
+    max_connections = _env_int("HTTP_POOL_MAX_CONNECTIONS", 20)
+    max_keepalive = _env_int("HTTP_POOL_MAX_KEEPALIVE", 10)
+    keepalive_expiry = _env_float("HTTP_POOL_KEEPALIVE_EXPIRY", 30.0)
+    return httpx.Limits(
+        max_connections=_env_int(f"{prefix}_MAX_CONNECTIONS", max_connections),
+        max_keepalive_connections=_env_int(f"{prefix}_MAX_KEEPALIVE", max_keepalive),
+        keepalive_expiry=_env_float(f"{prefix}_KEEPALIVE_EXPIRY", keepalive_expiry),
+    )
+
+
+def _environment_proxies() -> Dict[str, Optional[str]]:
+    """URL pattern -> proxy URL (``None`` = direct), as httpx builds it with ``trust_env``.
+
+    Per-scheme ``HTTP_PROXY``/``HTTPS_PROXY``/``ALL_PROXY`` plus ``NO_PROXY``
+    exclusions, read through ``urllib.request.getproxies()``.
+    """
+    proxy_info = urllib.request.getproxies()
+    patterns: Dict[str, Optional[str]] = {}
+    for scheme in ("http", "https", "all"):
+        if proxy_info.get(scheme):
+            url = proxy_info[scheme]
+            patterns[f"{scheme}://"] = url if "://" in url else f"http://{url}"
+    for host in (host.strip() for host in proxy_info.get("no", "").split(",")):
+        if host == "*":
+            return {}
+        if not host:
+            continue
+        if "://" in host:
+            patterns[host] = None
+            continue
+        try:
+            address = ipaddress.ip_address(host.split("/")[0])
+        except ValueError:
+            address = None
+        if address is not None and address.version == 6:
+            patterns[f"all://[{host}]"] = None
+        elif address is not None or host.lower() == "localhost":
+            patterns[f"all://{host}"] = None
+        else:
+            patterns[f"all://*{host}"] = None
+    return patterns
+
+
+def pooled_transport(
+    limits: Optional[httpx.Limits] = None,
+    http2: bool = False,
+    proxy: Optional[str] = None,
+) -> RateLimitedTransport:
+    """Keep-alive transport (through ``proxy``, if given) behind the per-host rate limiter."""
+    inner = httpx.AsyncHTTPTransport(limits=limits or pool_limits(), http2=http2, proxy=proxy)
+    return RateLimitedTransport(inner)
+
+
+def pooled_mounts(limits: Optional[httpx.Limits] = None, http2: bool = False) -> Dict[str, Optional[RateLimitedTransport]]:
+    """Proxy mounts from the environment, for clients built with ``transport=pooled_transport()``.
+
+    httpx skips its environment proxy lookup when it is handed a transport, so
+    the same per-scheme routing (and ``NO_PROXY``) is rebuilt here. ``None``
+    entries fall through to the client's direct transport.
+    """
+    return {
+        pattern: None if proxy is None else pooled_transport(limits, http2, proxy)
+        for pattern, proxy in _environment_proxies().items()
+    }
+
+
+def get_async_client(
+    name: str,
+    *,
+    timeout: float,
+    limits: Optional[httpx.Limits] = None,
+    headers: Optional[Dict[str, str]] = None,
+    follow_redirects: bool = False,
+) -> httpx.AsyncClient:
+    """Return the shared keep-alive client registered under ``name``.
+
+    Clients are created lazily and reused for the life of the process. HTTP/2 is
+    enabled when the ``h2`` package is installed and ``HTTP_POOL_HTTP2`` is not
+    ``false``. A client is bound to the event loop it was created on, so a new
+    one is built if the caller runs on a different loop (e.g. repeated
+    ``asyncio.run`` calls in scripts).
+    """
+    loop = asyncio.get_running_loop()
+    limits = limits or pool_limits()
+    entry = _ASYNC_CLIENTS.get(name)
+    if entry is not None:
+        client, client_loop = entry
+        if not client.is_closed and client_loop is loop:
+            return client
+        _retire_client(client, client_loop)
+
+    http2 = os.getenv("HTTP_POOL_HTTP2", "true").lower() == "true" and _http2_available()
+    usage = _Usage(limits.max_connections)
+    client = httpx.AsyncClient(
+        timeout=timeout,
+        headers=headers,
+        follow_redirects=follow_redirects,
+        transport=_CountingTransport(pooled_transport(limits, http2), usage),
+        mounts={
+            pattern: None if transport is None else _CountingTransport(transport, usage)
+            for pattern, transport in pooled_mounts(limits, http2).items()
+        },
+    )
+    _ASYNC_CLIENTS[name] = (client, loop)
+    _USAGE[name] = usage
+    return client
+
+
+def _retire_client(client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a client that is being replaced, on the loop its connections belong to.
+
+    A loop running in another thread closes it right away; an idle loop closes
+    it in its next ``aclose_async_clients()``. A loop that was closed without
+    calling it can no longer release the connections.
+    """
+    for other in [other for other in _RETIRED if other.is_closed()]:
+        del _RETIRED[other]
+    if client.is_closed:
+        return
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    elif loop.is_closed():
+        logger.warning("Dropping a pooled HTTP client whose event loop closed without aclose_async_clients()")
+    else:
+        _RETIRED.setdefault(loop, []).append(client)
+
+
+async def aclose_async_clients() -> None:
+    """Close every pooled client created on the running loop.
+
+    Call it before the loop exits (end of ``asyncio.run``, server shutdown).
+    """
+    loop = asyncio.get_running_loop()
+    for client in _RETIRED.pop(loop, []):
+        await client.aclose()
+    for name, (client, client_loop) in list(_ASYNC_CLIENTS.items()):
+        if client_loop is not loop:
+            continue
+        _ASYNC_CLIENTS.pop(name, None)
+        await client.aclose()
+
+
+def pool_usage() -> Dict[str, Dict[str, int]]:
+    """In-flight requests and the connection limit of every pooled client, keyed by client name."""
+    usage: Dict[str, Dict[str, int]] = {}
+    for name, (client, _loop) in list(_ASYNC_CLIENTS.items()):
+        counter = _USAGE.get(name)
+        if client.is_closed or counter is None:
+            continue
+        usage[name] = {"in_flight": counter.in_flight, "max": counter.max_connections}
+    return usage
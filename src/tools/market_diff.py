@@ -0,0 +1,177 @@
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .market_snapshot import MarketSnapshot
+
+
+_PERSISTED_KEYS = (
+    "id",
+    "question",
+    "slug",
+    "active",
+    "closed",
+    "volume",
+    "volume24hr",
+    "liquidity",
+    "outcomePrices",
+    "outcomes",
+)
+
+
+class SnapshotStore:
+    """Keeps the baseline snapshot that new fetches are diffed against.
+
+    The baseline is only replaced once it is older than ``min_age`` seconds, so
+    repeated runs within that window are compared to the same reference point.
+    """
+
+    def __init__(self, path: str, min_age: float = 0.0):
+        self.path = Path(path)
+        self.min_age = min_age
+
+    def load(self) -> Optional[MarketSnapshot]:
+        if not self.path.exists():
+            return None
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        return MarketSnapshot.from_markets(payload.get("markets", []), taken_at=payload.get("taken_at"))
+
+    def save(self, snapshot: MarketSnapshot) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "taken_at": snapshot.taken_at,
+            "markets": [{key: record[key] for key in _PERSISTED_KEYS if key in record} for record in snapshot.records],
+        }
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def rotate(self, snapshot: MarketSnapshot, previous: Optional[MarketSnapshot]) -> None:
+        """Save ``snapshot`` as the new baseline if the current one is old enough."""
+        if previous is None or snapshot.taken_at - previous.taken_at >= self.min_age:
+            self.save(snapshot)
+
+
+def _round(value: float, digits: int = 4) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _is_closed(record: Dict[str, Any]) -> bool:
+    return bool(record.get("closed")) or record.get("active") is False
+
+
+def diff_snapshots(
+    previous: MarketSnapshot,
+    current: MarketSnapshot,
+    *,
+    price_threshold: float = 0.02,
+    volume_threshold: float = 0.25,
+) -> Dict[str, Any]:
+    """Per-market deltas between two snapshots, computed in one vectorized pass.
+
+    A market counts as changed when its first-outcome price moved by at least
+    ``price_threshold`` (absolute) or its 24h volume by at least
+    ``volume_threshold`` (relative). ``new`` markets were not in the baseline,
+    ``closed`` ones are now closed/inactive, and ``removed`` ones dropped out
+    of the fetched set (they may simply have fallen out of the page window).
+    """
+    _, prev_idx, cur_idx = np.intersect1d(previous.ids, current.ids, assume_unique=False, return_indices=True)
+
+    prev_price = previous.yes_price[prev_idx]
+    cur_price = current.yes_price[cur_idx]
+    price_change = cur_price - prev_price
+
+    prev_volume = previous.column("volume24hr")[prev_idx]
+    cur_volume = current.column("volume24hr")[cur_idx]
+    volume_change = cur_volume - prev_volume
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_ratio = np.abs(volume_change) / np.maximum(np.abs(prev_volume), 1.0)
+
+    now_closed = np.fromiter(
+        (_is_closed(current.records[i]) and not _is_closed(previous.records[j]) for i, j in zip(cur_idx, prev_idx)),
+        dtype=bool,
+        count=len(cur_idx),
+    )
+    moved = (np.abs(np.nan_to_num(price_change)) >= price_threshold) | (np.nan_to_num(volume_ratio) >= volume_threshold)
+    changed_mask = moved & ~now_closed
+    order = np.argsort(-np.abs(np.nan_to_num(price_change[changed_mask])), kind="stable")
+    changed_rows = np.flatnonzero(changed_mask)[order]
+
+    def _entry(row: int) -> Dict[str, Any]:
+        return {
+            "id": str(current.ids[cur_idx[row]]),
+            "question": current.records[cur_idx[row]].get("question"),
+            "yes_price": _round(cur_price[row]),
+            "price_change": _round(price_change[row]),
+            "volume24hr": _round(cur_volume[row], 2),
+            "volume24hr_change": _round(volume_change[row], 2),
+        }
+
+    changed = [_entry(row) for row in changed_rows]
+    closed = [_entry(row) for row in np.flatnonzero(now_closed)]
+
+    new_mask = np.ones(len(current), dtype=bool)
+    new_mask[cur_idx] = False
+    removed_mask = np.ones(len(previous), dtype=bool)
+    removed_mask[prev_idx] = False
+
+    new = [
+        {
+            "id": str(current.ids[i]),
+            "question": current.records[i].get("question"),
+            "yes_price": _round(current.yes_price[i]),
+            "volume24hr": _round(current.column("volume24hr")[i], 2),
+        }
+        for i in np.flatnonzero(new_mask)
+    ]
+    removed = [
+        {"id": str(previous.ids[i]), "question": previous.records[i].get("question")}
+        for i in np.flatnonzero(removed_mask)
+    ]
+
+    return {
+        "baseline_taken_at": previous.taken_at,
+        "taken_at": current.taken_at,
+        "changed": changed,
+        "new": new,
+        "closed": closed,
+        "removed": removed,
+        "unchanged_count": int(len(cur_idx) - len(changed) - len(closed)),
+    }
+
+
+def changed_ids(diff: Dict[str, Any]) -> List[str]:
+    """Ids worth showing the LLM: moved, new and closed markets, most moved first."""
+    return [entry["id"] for key in ("changed", "new", "closed") for entry in diff[key]]
+
+
+def snapshot_window() -> float:
+    """Seconds a baseline is kept before the next fetch replaces it."""
+    return float(os.getenv("POLYMARKET_SNAPSHOT_MIN_AGE", "3600"))
+
+
+def window_label(diff: Dict[str, Any]) -> str:
+    """Time since the baseline, rounded up to whole snapshot windows (at least an hour).
+
+    Keeps the label stable between runs against the same baseline, so it does
+    not make otherwise identical prompts miss the LLM response cache.
+    """
+    step = max(snapshot_window(), 3600.0)
+    elapsed = diff["taken_at"] - diff["baseline_taken_at"]
+    hours = max(1, math.ceil(elapsed / step)) * step / 3600
+    return f"over the last {hours:g}h"
+
+
+def default_store() -> SnapshotStore:
+    return SnapshotStore(
+        os.getenv("POLYMARKET_SNAPSHOT_PATH", "outputs/polymarket_snapshot.json"),
+        min_age=snapshot_window(),
+    )
+
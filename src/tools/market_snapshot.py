@@ -0,0 +1,148 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+NUMERIC_COLUMNS = ("volume", "volume24hr", "liquidity")
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _decode_list(value: Any) -> List[Any]:
+    """Gamma encodes ``outcomes``/``outcomePrices`` as JSON strings."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            decoded = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+        return decoded if isinstance(decoded, list) else []
+    return []
+
+
+class MarketSnapshot:
+    """Columnar view over one page (or scan) of Gamma markets.
+
+    Every market is parsed once into typed NumPy columns so ranking and
+    filtering are vectorized. ``outcome_prices`` is an ``(n, k)`` float array
+    padded with NaN for markets with fewer than ``k`` outcomes; ``yes_price``
+    is its first column. The source dicts are kept in ``records`` so the
+    selected slice can be emitted unchanged.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        outcome_prices: np.ndarray,
+        outcomes: List[List[str]],
+        records: List[Dict[str, Any]],
+        taken_at: float,
+    ):
+        self.ids = ids
+        self.columns = columns
+        self.outcome_prices = outcome_prices
+        self.outcomes = outcomes
+        self.records = records
+        self.taken_at = taken_at
+
+    @classmethod
+    def from_markets(cls, markets: Sequence[Dict[str, Any]], taken_at: Optional[float] = None) -> "MarketSnapshot":
+        records = list(markets)
+        count = len(records)
+        ids = np.array([str(market.get("id", "")) for market in records], dtype=str)
+        columns = {
+            name: np.fromiter((_as_float(market.get(name)) for market in records), dtype=np.float64, count=count)
+            for name in NUMERIC_COLUMNS
+        }
+        columns["active"] = np.fromiter((bool(market.get("active")) for market in records), dtype=bool, count=count)
+
+        decoded_prices = [[_as_float(price) for price in _decode_list(market.get("outcomePrices"))] for market in records]
+        width = max((len(prices) for prices in decoded_prices), default=0)
+        outcome_prices = np.full((count, width), np.nan, dtype=np.float64)
+        for row, prices in enumerate(decoded_prices):
+            if prices:
+                outcome_prices[row, : len(prices)] = prices
+        outcomes = [[str(label) for label in _decode_list(market.get("outcomes"))] for market in records]
+
+        return cls(
+            ids=ids,
+            columns=columns,
+            outcome_prices=outcome_prices,
+            outcomes=outcomes,
+            records=records,
+            taken_at=time.time() if taken_at is None else taken_at,
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def yes_price(self) -> np.ndarray:
+        if self.outcome_prices.shape[1] == 0:
+            return np.full(len(self), np.nan)
+        return self.outcome_prices[:, 0]
+
+    def column(self, name: str) -> np.ndarray:
+        if name == "yes_price":
+            return self.yes_price
+        try:
+            return self.columns[name]
+        except KeyError:
+            raise ValueError(f"Unknown snapshot column: {name}") from None
+
+    def take(self, indices: np.ndarray) -> "MarketSnapshot":
+        indices = np.asarray(indices, dtype=np.intp)
+        return MarketSnapshot(
+            ids=self.ids[indices],
+            columns={name: values[indices] for name, values in self.columns.items()},
+            outcome_prices=self.outcome_prices[indices],
+            outcomes=[self.outcomes[i] for i in indices],
+            records=[self.records[i] for i in indices],
+            taken_at=self.taken_at,
+        )
+
+    def select_ids(self, ids: Sequence[str]) -> "MarketSnapshot":
+        """Rows for ``ids`` in the given order; unknown ids are skipped."""
+        positions = {market_id: row for row, market_id in enumerate(self.ids.tolist())}
+        return self.take(np.array([positions[i] for i in ids if i in positions], dtype=np.intp))
+
+    def filter(self, mask: np.ndarray) -> "MarketSnapshot":
+        return self.take(np.flatnonzero(mask))
+
+    def where(self, name: str, minimum: Optional[float] = None, maximum: Optional[float] = None) -> "MarketSnapshot":
+        values = self.column(name)
+        mask = ~np.isnan(values)
+        if minimum is not None:
+            mask &= values >= minimum
+        if maximum is not None:
+            mask &= values <= maximum
+        return self.filter(mask)
+
+    def _sort_keys(self, name: str, ascending: bool) -> np.ndarray:
+        values = self.column(name)
+        # NaN always sorts last
+        fill = np.inf if ascending else -np.inf
+        values = np.where(np.isnan(values), fill, values)
+        return values if ascending else -values
+
+    def sort_by(self, name: str, ascending: bool = False) -> "MarketSnapshot":
+        return self.take(np.argsort(self._sort_keys(name, ascending), kind="stable"))
+
+    def top_k(self, name: str, k: int, ascending: bool = False) -> "MarketSnapshot":
+        """The ``k`` best rows by ``name`` in rank order, via ``argpartition``."""
+        if k >= len(self):
+            return self.sort_by(name, ascending=ascending)
+        if k <= 0:
+            return self.take(np.array([], dtype=np.intp))
+        keys = self._sort_keys(name, ascending)
+        candidates = np.argpartition(keys, k - 1)[:k]
+        return self.take(candidates[np.argsort(keys[candidates], kind="stable")])
@@ -1,22 +1,63 @@
+import asyncio
 import os
-from typing import Any, Dict, List, Optional
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
 import json
 
 import httpx
 
 from spoon_ai.tools.base import BaseTool
 
+from .context_packer import EVENT_COLUMNS, MARKET_COLUMNS, pack_table
+from .http_pool import get_async_client, pool_limits
+from .market_snapshot import MarketSnapshot
+from .response_cache import AsyncTTLCache
+
 
 GAMMA_BASE_URL = os.getenv("POLYMARKET_GAMMA_BASE_URL", "https://gamma-api.polymarket.com")
 
 
-async def _get_json(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
-    url = f"{GAMMA_BASE_URL}{path}"
+def _gamma_client() -> httpx.AsyncClient:
     timeout = float(os.getenv("POLYMARKET_HTTP_TIMEOUT", "20"))
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        response = await client.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+    return get_async_client("polymarket_gamma", timeout=timeout, limits=pool_limits("POLYMARKET_HTTP"))
+
+
+_GAMMA_CACHE: Optional[AsyncTTLCache] = None
+
+
+def _gamma_cache() -> AsyncTTLCache:
+    global _GAMMA_CACHE
+    if _GAMMA_CACHE is None:
+        _GAMMA_CACHE = AsyncTTLCache(
+            max_entries=int(os.getenv("POLYMARKET_CACHE_MAX_ENTRIES", "256")),
+            default_ttl=float(os.getenv("POLYMARKET_CACHE_TTL", "30")),
+            stale_ttl=float(os.getenv("POLYMARKET_CACHE_STALE_TTL", "60")),
+        )
+    return _GAMMA_CACHE
+
+
+def _cache_ttl(path: str) -> float:
+    endpoint = path.strip("/").replace("/", "_").upper()
+    return float(os.getenv(f"POLYMARKET_CACHE_TTL_{endpoint}", os.getenv("POLYMARKET_CACHE_TTL", "30")))
+
+
+def gamma_cache_stats() -> Optional[Dict[str, Any]]:
+    """Hit/miss counters of the Gamma response cache (``None`` before its first use)."""
+    return _GAMMA_CACHE.stats() if _GAMMA_CACHE is not None else None
+
+
+async def _fetch_json(path: str, params: Optional[Dict[str, Any]]) -> Any:
+    url = f"{GAMMA_BASE_URL}{path}"
+    response = await _gamma_client().get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+async def _get_json(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    if os.getenv("POLYMARKET_CACHE_ENABLED", "true").lower() != "true":
+        return await _fetch_json(path, params)
+    key = (path, tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())))
+    return await _gamma_cache().get_or_fetch(key, lambda: _fetch_json(path, params), ttl=_cache_ttl(path))
 
 
 async def fetch_events(
@@ -63,6 +104,157 @@ async def fetch_markets(
     return await _get_json("/markets", params=params)
 
 
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def volume_below(threshold: float, field: str = "volume") -> Callable[[Dict[str, Any]], bool]:
+    """Stop predicate for volume-sorted scans: true once ``field`` drops under ``threshold``."""
+    return lambda item: _as_float(item.get(field)) < threshold
+
+
+async def _iter_pages(
+    fetch_page: Callable[[int, int], Awaitable[List[Dict[str, Any]]]],
+    *,
+    offset: int,
+    page_size: int,
+    prefetch: int,
+    max_items: Optional[int],
+    until: Optional[Callable[[Dict[str, Any]], bool]],
+) -> AsyncIterator[Dict[str, Any]]:
+    if page_size <= 0:
+        raise ValueError(f"page_size must be positive, got {page_size}")
+    pending: Deque[asyncio.Task] = deque()
+    next_offset = offset
+
+    def _schedule() -> None:
+        nonlocal next_offset
+        pending.append(asyncio.ensure_future(fetch_page(next_offset, page_size)))
+        next_offset += page_size
+
+    yielded = 0
+    try:
+        for _ in range(prefetch + 1):
+            _schedule()
+        while pending:
+            page = await pending.popleft()
+            if len(page) < page_size:
+                # Last page: whatever was prefetched past it is empty
+                await _cancel_pages(pending)
+            else:
+                _schedule()
+            for item in page:
+                if until is not None and until(item):
+                    return
+                yield item
+                yielded += 1
+                if max_items is not None and yielded >= max_items:
+                    return
+    finally:
+        await _cancel_pages(pending)
+
+
+async def _cancel_pages(pending: Deque[asyncio.Task]) -> None:
+    """Cancel prefetched pages and wait for them, so none is left pending or unretrieved."""
+    tasks = list(pending)
+    pending.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def iter_events(
+    *,
+    page_size: int = 100,
+    prefetch: int = 2,
+    offset: int = 0,
+    max_items: Optional[int] = None,
+    until: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    **filters: Any,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream events across all pages, fetching up to ``prefetch`` pages ahead.
+
+    ``filters`` are the :func:`fetch_events` keyword arguments other than
+    ``limit``/``offset``. Iteration stops at the last page, after ``max_items``
+    items, or before the first item for which ``until(item)`` is true.
+    """
+    async def _page(page_offset: int, limit: int) -> List[Dict[str, Any]]:
+        return await fetch_events(limit=limit, offset=page_offset, **filters)
+
+    return _iter_pages(
+        _page, offset=offset, page_size=page_size, prefetch=prefetch, max_items=max_items, until=until
+    )
+
+
+def iter_markets(
+    *,
+    page_size: int = 100,
+    prefetch: int = 2,
+    offset: int = 0,
+    max_items: Optional[int] = None,
+    until: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    **filters: Any,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream markets across all pages; see :func:`iter_events`.
+
+    For example ``iter_markets(order="volume", until=volume_below(10_000))``
+    walks the volume-sorted universe and stops at the first small market.
+    """
+    async def _page(page_offset: int, limit: int) -> List[Dict[str, Any]]:
+        return await fetch_markets(limit=limit, offset=page_offset, **filters)
+
+    return _iter_pages(
+        _page, offset=offset, page_size=page_size, prefetch=prefetch, max_items=max_items, until=until
+    )
+
+
+def _tool_token_budget() -> int:
+    return int(os.getenv("POLYMARKET_TOOL_TOKEN_BUDGET", "2000"))
+
+
+def _describe_error(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+async def fetch_events_and_markets(
+    events_params: Optional[Dict[str, Any]] = None,
+    markets_params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fetch events and markets concurrently.
+
+    Returns ``{"events": [...], "markets": [...], "errors": {...}}``. When one
+    half fails its list is empty and ``errors`` maps ``"events"``/``"markets"``
+    to the failure. If both fail a ``RuntimeError`` naming both is raised.
+    Cancelling the caller cancels both in-flight requests.
+    """
+    results = await asyncio.gather(
+        fetch_events(**(events_params or {})),
+        fetch_markets(**(markets_params or {})),
+        return_exceptions=True,
+    )
+    payload: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for key, result in zip(("events", "markets"), results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                # CancelledError / KeyboardInterrupt must keep propagating
+                raise result
+            payload[key] = []
+            errors[key] = _describe_error(result)
+        else:
+            payload[key] = result
+
+    if len(errors) == 2:
+        raise RuntimeError(
+            f"Polymarket fetch failed (events: {errors['events']}; markets: {errors['markets']})"
+        ) from results[0]
+    payload["errors"] = errors
+    return payload
+
+
 def _compact_str(value: Any, limit: int = 200) -> Any:
     if not isinstance(value, str):
         return value
@@ -144,7 +336,7 @@ class PolymarketEventsTool(BaseTool):
             tag_id=tag_id,
             related_tags=related_tags,
         )
-        return str(events)
+        return pack_table(events, EVENT_COLUMNS, budget_tokens=_tool_token_budget(), title="Polymarket events")
 
 
 class PolymarketMarketsTool(BaseTool):
@@ -176,7 +368,7 @@ class PolymarketMarketsTool(BaseTool):
             ascending=ascending,
             active=active,
         )
-        return str(markets)
+        return pack_table(markets, MARKET_COLUMNS, budget_tokens=_tool_token_budget(), title="Polymarket markets")
 
 
 class PolymarketCompactTool(BaseTool):
@@ -187,14 +379,52 @@ class PolymarketCompactTool(BaseTool):
         "properties": {
             "events_limit": {"type": "integer", "default": 6},
             "markets_limit": {"type": "integer", "default": 12},
+            "rank_by": {
+                "type": "string",
+                "enum": ["volume24hr", "volume", "liquidity"],
+                "default": "volume24hr",
+            },
         },
     }
 
-    async def execute(self, events_limit: int = 6, markets_limit: int = 12) -> str:
-        events = await fetch_events(limit=events_limit)
-        markets = await fetch_markets(limit=markets_limit)
-        payload = {
-            "events": [_slim_event(event) for event in events],
-            "markets": [_slim_market(market) for market in markets],
+    async def execute(self, events_limit: int = 6, markets_limit: int = 12, rank_by: str = "volume24hr") -> str:
+        candidates = max(markets_limit, int(os.getenv("POLYMARKET_COMPACT_CANDIDATES", "100")))
+        fetched = await fetch_events_and_markets(
+            events_params={"limit": events_limit},
+            markets_params={"limit": candidates},
+        )
+        top_markets = MarketSnapshot.from_markets(fetched["markets"]).top_k(rank_by, markets_limit)
+        payload: Dict[str, Any] = {
+            "events": [_slim_event(event) for event in fetched["events"]],
+            "markets": [_slim_market(market) for market in top_markets.records],
         }
+        if fetched["errors"]:
+            payload["errors"] = fetched["errors"]
         return json.dumps(payload, ensure_ascii=True)
+
+
+class PolymarketScanTool(BaseTool):
+    name: str = "polymarket_scan"
+    description: str = (
+        "Scan all active Polymarket markets sorted by volume and return every market "
+        "above a volume threshold as compact JSON"
+    )
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "min_volume": {"type": "number", "default": 100000},
+            "max_items": {"type": "integer", "default": 200},
+        },
+    }
+
+    async def execute(self, min_volume: float = 100000, max_items: int = 200) -> str:
+        markets = [
+            _slim_market(market)
+            async for market in iter_markets(
+                order="volume",
+                ascending=False,
+                max_items=max_items,
+                until=volume_below(min_volume),
+            )
+        ]
+        return json.dumps({"markets": markets}, ensure_ascii=True)
@@ -0,0 +1,309 @@
+import asyncio
+import contextvars
+import email.utils
+import json
+import logging
+import os
+import random
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+# Identifies the workflow a request belongs to, for fair queuing between workflows
+rate_limit_flow: contextvars.ContextVar[str] = contextvars.ContextVar("rate_limit_flow", default="default")
+
+# No host is limited unless RATE_LIMIT_RULES lists it. Gemini is deliberately
+# absent: its SDK sends through its own sync client, not these transports.
+DEFAULT_RULES: Dict[str, Dict[str, Any]] = {}
+
+RETRY_STATUSES = {429, 503}
+
+# 429 responses per host, including hosts without a limiter rule
+_THROTTLED_RESPONSES: Counter = Counter()
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``capacity`` banked."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class HostLimiter:
+    """Rate limiter for one host: RPM and optional TPM buckets plus a fair queue.
+
+    Waiters are grouped by flow (see ``rate_limit_flow``) and served round-robin,
+    so one chatty workflow cannot starve the others. ``penalize`` blocks every
+    flow, which is how a ``Retry-After`` from the server is honoured.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        rpm: float,
+        burst: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: int = 5,
+        base_backoff: float = 2.0,
+        max_backoff: float = 60.0,
+    ):
+        self.host = host
+        self.requests = TokenBucket(rpm / 60.0, burst or max(1.0, rpm / 60.0))
+        self.tokens = TokenBucket(tpm / 60.0, tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.blocked_until = 0.0
+        # Waiters can only be woken on their own loop, so each loop gets its own
+        # queues and dispatcher (as get_async_client keys clients by loop).
+        # loop -> flow -> queue of (waiter, token cost)
+        self._queues: Dict[asyncio.AbstractEventLoop, "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]"] = {}
+        self._dispatchers: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+        self.metrics: Dict[str, float] = {
+            "requests": 0,
+            "throttled": 0,
+            "retries": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queues in list(self._queues.values()) for queue in queues.values())
+
+    def penalize(self, delay: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    async def acquire(self, cost: float = 0.0) -> float:
+        """Wait for a request slot (and ``cost`` tokens); returns seconds waited."""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        queues = self._queues.setdefault(loop, OrderedDict())
+        queues.setdefault(rate_limit_flow.get(), deque()).append((waiter, cost))
+        self._ensure_dispatcher(loop)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            self._discard(queues, waiter)
+            raise
+        waited = time.monotonic() - started
+        self.metrics["requests"] += 1
+        self.metrics["wait_seconds_total"] += waited
+        self.metrics["wait_seconds_max"] = max(self.metrics["wait_seconds_max"], waited)
+        return waited
+
+    @staticmethod
+    def _discard(queues: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]", waiter: asyncio.Future) -> None:
+        for flow, queue in list(queues.items()):
+            for entry in queue:
+                if entry[0] is waiter:
+                    queue.remove(entry)
+                    if not queue:
+                        del queues[flow]
+                    return
+
+    def _ensure_dispatcher(self, loop: asyncio.AbstractEventLoop) -> None:
+        for other in [other for other in list(self._queues) + list(self._dispatchers) if other.is_closed()]:
+            # Closed mid-wait (e.g. an earlier asyncio.run); nothing can wake those waiters
+            self._dispatchers.pop(other, None)
+            self._queues.pop(other, None)
+        dispatcher = self._dispatchers.get(loop)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[loop] = loop.create_task(self._dispatch(loop))
+
+    @staticmethod
+    def _pop_head(queues: "OrderedDict[str, Deque[Tuple[asyncio.Future, float]]]") -> Tuple[asyncio.Future, float]:
+        flow, queue = next(iter(queues.items()))
+        entry = queue.popleft()
+        del queues[flow]
+        if queue:
+            # Round-robin: this flow goes to the back of the line
+            queues[flow] = queue
+        return entry
+
+    async def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        queues = self._queues[loop]
+        while queues:
+            waiter, cost = next(iter(queues.values()))[0]
+            if waiter.done():
+                self._pop_head(queues)
+                continue
+            delay = max(0.0, self.blocked_until - time.monotonic())
+            delay = max(delay, self.requests.wait_time(1))
+            if self.tokens is not None and cost:
+                delay = max(delay, self.tokens.wait_time(cost))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            self._pop_head(queues)
+            self.requests.consume(1)
+            if self.tokens is not None and cost:
+                self.tokens.consume(cost)
+            waiter.set_result(None)
+        # Drained: forget the loop so a finished asyncio.run leaves nothing behind
+        if self._queues.get(loop) is queues:
+            del self._queues[loop]
+        self._dispatchers.pop(loop, None)
+
+    def backoff(self, attempt: int, response: httpx.Response) -> float:
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 1.0)
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = dict(self.metrics)
+        data["queue_depth"] = self.queue_depth
+        data["avg_wait_seconds"] = data["wait_seconds_total"] / data["requests"] if data["requests"] else 0.0
+        return data
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def _replayable(request: httpx.Request) -> bool:
+    """Whether the body is buffered, so the request can be sent again."""
+    try:
+        request.content
+    except httpx.RequestNotRead:
+        return False
+    return True
+
+
+def _estimate_request_tokens(request: httpx.Request) -> float:
+    length = request.headers.get("Content-Length")
+    return int(length) / 4 if length and length.isdigit() else 0.0
+
+
+class RateLimiterRegistry:
+    def __init__(self, rules: Dict[str, Dict[str, Any]]):
+        self.rules = rules
+        self._limiters: Dict[str, HostLimiter] = {}
+
+    @classmethod
+    def from_env(cls) -> "RateLimiterRegistry":
+        rules = dict(DEFAULT_RULES)
+        raw = os.getenv("RATE_LIMIT_RULES", "").strip()
+        if raw:
+            rules.update(json.loads(raw))
+        return cls(rules)
+
+    def for_host(self, host: str) -> Optional[HostLimiter]:
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            rule = self.rules.get(host)
+            if rule is None:
+                return None
+            limiter = HostLimiter(host, **rule)
+            self._limiters[host] = limiter
+        return limiter
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {host: limiter.snapshot() for host, limiter in self._limiters.items()}
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Wraps another transport and applies per-host limits and 429/503 retries.
+
+    Pass it to a client explicitly, e.g. ``httpx.AsyncClient(transport=RateLimitedTransport(...))``;
+    see ``http_pool.pooled_transport``.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, registry: Optional["RateLimiterRegistry"] = None):
+        self.inner = inner
+        self._registry = registry
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # The shared registry is resolved lazily so rules from .env are picked up
+        registry = self._registry or rate_limiter_registry()
+        limiter = registry.for_host(request.url.host)
+        if limiter is None:
+            response = await self.inner.handle_async_request(request)
+            if response.status_code == 429:
+                _THROTTLED_RESPONSES[request.url.host] += 1
+            return response
+
+        cost = _estimate_request_tokens(request)
+        # A streamed body is consumed by the first attempt and cannot be resent
+        max_retries = limiter.max_retries if _replayable(request) else 0
+        attempt = 0
+        while True:
+            await limiter.acquire(cost)
+            response = await self.inner.handle_async_request(request)
+            if response.status_code == 429:
+                _THROTTLED_RESPONSES[request.url.host] += 1
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return response
+            limiter.metrics["throttled"] += 1
+            limiter.metrics["retries"] += 1
+            delay = limiter.backoff(attempt, response)
+            limiter.penalize(delay)
+            logger.warning(
+                "[%d/%d] %s returned %d, backing off %.1fs",
+                attempt + 1,
+                limiter.max_retries,
+                request.url.host,
+                response.status_code,
+                delay,
+            )
+            await response.aclose()
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+_REGISTRY: Optional[RateLimiterRegistry] = None
+
+
+def rate_limiter_registry() -> RateLimiterRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = RateLimiterRegistry.from_env()
+    return _REGISTRY
+
+
+def rate_limit_metrics() -> Dict[str, Dict[str, Any]]:
+    return rate_limiter_registry().metrics()
+
+
+def throttled_responses() -> Dict[str, int]:
+    """429 responses seen per host since startup."""
+    return dict(_THROTTLED_RESPONSES)
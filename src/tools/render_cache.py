@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+# HeyGen video URLs are signed and stop working after about a week
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def render_key(
+    script: str,
+    avatar_id: str,
+    voice_id: str,
+    width: int,
+    height: int,
+    **extra: Any,
+) -> str:
+    """Content address of a render request.
+
+    Whitespace in the script is collapsed so re-wrapped copies of the same
+    narration hit. ``extra`` carries anything else that changes the output
+    (template id, test mode, provider).
+    """
+    canonical = json.dumps(
+        {
+            "script": re.sub(r"\s+", " ", script).strip(),
+            "avatar_id": avatar_id,
+            "voice_id": voice_id,
+            "dimension": [int(width), int(height)],
+            "extra": extra,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """SQLite map from a render request to the finished video.
+
+    Each entry records the provider's video_id, the (signed) video URL and,
+    once downloaded, the local file. Entries expire after ``ttl`` seconds,
+    matching how long the provider keeps the URL valid; a local file keeps
+    being served only while it still exists on disk.
+    """
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS renders ("
+                "key TEXT PRIMARY KEY, video_id TEXT, video_url TEXT, local_path TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    @classmethod
+    def from_env(cls) -> Optional["RenderCache"]:
+        if os.getenv("RENDER_CACHE_ENABLED", "true").lower() != "true":
+            return None
+        return cls(
+            os.getenv("RENDER_CACHE_PATH", "outputs/render_cache.sqlite3"),
+            ttl=float(os.getenv("RENDER_CACHE_TTL", str(DEFAULT_TTL))),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cached render for ``key``, or ``None`` if missing or expired."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT * FROM renders WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row["created_at"] > self.ttl:
+                conn.execute("DELETE FROM renders WHERE key = ?", (key,))
+                row = None
+        if row is None:
+            self.misses += 1
+            return None
+        entry = dict(row)
+        if entry["local_path"] and not Path(entry["local_path"]).exists():
+            entry["local_path"] = None
+        if not entry["local_path"] and not entry["video_url"]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(
+        self,
+        key: str,
+        video_id: Optional[str],
+        video_url: Optional[str] = None,
+        local_path: Optional[str] = None,
+    ) -> None:
+        """Record a completed render. Re-putting a key keeps its original expiry
+        and fills in fields (e.g. ``local_path`` after a download)."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO renders (key, video_id, video_url, local_path, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "video_id = COALESCE(excluded.video_id, video_id), "
+                "video_url = COALESCE(excluded.video_url, video_url), "
+                "local_path = COALESCE(excluded.local_path, local_path), "
+                "updated_at = excluded.updated_at",
+                (key, video_id, video_url, local_path, now, now),
+            )
+            conn.execute("DELETE FROM renders WHERE created_at < ?", (now - self.ttl,))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,391 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .render_cache import DEFAULT_TTL
+
+
+logger = logging.getLogger(__name__)
+
+Renderer = Callable[[str, str], Awaitable[str]]
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+
+def render_idempotency_key(script: str, title: str) -> str:
+    """Same normalized script + title + provider settings => same job."""
+    normalized = re.sub(r"\s+", " ", script).strip()
+    material = json.dumps(
+        {
+            "script": normalized,
+            "title": title,
+            "provider": os.getenv("VIDEO_PROVIDER", "mock").lower(),
+            "avatar_id": os.getenv("HEYGEN_AVATAR_ID", ""),
+            "voice_id": os.getenv("HEYGEN_VOICE_ID", ""),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _output_exists(result: Optional[str], finished_at: float, url_ttl: float) -> bool:
+    """Whether a succeeded job's video is still usable.
+
+    Local files must still exist; signed provider URLs are trusted for
+    ``url_ttl`` seconds after the job finished, like the render cache.
+    """
+    video = json.loads(result).get("video") if result else None
+    if not isinstance(video, str) or not video:
+        return False
+    if urlsplit(video).scheme in ("http", "https"):
+        return time.time() - finished_at < url_ttl
+    return Path(video).exists()
+
+
+class RenderQueue:
+    """SQLite-backed queue of video render jobs with a bounded worker pool.
+
+    Jobs run highest ``priority`` first, then oldest first. A failed render is
+    retried with exponential backoff up to ``max_attempts``. A running job
+    holds a lease that its worker renews every ``lease / 3`` seconds; jobs
+    whose lease lapsed (their process crashed) are requeued, while jobs
+    another live process is rendering are left alone. Resubmitting a
+    succeeded job reuses it only while its video is still usable.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 2,
+        max_attempts: int = 3,
+        retry_backoff: float = 30.0,
+        lease: float = 120.0,
+        url_ttl: float = DEFAULT_TTL,
+        *,
+        renderer: Renderer,
+    ):
+        self.path = Path(path)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease = lease
+        self.url_ttl = url_ttl
+        self.renderer = renderer
+        # Identifies this queue's claims, so other processes leave them alone
+        self.owner = uuid.uuid4().hex
+        # Set by start(): a long-lived process runs the workers
+        self.serving = False
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._finished: Dict[str, asyncio.Event] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, idempotency_key TEXT UNIQUE NOT NULL, "
+                "status TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "script TEXT NOT NULL, title TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_run_at REAL NOT NULL, "
+                "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, created_at)")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            # Databases created before leases existed
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if "lease_until" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+
+    @classmethod
+    def from_env(cls, renderer: Renderer) -> "RenderQueue":
+        return cls(
+            os.getenv("RENDER_QUEUE_PATH", "outputs/render_jobs.sqlite3"),
+            workers=int(os.getenv("RENDER_QUEUE_WORKERS", "2")),
+            max_attempts=int(os.getenv("RENDER_QUEUE_MAX_ATTEMPTS", "3")),
+            retry_backoff=float(os.getenv("RENDER_QUEUE_RETRY_BACKOFF", "30")),
+            lease=float(os.getenv("RENDER_QUEUE_LEASE", "120")),
+            url_ttl=float(os.getenv("RENDER_CACHE_TTL", str(DEFAULT_TTL))),
+            renderer=renderer,
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop("script", None)
+        job.pop("owner", None)
+        job.pop("lease_until", None)
+        if job.get("result"):
+            job["result"] = json.loads(job["result"])
+        return job
+
+    # -- synchronous storage helpers (run via asyncio.to_thread) --
+
+    def _enqueue(self, script: str, title: str, priority: int) -> Dict[str, Any]:
+        key = render_idempotency_key(script, title)
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO jobs (id, idempotency_key, status, priority, script, title, "
+                        "next_run_at, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?, ?, ?, ?)",
+                        (uuid.uuid4().hex, key, priority, script, title, now, now, now),
+                    )
+                elif row["status"] == "failed" or (
+                    row["status"] == "succeeded" and not _output_exists(row["result"], row["updated_at"], self.url_ttl)
+                ):
+                    # Resubmitting a failed render, or one whose video is gone or expired, starts it over
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', attempts = 0, result = NULL, error = NULL, priority = ?, "
+                        "next_run_at = ?, updated_at = ? WHERE id = ?",
+                        (priority, now, now, row["id"]),
+                    )
+                row = conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return self._row(row)
+
+    @staticmethod
+    def _requeue_expired(conn: sqlite3.Connection, now: float) -> int:
+        cursor = conn.execute(
+            "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE status = 'running' AND (lease_until IS NULL OR lease_until < ?)",
+            (now, now),
+        )
+        return cursor.rowcount
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(conn, now)
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND next_run_at <= ? "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_until = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (self.owner, now + self.lease, now, row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _next_due(self) -> Optional[float]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT MIN(next_run_at) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def _finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Any = None,
+        error: Optional[str] = None,
+        next_run_at: Optional[float] = None,
+    ) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            # A job whose lease lapsed may have been claimed elsewhere; leave it to that owner
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, next_run_at = COALESCE(?, next_run_at), "
+                "owner = NULL, lease_until = NULL, updated_at = ? WHERE id = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error, next_run_at, now, job_id, self.owner),
+            )
+
+    def _renew(self, job_id: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                (time.time() + self.lease, job_id, self.owner),
+            )
+
+    def _release(self) -> int:
+        """Hand this queue's running jobs back to the queue (clean shutdown)."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = 'running' AND owner = ?",
+                (time.time(), self.owner),
+            )
+            return cursor.rowcount
+
+    def _recover(self) -> int:
+        with closing(self._connect()) as conn:
+            return self._requeue_expired(conn, time.time())
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            return self._row(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            if status:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    # -- async API --
+
+    async def enqueue(self, script: str, title: str = "daily-brief", priority: int = 0) -> Dict[str, Any]:
+        """Submit a render (idempotent per script) and return the job record."""
+        job = await asyncio.to_thread(self._enqueue, script, title, priority)
+        self.ensure_started()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until the job succeeds or fails for good (or ``timeout`` elapses)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = await self.status(job_id)
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                return job
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return job
+            event = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                # Re-check periodically in case another process owns the job
+                await asyncio.wait_for(event.wait(), min(5.0, remaining) if remaining is not None else 5.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Requeue jobs whose worker died (lease expired), then start the workers.
+
+        Only the process that owns the queue (the server) should call this.
+        Short-lived callers such as the CLI render inline instead of queueing,
+        since their loop, and any workers on it, ends with the command.
+        """
+        recovered = await asyncio.to_thread(self._recover)
+        if recovered:
+            logger.info(f"Requeued {recovered} render jobs interrupted by a previous shutdown")
+        self.ensure_started()
+        self.serving = True
+
+    def ensure_started(self) -> None:
+        """Start the worker pool on the running loop if it is not running yet."""
+        if any(not task.done() for task in self._tasks):
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker(index)) for index in range(self.workers)]
+
+    async def stop(self) -> None:
+        self.serving = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self._release)
+
+    async def _idle(self) -> None:
+        due = await asyncio.to_thread(self._next_due)
+        timeout = 5.0 if due is None else max(0.05, min(5.0, due - time.time()))
+        assert self._wakeup is not None
+        # asyncio.wait rather than wait_for: wait_for can swallow a cancel that
+        # races with the wakeup, which would leave stop() hanging
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        finally:
+            waiter.cancel()
+        self._wakeup.clear()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await asyncio.to_thread(self._renew, job_id)
+            except sqlite3.Error as exc:
+                logger.warning(f"Could not renew lease of render job {job_id}: {exc}")
+
+    async def _run(self, index: int, job: Dict[str, Any]) -> None:
+        logger.info(f"Render worker {index} started job {job['id']} (attempt {job['attempts']})")
+        heartbeat = asyncio.ensure_future(self._heartbeat(job["id"]))
+        try:
+            output = await self.renderer(job["script"], job["title"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if job["attempts"] < self.max_attempts:
+                delay = self.retry_backoff * (2 ** (job["attempts"] - 1))
+                logger.warning(f"Render job {job['id']} failed ({exc}); retrying in {delay:.0f}s")
+                await asyncio.to_thread(self._finish, job["id"], "queued", None, str(exc), time.time() + delay)
+                return
+            logger.error(f"Render job {job['id']} failed permanently: {exc}")
+            await asyncio.to_thread(self._finish, job["id"], "failed", None, str(exc))
+        else:
+            await asyncio.to_thread(self._finish, job["id"], "succeeded", {"video": output})
+        finally:
+            heartbeat.cancel()
+        event = self._finished.pop(job["id"], None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self, index: int) -> None:
+        failures = 0
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+                if job is None:
+                    await self._idle()
+                else:
+                    await self._run(index, job)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # e.g. "database is locked": keep the worker alive and back off
+                failures += 1
+                delay = min(60.0, 2.0 ** failures)
+                logger.error(f"Render worker {index} error ({exc}); retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+
+def render_queue_enabled() -> bool:
+    return os.getenv("RENDER_QUEUE_ENABLED", "false").lower() == "true"
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+
+class AsyncTTLCache:
+    """In-memory LRU cache for async fetches with stale-while-revalidate.
+
+    Each entry is fresh for ``ttl`` seconds and may then be served stale for a
+    further ``stale_ttl`` seconds while a single background task refreshes it.
+    Concurrent misses on the same key share one in-flight fetch. Errors are
+    never cached. Cached values are shared between callers and must be treated
+    as read-only.
+    """
+
+    def __init__(self, max_entries: int = 256, default_ttl: float = 30.0, stale_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        # key -> (value, fresh_until, stale_until)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "errors": 0,
+            "evictions": 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"] + stats["coalesced"]
+        stats["size"] = len(self._entries)
+        stats["hit_ratio"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Fetcher,
+        *,
+        ttl: Optional[float] = None,
+        stale_ttl: Optional[float] = None,
+    ) -> Any:
+        ttl = self.default_ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return value
+            if now < stale_until:
+                self._stats["stale_hits"] += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self._stats["refreshes"] += 1
+                    self._start_fetch(key, fetch, ttl, stale_ttl, background=True)
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["misses"] += 1
+            task = self._start_fetch(key, fetch, ttl, stale_ttl, background=False)
+        # Shield so one cancelled waiter does not cancel the fetch shared by the others
+        return await asyncio.shield(task)
+
+    def _start_fetch(
+        self,
+        key: Hashable,
+        fetch: Fetcher,
+        ttl: float,
+        stale_ttl: float,
+        background: bool,
+    ) -> asyncio.Task:
+        task = asyncio.ensure_future(fetch())
+        self._inflight[key] = task
+
+        def _done(finished: asyncio.Task) -> None:
+            self._inflight.pop(key, None)
+            if finished.cancelled():
+                return
+            error = finished.exception()
+            if error is not None:
+                self._stats["errors"] += 1
+                if background:
+                    logger.warning("Background refresh failed for %s: %s", key, error)
+                return
+            self._store(key, finished.result(), ttl, stale_ttl)
+
+        task.add_done_callback(_done)
+        return task
+
+    def _store(self, key: Hashable, value: Any, ttl: float, stale_ttl: float) -> None:
+        now = time.monotonic()
+        self._entries[key] = (value, now + ttl, now + ttl + stale_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
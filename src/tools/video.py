@@ -1,13 +1,28 @@
+import asyncio
+import hashlib
 import json
+import logging
 import os
-import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
 
 import httpx
 from spoon_ai.tools.base import BaseTool
 
+from .download import DownloadError, download_file
+from .heygen_callbacks import render_callbacks
+from .http_pool import aclose_async_clients, get_async_client, pool_limits
+from .render_cache import RenderCache, render_key
+from .render_queue import RenderQueue, render_queue_enabled
+
+
+logger = logging.getLogger(__name__)
+
+HEYGEN_DIMENSION = (1280, 720)
+HEYGEN_TEST_MODE = True  # Set to True for testing to avoid credit usage
+
 
 def _write_mock(script: str, title: str) -> str:
     output_dir = Path(os.getenv("VIDEO_OUTPUT_DIR", "outputs"))
@@ -82,7 +97,7 @@ def _extract_video_url(data: Dict[str, Any]) -> Optional[str]:
     return None
 
 
-def _heygen_generate(script: str, title: str) -> Dict[str, Any]:
+async def _heygen_generate(script: str, title: str) -> Dict[str, Any]:
     api_key = os.getenv("HEYGEN_API_KEY", "").strip()
     if not api_key:
         raise ValueError("Missing HEYGEN_API_KEY")
@@ -115,7 +130,6 @@ def _heygen_generate(script: str, title: str) -> Dict[str, Any]:
         Voice,
         Dimension
     )
-    import asyncio
 
     client = HeyGenApiClient(api_key)
     try:
@@ -128,47 +142,33 @@ def _heygen_generate(script: str, title: str) -> Dict[str, Any]:
                     voice=Voice(input_text=script, voice_id=voice_id),
                 )
             ],
-            dimension=Dimension(width=1280, height=720),
-            test=True # Set to True for testing to avoid credit usage
+            dimension=Dimension(width=HEYGEN_DIMENSION[0], height=HEYGEN_DIMENSION[1]),
+            test=HEYGEN_TEST_MODE,
         )
-        
-        # Run the async call in a block because VideoGenerateTool.execute is sync 
-        # (Wait, actually VideoGenerateTool.execute is NOT sync usually in this codebase, let's verify)
-        # Looking at original code: 'response = client.post(...)' - it was using sync httpx.Client.
-        # HeyGenApiClient is async. We need to handle this.
-        
-        try:
-            import nest_asyncio
-            nest_asyncio.apply()
-        except ImportError:
-            pass
-
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        try:
-            if loop.is_running():
-                # If loop is already running, we have a problem in a sync tool 
-                # that wants to block. But with nest_asyncio it might work.
-                # However, a cleaner way for this project might be to just use await if we can,
-                # but VideoGenerateTool.execute is sync.
-                result = loop.run_until_complete(client.generate_avatar_video(request))
-            else:
-                result = loop.run_until_complete(client.generate_avatar_video(request))
-            
-            return result.model_dump()
-        finally:
-            # Don't close the loop if it's the global one
-            pass
+        result = await client.generate_avatar_video(request)
+        return result.model_dump()
     except Exception as e:
         print(f"HeyGen API Error in _heygen_generate: {e}")
         raise e
 
 
-def _heygen_poll(video_id: str) -> Dict[str, Any]:
+def _heygen_client() -> httpx.AsyncClient:
+    return get_async_client("heygen", timeout=_heygen_timeout(), limits=pool_limits("HEYGEN_HTTP"))
+
+
+def _is_terminal_status(data: Dict[str, Any]) -> bool:
+    status = str(data.get("status") or data.get("data", {}).get("status") or "").lower()
+    return status in {"completed", "done", "success", "failed", "error"}
+
+
+async def _heygen_poll(video_id: str) -> Dict[str, Any]:
+    """Wait for a render to finish.
+
+    The status endpoint is polled with an exponentially growing interval. With
+    ``HEYGEN_CALLBACK_ENABLED`` a webhook delivered to the server's
+    ``/callbacks/heygen`` endpoint cuts the current wait short; the callback is
+    only a wake-up, the result always comes from ``video_status.get``.
+    """
     api_key = os.getenv("HEYGEN_API_KEY", "").strip()
     if not api_key:
         raise ValueError("Missing HEYGEN_API_KEY")
@@ -176,37 +176,112 @@ def _heygen_poll(video_id: str) -> Dict[str, Any]:
     url = f"{_heygen_base_url()}{endpoint}"
     max_attempts = int(os.getenv("HEYGEN_STATUS_MAX_ATTEMPTS", "30"))
     interval = float(os.getenv("HEYGEN_STATUS_POLL_INTERVAL", "5"))
+    max_interval = float(os.getenv("HEYGEN_STATUS_POLL_MAX_INTERVAL", "60"))
+    backoff = float(os.getenv("HEYGEN_STATUS_POLL_BACKOFF", "1.5"))
+
+    callbacks = render_callbacks() if os.getenv("HEYGEN_CALLBACK_ENABLED", "false").lower() == "true" else None
+
+    async def _woken(timeout: float) -> bool:
+        if callbacks is None:
+            await asyncio.sleep(timeout)
+            return False
+        if await callbacks.wait(video_id, timeout) is None:
+            return False
+        # Consume it, so the next wait blocks until another callback arrives
+        callbacks.discard(video_id)
+        return True
 
-    with httpx.Client(timeout=_heygen_timeout()) as client:
+    try:
+        if callbacks is not None:
+            # Give the webhook a head start before spending status requests
+            await _woken(float(os.getenv("HEYGEN_CALLBACK_GRACE", "30")))
+
+        client = _heygen_client()
         for _ in range(max_attempts):
-            response = client.get(url, params={"video_id": video_id}, headers=_heygen_headers(api_key))
+            response = await client.get(url, params={"video_id": video_id}, headers=_heygen_headers(api_key))
             response.raise_for_status()
             data = response.json()
-            status = str(data.get("status") or data.get("data", {}).get("status") or "").lower()
-            if status in {"completed", "done", "success"}:
+            if _is_terminal_status(data):
                 return data
-            if status in {"failed", "error"}:
-                return data
-            time.sleep(interval)
-    return {"status": "timeout", "video_id": video_id}
+            if not await _woken(interval):
+                interval = min(max_interval, interval * backoff)
+        return {"status": "timeout", "video_id": video_id}
+    finally:
+        if callbacks is not None:
+            callbacks.discard(video_id)
 
 
-def _heygen_download(video_url: str, title: str) -> str:
+async def _heygen_download(video_url: str, title: str) -> str:
     output_dir = Path(os.getenv("VIDEO_OUTPUT_DIR", "outputs"))
     output_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
     video_path = output_dir / f"{title}-{timestamp}.mp4"
-    with httpx.Client(timeout=_heygen_timeout()) as client:
-        response = client.get(video_url)
-        response.raise_for_status()
-        video_path.write_bytes(response.content)
-    return str(video_path)
+    # Stable per-video part file (signed query strings change) so a retry resumes
+    resource = hashlib.sha1(urlsplit(video_url).path.encode("utf-8")).hexdigest()[:16]
+    result = await download_file(
+        _heygen_client(),
+        video_url,
+        video_path,
+        part_path=output_dir / f".{resource}.mp4.part",
+        segments=int(os.getenv("HEYGEN_DOWNLOAD_SEGMENTS", "1")),
+    )
+    _write_output_metadata({"video_url": video_url, **result}, f"{title}-heygen-download")
+    return result["path"]
 
 
-def generate_avatar_video(script: str, title: str = "daily-brief") -> str:
-    """Generate a digital human video from a script.
+_RENDER_CACHE: Optional[RenderCache] = None
+_RENDER_CACHE_LOADED = False
+
+
+def _render_cache() -> Optional[RenderCache]:
+    global _RENDER_CACHE, _RENDER_CACHE_LOADED
+    if not _RENDER_CACHE_LOADED:
+        _RENDER_CACHE = RenderCache.from_env()
+        _RENDER_CACHE_LOADED = True
+    return _RENDER_CACHE
+
+
+def render_cache_stats() -> Optional[Dict[str, Any]]:
+    """Hit/miss counters of the render cache (``None`` when disabled or not opened yet)."""
+    return _RENDER_CACHE.stats() if _RENDER_CACHE is not None else None
+
+
+def _heygen_render_key(script: str) -> str:
+    return render_key(
+        script,
+        os.getenv("HEYGEN_AVATAR_ID", "").strip(),
+        os.getenv("HEYGEN_VOICE_ID", "").strip(),
+        *HEYGEN_DIMENSION,
+        template_id=os.getenv("HEYGEN_TEMPLATE_ID", "").strip(),
+        test=HEYGEN_TEST_MODE,
+    )
+
+
+def _heygen_download_enabled() -> bool:
+    return os.getenv("HEYGEN_DOWNLOAD", "false").lower() == "true"
+
+
+async def _serve_cached_render(cache: RenderCache, key: str, entry: Dict[str, Any], title: str) -> Optional[str]:
+    """Reuse a finished render; ``None`` means it is unusable and must be regenerated."""
+    if entry["local_path"]:
+        return entry["local_path"]
+    if not _heygen_download_enabled():
+        return entry["video_url"]
+    try:
+        video_path = await _heygen_download(entry["video_url"], title)
+    except (httpx.HTTPError, DownloadError, OSError) as exc:
+        # Expired URL, network trouble or a bad local file: render it again
+        logger.warning(f"Cached HeyGen render {entry['video_id']} is unusable ({exc})")
+        return None
+    await asyncio.to_thread(cache.put, key, None, None, video_path)
+    return video_path
+
+
+async def agenerate_avatar_video(script: str, title: str = "daily-brief") -> str:
+    """Generate a digital human video from a script without blocking the event loop.
 
     Supports provider switching via VIDEO_PROVIDER (mock/heygen/did/synthesia/invideo).
+    Identical HeyGen requests are served from the render cache without a new render.
     """
     provider = os.getenv("VIDEO_PROVIDER", "mock").lower()
 
@@ -215,17 +290,32 @@ def generate_avatar_video(script: str, title: str = "daily-brief") -> str:
 
     _validate_provider_config(provider)
     if provider == "heygen":
-        create_payload = _heygen_generate(script=script, title=title)
+        cache = _render_cache()
+        key = _heygen_render_key(script)
+        if cache is not None:
+            entry = await asyncio.to_thread(cache.get, key)
+            if entry is not None:
+                cached = await _serve_cached_render(cache, key, entry, title)
+                if cached:
+                    logger.info(f"Render cache hit for HeyGen video {entry['video_id']}")
+                    return cached
+
+        create_payload = await _heygen_generate(script=script, title=title)
         metadata_path = _write_output_metadata(create_payload, f"{title}-heygen-create")
         video_id = _extract_video_id(create_payload)
         if not video_id:
             return metadata_path
 
-        status_payload = _heygen_poll(video_id)
+        status_payload = await _heygen_poll(video_id)
         status_path = _write_output_metadata(status_payload, f"{title}-heygen-status")
         video_url = _extract_video_url(status_payload)
-        if video_url and os.getenv("HEYGEN_DOWNLOAD", "false").lower() == "true":
-            return _heygen_download(video_url, title)
+        if video_url and cache is not None:
+            await asyncio.to_thread(cache.put, key, video_id, video_url)
+        if video_url and _heygen_download_enabled():
+            video_path = await _heygen_download(video_url, title)
+            if cache is not None:
+                await asyncio.to_thread(cache.put, key, video_id, None, video_path)
+            return video_path
         return video_url or status_path
 
     raise NotImplementedError(
@@ -234,17 +324,103 @@ def generate_avatar_video(script: str, title: str = "daily-brief") -> str:
     )
 
 
+def generate_avatar_video(script: str, title: str = "daily-brief") -> str:
+    """Blocking wrapper around :func:`agenerate_avatar_video` for sync callers.
+
+    Must not be called from a running event loop; await the async version there.
+    """
+
+    async def run() -> str:
+        try:
+            return await agenerate_avatar_video(script=script, title=title)
+        finally:
+            # Pooled clients are bound to this loop, which asyncio.run closes
+            await aclose_async_clients()
+
+    return asyncio.run(run())
+
+
+_RENDER_QUEUE: Optional[RenderQueue] = None
+
+# video_path of a render left to the background queue
+RENDER_JOB_PREFIX = "render_job:"
+
+
+def render_queue() -> RenderQueue:
+    """Process-wide render job queue backed by ``agenerate_avatar_video``."""
+    global _RENDER_QUEUE
+    if _RENDER_QUEUE is None:
+        _RENDER_QUEUE = RenderQueue.from_env(renderer=agenerate_avatar_video)
+    return _RENDER_QUEUE
+
+
+def render_queue_counts() -> Optional[Dict[str, int]]:
+    """Jobs per status (``None`` when the queue is disabled or not opened yet). Blocking."""
+    queue = _RENDER_QUEUE
+    return queue.counts() if render_queue_enabled() and queue is not None else None
+
+
+def render_queue_serving() -> bool:
+    """Whether a long-lived process (the API server) runs the queue's workers.
+
+    Renders may only be left in the queue then; otherwise they run inline.
+    """
+    return render_queue_enabled() and _RENDER_QUEUE is not None and _RENDER_QUEUE.serving
+
+
+async def resolve_render_job(video_path: Optional[str], timeout: Optional[float] = None) -> Optional[str]:
+    """Wait for a ``render_job:<id>`` path to finish; ``None`` if it failed or timed out."""
+    if not video_path or not video_path.startswith(RENDER_JOB_PREFIX):
+        return video_path
+    job = await render_queue().wait(video_path[len(RENDER_JOB_PREFIX):], timeout=timeout)
+    if job is None or job["status"] != "succeeded":
+        logger.warning(f"Render job for {video_path} did not succeed: {job['status'] if job else 'unknown job'}")
+        return None
+    return job["result"]["video"]
+
+
 class VideoGenerateTool(BaseTool):
     name: str = "video_generate"
-    description: str = "Generate a digital human video from a script"
+    description: str = (
+        "Generate a digital human video from a script. With background=true the render is "
+        "queued and a job id is returned; check it with video_job_status."
+    )
     parameters: dict = {
         "type": "object",
         "properties": {
             "script": {"type": "string"},
             "title": {"type": "string", "default": "daily-brief"},
+            "background": {"type": "boolean", "default": False},
         },
         "required": ["script"],
     }
 
-    async def execute(self, script: str, title: str = "daily-brief") -> str:
-        return generate_avatar_video(script=script, title=title)
+    async def execute(self, script: str, title: str = "daily-brief", background: bool = False) -> str:
+        if not render_queue_serving():
+            return await agenerate_avatar_video(script=script, title=title)
+        queue = render_queue()
+        job = await queue.enqueue(script, title)
+        if background:
+            return json.dumps(job, ensure_ascii=True)
+        job = await queue.wait(job["id"])
+        if job and job["status"] == "succeeded":
+            return job["result"]["video"]
+        return json.dumps(job, ensure_ascii=True)
+
+
+class VideoJobStatusTool(BaseTool):
+    name: str = "video_job_status"
+    description: str = "Check the status of a queued video render job"
+    parameters: dict = {
+        "type": "object",
+        "properties": {
+            "job_id": {"type": "string"},
+        },
+        "required": ["job_id"],
+    }
+
+    async def execute(self, job_id: str) -> str:
+        job = await render_queue().status(job_id)
+        if job is None:
+            return f"Unknown render job: {job_id}"
+        return json.dumps(job, ensure_ascii=True)
@@ -0,0 +1,295 @@
+"""Lightweight spans for the workflows.
+
+A span times one unit of work (a graph node, an LLM call, a tool call) and
+carries attributes such as payload sizes and token counts. Finished spans
+go to the registered exporters: a JSON-lines file when
+``TRACING_JSONL_PATH`` is set, OpenTelemetry when the SDK is installed and
+enabled, and any in-process listeners (the /ws summary, metrics, the
+benchmark). Exporters added with ``always=True`` (metrics) keep receiving
+spans when ``TRACING_ENABLED=false``; everything else is skipped then.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+SpanExporter = Callable[["Span"], None]
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar[Optional["TraceCollector"]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "duration", "attributes", "status", "error", "_started", "_otel")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time()
+        self.duration = 0.0
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._otel: Any = None
+
+    def set(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def add(self, key: str, amount: float) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class TraceCollector:
+    """Keeps the spans of one workflow run so they can be summarised at the end."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans: List[Span] = []
+
+    def summary(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+        totals: Dict[str, float] = defaultdict(float)
+        for span in self.spans:
+            stage = stages[span.name]
+            duration_ms = span.duration * 1000
+            stage["count"] += 1
+            stage["total_ms"] += duration_ms
+            stage["max_ms"] = max(stage["max_ms"], duration_ms)
+            stage["errors"] += span.status == "error"
+            for key in ("prompt_tokens", "completion_tokens", "request_bytes", "response_bytes"):
+                if isinstance(span.attributes.get(key), (int, float)):
+                    totals[key] += span.attributes[key]
+        root = next((span for span in self.spans if span.name == self.name), None)
+        return {
+            "trace": self.name,
+            "duration_ms": round(root.duration * 1000, 1) if root else None,
+            "stages": {
+                name: {key: round(value, 1) if isinstance(value, float) else value for key, value in stage.items()}
+                for name, stage in sorted(stages.items(), key=lambda item: -item[1]["total_ms"])
+            },
+            "totals": dict(totals),
+        }
+
+
+class JsonlExporter:
+    """Appends one JSON object per finished span to ``path``.
+
+    Writes happen synchronously on the caller's thread and the file is never
+    rotated, so this is meant for debugging and benchmarks, not always-on use.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+
+
+_EXPORTERS: List[SpanExporter] = []
+_ALWAYS_EXPORTERS: List[SpanExporter] = []
+_CONFIGURED = False
+_OTEL_TRACER: Any = None
+
+
+def tracing_enabled() -> bool:
+    return os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+
+def add_exporter(exporter: SpanExporter, always: bool = False) -> None:
+    """Register ``exporter``; with ``always`` it also runs when tracing is disabled."""
+    (_ALWAYS_EXPORTERS if always else _EXPORTERS).append(exporter)
+
+
+def remove_exporter(exporter: SpanExporter) -> None:
+    for exporters in (_EXPORTERS, _ALWAYS_EXPORTERS):
+        if exporter in exporters:
+            exporters.remove(exporter)
+
+
+def _otel_tracer() -> Any:
+    """OpenTelemetry tracer when enabled and installed (exporter setup is left to the OTel SDK env vars)."""
+    if os.getenv("TRACING_OTEL_ENABLED", "false").lower() != "true":
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("TRACING_OTEL_ENABLED=true but opentelemetry is not installed; skipping OTel export")
+        return None
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        if not isinstance(trace.get_tracer_provider(), TracerProvider):
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+    except ImportError:
+        # API only: spans go to whatever provider the host application installed
+        pass
+    return trace.get_tracer("fastkol")
+
+
+def _configure() -> None:
+    global _CONFIGURED, _OTEL_TRACER
+    if _CONFIGURED:
+        return
+    _CONFIGURED = True
+    # Opt-in: the exporter does blocking file I/O for every span
+    path = os.getenv("TRACING_JSONL_PATH", "").strip()
+    if path:
+        _EXPORTERS.insert(0, JsonlExporter(path))
+    _OTEL_TRACER = _otel_tracer()
+
+
+def _start_otel(span: Span, parent: Optional[Span]) -> None:
+    if _OTEL_TRACER is None:
+        return
+    from opentelemetry import trace
+
+    context = trace.set_span_in_context(parent._otel) if parent is not None and parent._otel is not None else None
+    span._otel = _OTEL_TRACER.start_span(span.name, context=context, start_time=int(span.start_time * 1e9))
+
+
+def _end_otel(span: Span) -> None:
+    if span._otel is None:
+        return
+    for key, value in span.attributes.items():
+        if isinstance(value, (str, bool, int, float)):
+            span._otel.set_attribute(key, value)
+    if span.error:
+        from opentelemetry.trace import Status, StatusCode
+
+        span._otel.set_status(Status(StatusCode.ERROR, span.error))
+    span._otel.end(end_time=int((span.start_time + span.duration) * 1e9))
+
+
+def _export(span: Span, enabled: bool) -> None:
+    exporters = list(_ALWAYS_EXPORTERS)
+    if enabled:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append(span)
+        exporters += _EXPORTERS
+    for exporter in exporters:
+        try:
+            exporter(span)
+        except Exception as exc:
+            logger.warning(f"Span exporter {exporter!r} failed: {exc}")
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """Time the enclosed block as a child of the current span."""
+    parent = _current_span.get()
+    current = Span(name, parent, {key: value for key, value in attributes.items() if value is not None})
+    enabled = tracing_enabled()
+    if not enabled and not _ALWAYS_EXPORTERS:
+        yield current
+        return
+    if enabled:
+        _configure()
+        _start_otel(current, parent)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - current._started
+        _current_span.reset(token)
+        if enabled:
+            _end_otel(current)
+        _export(current, enabled)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[TraceCollector]:
+    """Root span for one workflow run; the collector holds all of its spans."""
+    collector = TraceCollector(name)
+    token = _current_trace.set(collector)
+    try:
+        with span(name, **attributes):
+            yield collector
+    finally:
+        _current_trace.reset(token)
+
+
+def traced(name: str, **attributes: Any) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Decorator form of :func:`span` for coroutines; records the result size."""
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name, **attributes) as current:
+                result = await func(*args, **kwargs)
+                current.set("response_bytes", payload_size(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def payload_size(value: Any) -> int:
+    """Approximate serialized size in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(value).encode("utf-8"))
+
+
+def record_usage(current: Span, response: Any) -> None:
+    """Copy token usage from an LLM response (object or dict) onto the span, if present."""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if usage is None:
+        return
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+        if isinstance(value, (int, float)):
+            current.set(key, value)
@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import json
+import os
+
+import httpx
+import pytest
+
+from src.tools import download
+from src.tools.download import DownloadError, download_file
+
+
+DATA = os.urandom(64 * 1024 + 123)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay, *args, **kwargs):
+        await real_sleep(0)
+
+    monkeypatch.setattr(download.asyncio, "sleep", sleep)
+
+
+class RangeServer:
+    """Serves DATA with Range support; can cut bodies short or stop honouring ranges."""
+
+    def __init__(self, truncate_first=0, refuse_ranges_after=None):
+        self.truncate_first = truncate_first
+        self.refuse_ranges_after = refuse_ranges_after
+        self.requests = []
+        self.bytes_sent = 0
+
+    def __call__(self, request):
+        self.requests.append(request.headers.get("Range"))
+        header = request.headers.get("Range")
+        if header is None:
+            status, start, end = 200, 0, len(DATA) - 1
+        else:
+            start_text, _, end_text = header[len("bytes="):].partition("-")
+            start = int(start_text)
+            end = int(end_text) if end_text else len(DATA) - 1
+            if start >= len(DATA):
+                return httpx.Response(416)
+            status = 206
+        if status == 206 and self.refuse_ranges_after is not None and len(self.requests) > self.refuse_ranges_after:
+            return httpx.Response(200, content=DATA)
+        body = DATA[start:end + 1]
+        headers = {"Content-Length": str(len(body))}
+        if status == 206:
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(DATA)}"
+        if self.truncate_first:
+            # Body ends early without a transport error
+            self.truncate_first -= 1
+            body = body[: len(body) // 2]
+        self.bytes_sent += len(body)
+        return httpx.Response(status, headers=headers, stream=httpx.ByteStream(body))
+
+
+def fetch(server, dest, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+            return await download_file(client, "https://cdn.test/video.mp4", dest, chunk_size=4096, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_sequential_download_resumes_a_short_body(tmp_path):
+    server = RangeServer(truncate_first=1)
+    result = fetch(server, tmp_path / "video.mp4")
+    assert result["sha256"] == SHA256
+    assert (tmp_path / "video.mp4").read_bytes() == DATA
+    assert server.requests[0] is None
+    assert server.requests[1] == f"bytes={len(DATA) // 2}-"
+
+
+def test_sequential_download_continues_an_existing_part_file(tmp_path):
+    dest = tmp_path / "video.mp4"
+    part = tmp_path / "video.mp4.part"
+    part.write_bytes(DATA[:1000])
+    server = RangeServer()
+    result = fetch(server, dest)
+    assert result == {"path": str(dest), "sha256": SHA256, "bytes": len(DATA)}
+    assert server.requests == ["bytes=1000-"]
+    assert not part.exists()
+
+
+def test_segmented_download_checkpoints_and_resumes(tmp_path):
+    dest = tmp_path / "video.mp4"
+    part = tmp_path / "video.mp4.part"
+    state = tmp_path / "video.mp4.part.json"
+    options = {"segments": 4, "min_segment_size": 1024}
+
+    # The probe and the four segments each get half a body, then ranges are refused
+    with pytest.raises(DownloadError):
+        fetch(RangeServer(truncate_first=5, refuse_ranges_after=5), dest, **options)
+    saved = json.loads(state.read_text())
+    assert saved["size"] == len(DATA)
+    assert all(0 < segment[2] <= segment[1] - segment[0] for segment in saved["segments"])
+    assert part.stat().st_size == len(DATA)
+
+    server = RangeServer()
+    result = fetch(server, dest, **options)
+    assert result["sha256"] == SHA256
+    assert dest.read_bytes() == DATA
+    assert not state.exists()
+    done = sum(segment[2] for segment in saved["segments"])
+    # Only what the checkpoint did not record is fetched again (plus the probe byte)
+    assert server.bytes_sent == len(DATA) - done + 1
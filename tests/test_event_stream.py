@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from src import event_stream
+from src.event_stream import EventStream, negotiate_format
+
+
+class FakeWebSocket:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.frames = []
+
+    async def send_text(self, data):
+        if self.fail:
+            raise ConnectionError("socket closed")
+        self.frames.append(json.loads(data))
+
+    async def send_bytes(self, data):
+        raise AssertionError("expected JSON frames")
+
+    def events(self):
+        return [event for frame in self.frames if frame["type"] == "batch" for event in frame["events"]]
+
+
+def run(coro_fn):
+    return asyncio.run(coro_fn())
+
+
+def test_attach_without_last_seq_delivers_only_new_events():
+    async def scenario():
+        stream = EventStream(flush_interval=60)
+        await stream.publish({"type": "log", "n": 1})
+        socket = FakeWebSocket()
+        await stream.attach(socket)
+        await stream.publish({"type": "log", "n": 2})
+        await stream.flush()
+        await stream.aclose()
+        return socket
+
+    socket = run(scenario)
+    assert socket.frames[0] == {"type": "hello", "format": "json", "seq": 1}
+    assert [event["seq"] for event in socket.events()] == [2]
+
+
+def test_resume_replays_everything_after_last_seq():
+    async def scenario():
+        stream = EventStream(flush_interval=60)
+        for n in range(5):
+            await stream.publish({"type": "log", "n": n})
+        socket = FakeWebSocket()
+        await stream.attach(socket, last_seq=2)
+        await stream.aclose()
+        return socket
+
+    assert [event["seq"] for event in run(scenario).events()] == [3, 4, 5]
+
+
+def test_gap_beyond_the_ring_buffer_is_reported_with_retained_results():
+    async def scenario():
+        stream = EventStream(buffer_size=3, flush_interval=60)
+        await stream.publish({"type": "log"})
+        await stream.publish({"type": "result", "output": "done"})
+        for _ in range(4):
+            await stream.publish({"type": "log"})
+        socket = FakeWebSocket()
+        await stream.attach(socket, last_seq=0)
+        await stream.aclose()
+        return socket
+
+    events = run(scenario).events()
+    assert events[0] == {"type": "gap", "from_seq": 1, "to_seq": 3}
+    assert events[1]["seq"] == 2 and events[1]["type"] == "result"
+    assert [event["seq"] for event in events[2:]] == [4, 5, 6]
+
+
+def test_events_are_batched_and_urgent_ones_flush_immediately():
+    async def scenario():
+        stream = EventStream(batch_size=3, flush_interval=60)
+        socket = FakeWebSocket()
+        await stream.attach(socket)
+        for _ in range(2):
+            await stream.publish({"type": "log"})
+        pending = len(socket.frames)
+        await stream.publish({"type": "log"})
+        full_batch = len(socket.frames)
+        await stream.publish({"type": "result"})
+        await stream.aclose()
+        return socket, pending, full_batch
+
+    socket, pending, full_batch = run(scenario)
+    # hello only, then one frame once batch_size events are waiting
+    assert (pending, full_batch) == (1, 2)
+    assert [len(frame["events"]) for frame in socket.frames[1:]] == [3, 1]
+
+
+def test_a_dead_socket_detaches_and_a_new_one_resumes():
+    async def scenario():
+        stream = EventStream(flush_interval=60)
+        dead = FakeWebSocket()
+        await stream.attach(dead)
+        await stream.publish({"type": "result", "n": 1})
+        dead.fail = True
+        await stream.publish({"type": "result", "n": 2})
+        attached = stream.attached
+        await stream.publish({"type": "log", "n": 3})
+        socket = FakeWebSocket()
+        await stream.attach(socket, last_seq=1)
+        await stream.aclose()
+        return attached, socket
+
+    attached, socket = run(scenario)
+    assert not attached
+    assert [event["n"] for event in socket.events()] == [2, 3]
+
+
+def test_msgpack_falls_back_to_json_when_not_installed(monkeypatch):
+    assert negotiate_format(None) == "json"
+    monkeypatch.setattr(event_stream, "msgpack", None)
+    assert negotiate_format("msgpack") == "json"
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+
+from src.log_routing import LogSink, WorkflowLogRouter, bind_log_sink
+
+
+def run_sink(feed, **options):
+    """Run ``feed(sink)`` against a sink and return every payload it sent."""
+
+    async def run():
+        sent = []
+
+        async def send(payload):
+            sent.append(payload)
+
+        sink = LogSink(send, "wf-1", flush_interval=60, **options)
+        await feed(sink)
+        await sink.aclose()
+        return sent
+
+    return asyncio.run(run())
+
+
+def records(sent):
+    return [record for payload in sent if payload["type"] == "logs" for record in payload["records"]]
+
+
+def test_repeats_of_the_previous_record_are_coalesced():
+    async def feed(sink):
+        for _ in range(3):
+            sink.put("10:00 polling", "INFO", key=("heygen", 20, "polling"))
+        sink.put("10:01 done", "INFO", key=("heygen", 20, "done"))
+        sink.put("10:02 polling", "INFO", key=("heygen", 20, "polling"))
+
+    assert records(run_sink(feed)) == [
+        {"message": "10:00 polling", "level": "INFO", "repeat": 3},
+        {"message": "10:01 done", "level": "INFO"},
+        {"message": "10:02 polling", "level": "INFO"},
+    ]
+
+
+def test_oldest_records_are_dropped_and_counted_when_full():
+    async def feed(sink):
+        for index in range(5):
+            sink.put(f"line {index}", "INFO", key=index)
+
+    sent = run_sink(feed, max_records=3)
+    assert [record["message"] for record in records(sent)] == ["line 2", "line 3", "line 4"]
+    assert sent[0]["dropped"] == 2
+    assert all("dropped" not in payload for payload in sent[1:])
+
+
+def test_records_are_sent_in_batches():
+    async def feed(sink):
+        for index in range(5):
+            sink.put(f"line {index}", "INFO", key=index)
+
+    sent = run_sink(feed, batch_size=2)
+    assert [len(payload["records"]) for payload in sent] == [2, 2, 1]
+    assert all(payload["workflow_id"] == "wf-1" for payload in sent)
+
+
+def test_workflow_messages_follow_the_logs_before_them():
+    async def feed(sink):
+        sink.put("working", "INFO", key="working")
+        await sink.send({"type": "result", "output": "ok"})
+
+    sent = run_sink(feed)
+    assert [payload["type"] for payload in sent] == ["logs", "result"]
+
+
+def test_router_sends_records_to_the_current_workflow_only():
+    router = WorkflowLogRouter()
+    router.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger("tests.log_routing")
+    logger.addHandler(router)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    async def run():
+        sent = {"a": [], "b": []}
+
+        def sender(name):
+            async def send(payload):
+                sent[name].append(payload)
+
+            return send
+
+        sinks = {name: LogSink(sender(name), name, flush_interval=60) for name in sent}
+
+        async def workflow(name):
+            bind_log_sink(sinks[name])
+            logger.info("hello from %s", name)
+
+        await asyncio.gather(workflow("a"), workflow("b"))
+        logger.info("outside any workflow")
+        for sink in sinks.values():
+            await sink.aclose()
+        return sent
+
+    try:
+        sent = asyncio.run(run())
+    finally:
+        logger.removeHandler(router)
+    assert [record["message"] for record in records(sent["a"])] == ["hello from a"]
+    assert [record["message"] for record in records(sent["b"])] == ["hello from b"]
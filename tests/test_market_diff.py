@@ -0,0 +1,63 @@
+from src.tools.market_diff import changed_ids, diff_snapshots, window_label
+from src.tools.market_snapshot import MarketSnapshot
+
+
+def market(market_id, price, volume=1000.0, **extra):
+    return {
+        "id": market_id,
+        "question": f"Question {market_id}?",
+        "outcomePrices": f'["{price}", "{1 - price}"]',
+        "volume24hr": volume,
+        "active": True,
+        "closed": False,
+        **extra,
+    }
+
+
+def snapshot(markets, taken_at):
+    return MarketSnapshot.from_markets(markets, taken_at=taken_at)
+
+
+def test_classifies_changed_new_closed_and_removed_markets():
+    previous = snapshot(
+        [market("a", 0.50), market("b", 0.30), market("c", 0.70), market("d", 0.20), market("e", 0.40)],
+        taken_at=0,
+    )
+    current = snapshot(
+        [
+            market("a", 0.60),  # price moved
+            market("b", 0.305),  # below the threshold
+            market("c", 0.70, volume=2000.0),  # volume doubled
+            market("d", 0.20, closed=True),
+            market("f", 0.10),
+        ],
+        taken_at=7200,
+    )
+
+    diff = diff_snapshots(previous, current, price_threshold=0.02, volume_threshold=0.25)
+
+    assert [entry["id"] for entry in diff["changed"]] == ["a", "c"]
+    assert diff["changed"][0]["price_change"] == 0.1
+    assert [entry["id"] for entry in diff["new"]] == ["f"]
+    assert [entry["id"] for entry in diff["closed"]] == ["d"]
+    assert [entry["id"] for entry in diff["removed"]] == ["e"]
+    assert diff["unchanged_count"] == 1
+
+
+def test_changed_ids_lists_moved_then_new_then_closed():
+    diff = {"changed": [{"id": "a"}], "new": [{"id": "b"}], "closed": [{"id": "c"}], "removed": [{"id": "d"}]}
+    assert changed_ids(diff) == ["a", "b", "c"]
+
+
+def test_identical_snapshots_have_no_changes():
+    markets = [market("a", 0.5), market("b", 0.25)]
+    diff = diff_snapshots(snapshot(markets, 0), snapshot(markets, 60))
+    assert changed_ids(diff) == []
+    assert diff["unchanged_count"] == 2
+
+
+def test_window_label_is_stable_within_a_snapshot_window(monkeypatch):
+    monkeypatch.setenv("POLYMARKET_SNAPSHOT_MIN_AGE", "3600")
+    labels = {window_label({"baseline_taken_at": 0, "taken_at": elapsed}) for elapsed in (60, 1800, 3599)}
+    assert labels == {"over the last 1h"}
+    assert window_label({"baseline_taken_at": 0, "taken_at": 5400}) == "over the last 2h"
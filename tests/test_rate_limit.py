@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.tools import rate_limit
+from src.tools.rate_limit import HostLimiter, RateLimitedTransport, RateLimiterRegistry, TokenBucket, rate_limit_flow
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only for synchronous tests: asyncio's own clock reads time.monotonic too
+    now = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_token_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    bucket = TokenBucket(rate=1.0, capacity=2.0)
+    for _ in range(2):
+        assert bucket.wait_time(1) == 0.0
+        bucket.consume(1)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock[0] += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock[0] += 10
+    # Never banks more than its capacity
+    assert bucket.tokens <= 2.0 and bucket.wait_time(2) == 0.0
+
+
+def test_token_bucket_caps_oversized_requests_at_capacity(clock):
+    bucket = TokenBucket(rate=10.0, capacity=5.0)
+    assert bucket.wait_time(50) == 0.0
+    bucket.consume(50)
+    assert bucket.tokens == 0.0
+
+
+def test_host_limiter_serves_flows_round_robin():
+    async def run():
+        limiter = HostLimiter("api.test", rpm=6000, burst=1)
+        granted = []
+
+        async def request(flow, label):
+            rate_limit_flow.set(flow)
+            await limiter.acquire()
+            granted.append(label)
+
+        tasks = [asyncio.create_task(request("a", f"a{index}")) for index in range(3)]
+        tasks.append(asyncio.create_task(request("b", "b0")))
+        await asyncio.gather(*tasks)
+        return limiter, granted
+
+    limiter, granted = asyncio.run(run())
+    assert granted == ["a0", "b0", "a1", "a2"]
+    assert limiter.metrics["requests"] == 4
+    assert limiter.queue_depth == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        limiter = HostLimiter("api.test", rpm=60, burst=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        depth = limiter.queue_depth
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return depth, limiter.queue_depth
+
+    assert asyncio.run(run()) == (1, 0)
+
+
+def limited_transport(statuses):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses[min(len(calls), len(statuses)) - 1])
+
+    registry = RateLimiterRegistry(
+        {"api.test": {"rpm": 60000, "burst": 100, "max_retries": 3, "base_backoff": 0.001, "max_backoff": 0.001}}
+    )
+    return RateLimitedTransport(httpx.MockTransport(handler), registry), registry, calls
+
+
+def test_transport_retries_throttled_requests():
+    async def run():
+        transport, registry, calls = limited_transport([429, 503, 200])
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post("https://api.test/v1", json={"q": 1})
+        return response, registry, calls
+
+    response, registry, calls = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert registry.metrics()["api.test"]["retries"] == 2
+
+
+def test_transport_does_not_resend_a_streamed_body():
+    async def body():
+        yield b"chunk"
+
+    async def run():
+        transport, _registry, calls = limited_transport([429, 200])
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post("https://api.test/upload", content=body())
+        return response, calls
+
+    response, calls = asyncio.run(run())
+    assert response.status_code == 429
+    assert len(calls) == 1
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from src.tools.response_cache import AsyncTTLCache
+
+# Short real TTLs: patching time.monotonic would also stop the event loop's clock
+TTL = 0.05
+
+
+def counting_fetch(values):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return values[len(calls) - 1]
+
+    return fetch, calls
+
+
+def test_fresh_entry_is_served_from_cache():
+    async def run():
+        cache = AsyncTTLCache(default_ttl=TTL, stale_ttl=TTL * 4)
+        fetch, calls = counting_fetch(["a", "b"])
+        assert await cache.get_or_fetch("k", fetch) == "a"
+        assert await cache.get_or_fetch("k", fetch) == "a"
+        return cache, calls
+
+    cache, calls = asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    async def run():
+        cache = AsyncTTLCache(default_ttl=TTL, stale_ttl=TTL * 4)
+        fetch, calls = counting_fetch(["old", "new"])
+        await cache.get_or_fetch("k", fetch)
+        await asyncio.sleep(TTL * 2)
+        stale = [await cache.get_or_fetch("k", fetch), await cache.get_or_fetch("k", fetch)]
+        # Wait for the background refresh and its done-callback
+        await cache._inflight["k"]
+        await asyncio.sleep(0)
+        return cache, calls, stale, await cache.get_or_fetch("k", fetch)
+
+    cache, calls, stale, refreshed = asyncio.run(run())
+    assert stale == ["old", "old"]
+    assert refreshed == "new"
+    assert len(calls) == 2
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_expired_entry_is_fetched_again():
+    async def run():
+        cache = AsyncTTLCache(default_ttl=TTL, stale_ttl=TTL * 4)
+        fetch, calls = counting_fetch(["old", "new"])
+        await cache.get_or_fetch("k", fetch)
+        await asyncio.sleep(TTL * 6)
+        return await cache.get_or_fetch("k", fetch)
+
+    assert asyncio.run(run()) == "new"
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = AsyncTTLCache()
+        fetch, calls = counting_fetch(["a"])
+        results = await asyncio.gather(*(cache.get_or_fetch("k", fetch) for _ in range(5)))
+        return cache, calls, results
+
+    cache, calls, results = asyncio.run(run())
+    assert results == ["a"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_errors_are_not_cached():
+    async def run():
+        cache = AsyncTTLCache()
+        attempts = []
+
+        async def fetch():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_fetch("k", fetch)
+        return cache, await cache.get_or_fetch("k", fetch)
+
+    cache, value = asyncio.run(run())
+    assert value == "ok"
+    assert cache.stats()["errors"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    async def run():
+        cache = AsyncTTLCache(max_entries=2)
+
+        def fetch_value(value):
+            async def fetch():
+                return value
+
+            return fetch
+
+        for key in ("a", "b"):
+            await cache.get_or_fetch(key, fetch_value(key))
+        await cache.get_or_fetch("a", fetch_value("unused"))
+        await cache.get_or_fetch("c", fetch_value("c"))
+        return cache, await cache.get_or_fetch("b", fetch_value("b2"))
+
+    cache, value = asyncio.run(run())
+    assert value == "b2"
+    assert cache.stats()["evictions"] == 2